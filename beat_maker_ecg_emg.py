@@ -6,6 +6,11 @@ from pydub.generators import Sine, Square, Sawtooth, WhiteNoise
 from scipy.signal import find_peaks
 import warnings
 
+from c2h5oh.audio_arrays import array_to_segment, db_to_gain, segment_to_array
+from c2h5oh.engine import render_onset_train
+from c2h5oh.features import lazy
+from c2h5oh.subjects import recording_stats
+
 # --- Configuration ---
 INPUT_FILE = 'WESAD/S2/S2.pkl'
 OUTPUT_PREFIX = 'WESAD/S2'  # We'll add suffixes like _baseline.wav
@@ -63,7 +68,7 @@ def get_pad_chord(chord_name, dur_ms=2000):
 
 # --- 3. Generation Logic (Unchanged) ---
 
-def generate_song_structure(ecg_rate, emg, rate, total_sec):
+def generate_song_structure(ecg_rate, emg, rate, total_sec, stats):
     print("Arranging structured pop song...")
     full_mix = AudioSegment.silent(duration=total_sec * 1000)
 
@@ -73,14 +78,13 @@ def generate_song_structure(ecg_rate, emg, rate, total_sec):
     chord_idx = 0
     last_melody_note_idx = 0  # Start at C4 (index 0)
 
-    # Pre-load sounds for speed
-    kick = get_kick()
-    snare = get_snare()
-    hihat = get_hihat()
+    # Pre-load sounds for speed; hits are collected as (position_ms, gain) onsets
+    # and rendered in one go after the loop
+    drums = {'kick': get_kick(), 'snare': get_snare(), 'hihat': get_hihat()}
+    onsets = {name: [] for name in drums}
 
-    # Prepare EMG for melody
-    emg_clean = nk.emg_amplitude(emg)
-    emg_norm = (emg_clean - np.min(emg_clean)) / (np.max(emg_clean) - np.min(emg_clean))
+    # Prepare EMG for melody (normalised per beat as it is read, with the subject's stats)
+    emg_norm = lazy(nk.emg_amplitude(emg), stats['emg_amplitude'].normaliser())
 
     while current_time_ms < (total_sec * 1000) - 2000:
         # --- A. Determine Tempo & Section ---
@@ -94,15 +98,15 @@ def generate_song_structure(ecg_rate, emg, rate, total_sec):
 
         # --- B. Rhythm Section ---
         # Always Hi-hats (8th notes for chorus, quarter for verse)
-        full_mix = full_mix.overlay(hihat, position=current_time_ms)
+        onsets['hihat'].append((current_time_ms, 1.0))
         if is_chorus:
-            full_mix = full_mix.overlay(hihat.apply_gain(-5), position=current_time_ms + (ms_per_beat / 2))
+            onsets['hihat'].append((current_time_ms + (ms_per_beat / 2), db_to_gain(-5)))
 
         # Kick/Snare pattern
-        if beat_counter % 4 == 0: full_mix = full_mix.overlay(kick, position=current_time_ms)  # Beat 1
-        if beat_counter % 4 == 2: full_mix = full_mix.overlay(kick, position=current_time_ms)  # Beat 3
+        if beat_counter % 4 == 0: onsets['kick'].append((current_time_ms, 1.0))  # Beat 1
+        if beat_counter % 4 == 2: onsets['kick'].append((current_time_ms, 1.0))  # Beat 3
         if beat_counter % 4 == 1 or beat_counter % 4 == 3:  # Beats 2 and 4
-            full_mix = full_mix.overlay(snare, position=current_time_ms)
+            onsets['snare'].append((current_time_ms, 1.0))
 
         # --- C. Harmony (Chords) ---
         # Change chord every 4 beats (1 bar)
@@ -137,7 +141,14 @@ def generate_song_structure(ecg_rate, emg, rate, total_sec):
         current_time_ms += ms_per_beat
         beat_counter += 1
 
-    return full_mix
+    # Whole percussion track: one onset-train convolution per drum, one overlay
+    frame_rate = drums['kick'].frame_rate
+    length = int(round(total_sec * frame_rate))
+    percussion = sum(
+        render_onset_train(segment_to_array(drums[name]), onsets[name], frame_rate, length)
+        for name in drums
+    )
+    return full_mix.overlay(array_to_segment(percussion, frame_rate))
 
 
 # --- 4. Main (MODIFIED) ---
@@ -152,6 +163,8 @@ def main():
         ecg_full = data['signal']['chest']['ECG'].flatten()
         emg_full = data['signal']['chest']['EMG'].flatten()
         labels = data['label'].flatten()
+        # Normalisation stats over the whole recording, so every segment is scaled alike
+        stats = recording_stats(data)
     except KeyError:
         print("Error: Data file seems to be missing 'signal' or 'label' keys.")
         return
@@ -198,7 +211,7 @@ def main():
         ecg_rate = nk.signal_rate(rpeaks, sampling_rate=DATA_SAMPLING_RATE, desired_length=len(ecg_segment))
 
         # --- Generation ---
-        final_song = generate_song_structure(ecg_rate, emg_segment, DATA_SAMPLING_RATE, SEGMENT_DURATION_SEC)
+        final_song = generate_song_structure(ecg_rate, emg_segment, DATA_SAMPLING_RATE, SEGMENT_DURATION_SEC, stats)
         
         # --- Exporting ---
         output_filename = f"{OUTPUT_PREFIX}_{label_name}.wav"
@@ -0,0 +1,52 @@
+"""Scaling benchmark for the block-parallel mixer (c2h5oh.engine).
+
+Plans one long synthetic pop-song timeline and renders it with 1, 2, 4, ...
+worker threads, printing wall time and speed-up per worker count:
+
+    python benchmark_mixer.py [minutes=30] [max_workers=cpu_count]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from c2h5oh.dtypes import as_signals
+from c2h5oh.engine import render_events
+from c2h5oh.utils import (
+    FEATURE_RATE, FULL_SAMPLE_RATE, INSTRUMENTS, ONSET_INSTRUMENTS, bank_samples,
+    get_sample_bank, plan_song,
+)
+
+
+def synthetic_features(total_sec, rate=FEATURE_RATE, seed=0):
+    """HR drifting across the verse/chorus threshold and a busy EMG envelope."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(total_sec * rate) / rate
+    ecg_rate = 90 + 25 * np.sin(2 * np.pi * t / 300)
+    emg_norm = np.clip(0.35 + 0.3 * np.sin(2 * np.pi * t / 7) + 0.1 * rng.standard_normal(len(t)), 0, 1)
+    return as_signals({"ecg_rate": ecg_rate, "emg_norm": emg_norm})
+
+
+def run(minutes=30, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    total_sec = int(minutes * 60)
+    events = plan_song(synthetic_features(total_sec), FEATURE_RATE, total_sec)
+    print(f"{minutes} min timeline, {len(events)} events, up to {max_workers} workers")
+    get_sample_bank()  # build / map the bank outside the timed runs
+
+    worker_counts = sorted({1, max_workers} | {2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers})
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        render_events(events, INSTRUMENTS, total_sec * 1000, FULL_SAMPLE_RATE, sample_source=bank_samples,
+                      onset_instruments=ONSET_INSTRUMENTS, workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"workers={workers:<3} {elapsed:8.2f}s  speed-up x{baseline / elapsed:5.2f}  "
+              f"({total_sec / elapsed:6.1f}x real time)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(float(args[0]) if args else 30, int(args[1]) if len(args) > 1 else None)
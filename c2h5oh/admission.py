@@ -0,0 +1,118 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .engine import mixer_workers
+
+
+# --- Admission control for CPU-bound renders ---
+# Renders run on a fixed pool of RENDER_EXECUTOR_WORKERS threads (numpy /
+# scipy release the GIL in the heavy parts). One slot per worker plus
+# RENDER_QUEUE_DEPTH waiting slots are handed out; when they are all taken a
+# request is turned away at once with a Retry-After estimate instead of
+# queueing without bound, so admitted requests keep a predictable latency.
+# Each job mixes on mixer_workers threads (c2h5oh.engine), so the executor
+# keeps at most workers * mixer_workers threads busy.
+JOB_SECONDS_ESTIMATE = 10.0  # Retry-After guess until a job has been timed
+JOB_SECONDS_SMOOTHING = 0.2  # weight of the latest job in the running estimate
+
+
+class Saturated(Exception):
+    """Every worker and queue slot is taken; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Render queue is full, retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    def __init__(self, workers, queue_depth, mixer_workers=1):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.mixer_workers = mixer_workers
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._job_seconds = JOB_SECONDS_ESTIMATE
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_depth
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self._admitted,
+                "running": min(self._admitted, self.workers),
+                "queued": max(self._admitted - self.workers, 0),
+                "capacity": self.capacity,
+                "job_seconds": round(self._job_seconds, 2),
+            }
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: the jobs ahead, worker-parallel."""
+        with self._lock:
+            waves = max(self._admitted - self.capacity + 1, 1) / self.workers
+            return max(1, math.ceil(waves * self._job_seconds))
+
+    def _release(self, future):
+        with self._lock:
+            self._admitted -= 1
+
+    def _timed(self, func, args, kwargs):
+        start = time.perf_counter()
+        try:
+            with mixer_workers(self.mixer_workers):
+                return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._job_seconds += JOB_SECONDS_SMOOTHING * (elapsed - self._job_seconds)
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func`` on the pool, or raise Saturated when there is no slot."""
+        with self._lock:
+            admitted = self._admitted < self.capacity
+            if admitted:
+                self._admitted += 1
+        if not admitted:
+            raise Saturated(self.retry_after())
+        future = self._pool.submit(self._timed, func, args, kwargs)
+        # Runs on completion and on cancel, so a dropped job frees its slot
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        """Await ``func`` on the pool.
+
+        If the awaiting task is cancelled (Django cancels the view when the
+        client disconnects) a job still waiting in the queue is dropped. A job
+        that already started runs to completion: renders are stored by content
+        hash, so its result serves the client's retry.
+        """
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_render_executor():
+    """The process-wide RenderExecutor, sized from settings on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = RenderExecutor(
+                settings.RENDER_EXECUTOR_WORKERS, settings.RENDER_QUEUE_DEPTH,
+                settings.RENDER_EXECUTOR_MIXER_WORKERS,
+            )
+        return _executor
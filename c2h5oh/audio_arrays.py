@@ -0,0 +1,58 @@
+import numpy as np
+from pydub import AudioSegment
+
+
+# --- AudioSegment <-> NumPy ---
+# Mixing happens on float32 arrays in [-1, 1]; pydub only sees int16 PCM.
+INT16_SCALE = 32768.0
+
+
+def segment_to_array(audio_segment):
+    """float32 samples of an AudioSegment, shape (frames,) or (frames, channels)."""
+    audio_segment = audio_segment.set_sample_width(2)
+    samples = np.frombuffer(audio_segment.raw_data, dtype=np.int16).astype(np.float32)
+    samples /= INT16_SCALE
+    if audio_segment.channels > 1:
+        samples = samples.reshape(-1, audio_segment.channels)
+    return samples
+
+
+def as_array(sound, frame_rate):
+    """float32 samples of an instrument's output (an array or an AudioSegment)."""
+    if isinstance(sound, AudioSegment):
+        return segment_to_array(sound.set_frame_rate(frame_rate))
+    return np.asarray(sound, dtype=np.float32)
+
+
+def db_to_gain(db):
+    return np.float32(10 ** (db / 20))
+
+
+def to_pcm16(samples):
+    """Float samples clipped to int16 PCM."""
+    samples = np.clip(samples, -1.0, (INT16_SCALE - 1) / INT16_SCALE)
+    return np.round(samples * INT16_SCALE).astype(np.int16)
+
+
+def array_to_segment(samples, frame_rate):
+    """Clip float samples to int16 PCM and wrap them in an AudioSegment."""
+    pcm = to_pcm16(samples)
+    channels = 1 if pcm.ndim == 1 else pcm.shape[1]
+    return AudioSegment(
+        pcm.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels
+    )
+
+
+def apply_envelope(samples, frame_rate, fade_in_ms=0, fade_out_ms=0, gain_db=0.0):
+    """Linear fade in/out plus gain, like pydub's fade_in().fade_out().apply_gain().
+
+    Always returns a new array, so ``samples`` may be a read-only view.
+    """
+    out = samples * db_to_gain(gain_db)
+    fade_in = min(len(out), int(fade_in_ms * frame_rate / 1000))
+    fade_out = min(len(out), int(fade_out_ms * frame_rate / 1000))
+    if fade_in:
+        out[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=np.float32)
+    if fade_out:
+        out[len(out) - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)
+    return out
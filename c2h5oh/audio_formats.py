@@ -0,0 +1,136 @@
+from io import BytesIO
+from math import gcd
+
+import numpy as np
+from scipy.signal import resample_poly
+
+try:
+    # The soundfile wheels bundle libsndfile, so FLAC / Ogg encoding happens
+    # in-process without an ffmpeg binary on the box.
+    import soundfile as sf
+except (ImportError, OSError):
+    sf = None
+
+
+# --- Output formats ---
+DEFAULT_FORMAT = "wav"
+ENCODE_BLOCK_FRAMES = 64 * 1024
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+FORMATS = {
+    "wav": {"content_type": "audio/wav", "ext": "wav", "sf": ("WAV", "PCM_16")},
+    "flac": {"content_type": "audio/flac", "ext": "flac", "sf": ("FLAC", "PCM_16")},
+    "opus": {"content_type": "audio/ogg; codecs=opus", "ext": "opus", "sf": ("OGG", "OPUS")},
+    "vorbis": {"content_type": "audio/ogg", "ext": "ogg", "sf": ("OGG", "VORBIS")},
+}
+
+# Media types a client may send in Accept, mapped to our format names
+MEDIA_TYPES = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/opus": "opus",
+    "audio/ogg; codecs=opus": "opus",
+    "audio/ogg": "vorbis",
+}
+
+
+def available_formats():
+    if sf is None:
+        return [DEFAULT_FORMAT]
+    return [name for name, spec in FORMATS.items() if sf.check_format(*spec["sf"])]
+
+
+def _parse_accept(accept_header):
+    """Yield (media_type, q) pairs from an Accept header, best first."""
+    entries = []
+    for position, item in enumerate(accept_header.split(",")):
+        parts = [p.strip() for p in item.split(";") if p.strip()]
+        if not parts:
+            continue
+        media_type, q = parts[0].lower(), 1.0
+        params = []
+        for param in parts[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+            else:
+                params.append(f"{name.strip().lower()}={value.strip().lower()}")
+        if params:
+            media_type = "; ".join([media_type] + params)
+        entries.append((-q, position, media_type))
+    return [(media_type, -neg_q) for neg_q, _, media_type in sorted(entries)]
+
+
+def negotiate_format(accept_header="", requested=None):
+    """Pick an output format from an explicit request or the Accept header.
+
+    An explicit ``requested`` format must be known and available (ValueError
+    otherwise). Accept negotiation falls back to WAV when nothing matches, so
+    old clients sending ``*/*`` keep getting what they always got.
+    """
+    available = available_formats()
+    if requested:
+        requested = requested.lower()
+        if requested == "ogg":
+            requested = "vorbis"
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown output format '{requested}'.")
+        if requested not in available:
+            raise ValueError(f"Output format '{requested}' is not available on this server.")
+        return requested
+
+    for media_type, q in _parse_accept(accept_header or ""):
+        if q <= 0:
+            continue
+        name = MEDIA_TYPES.get(media_type)
+        if name is None and media_type.startswith("audio/ogg"):
+            name = "opus" if "opus" in media_type else "vorbis"
+        if name in available:
+            return name
+    return DEFAULT_FORMAT
+
+
+def _opus_rate(sample_rate):
+    for rate in OPUS_SAMPLE_RATES:
+        if rate >= sample_rate:
+            return rate
+    return OPUS_SAMPLE_RATES[-1]
+
+
+def encode_audio(audio_segment, fmt=DEFAULT_FORMAT):
+    """Encode an AudioSegment to ``fmt``, returning a rewound BytesIO."""
+    buffer = BytesIO()
+    if fmt == "wav" and sf is None:
+        audio_segment.export(buffer, format="wav")
+        buffer.seek(0)
+        return buffer
+
+    audio_segment = audio_segment.set_sample_width(2)
+    channels = audio_segment.channels
+    sample_rate = audio_segment.frame_rate
+    samples = np.frombuffer(audio_segment.raw_data, dtype=np.int16).reshape(-1, channels)
+
+    if fmt == "opus" and sample_rate not in OPUS_SAMPLE_RATES:
+        # Opus only runs at a handful of rates, e.g. 44.1 kHz -> 48 kHz (160/147)
+        target_rate = _opus_rate(sample_rate)
+        divisor = gcd(sample_rate, target_rate)
+        samples = resample_poly(
+            samples.astype(np.float32) / 32768.0, target_rate // divisor, sample_rate // divisor, axis=0
+        ).astype(np.float32)
+        sample_rate = target_rate
+
+    container, subtype = FORMATS[fmt]["sf"]
+    with sf.SoundFile(
+        buffer, mode="w", samplerate=sample_rate, channels=channels, format=container, subtype=subtype
+    ) as f:
+        # Stream the render buffer through the encoder block by block
+        for start in range(0, len(samples), ENCODE_BLOCK_FRAMES):
+            f.write(samples[start:start + ENCODE_BLOCK_FRAMES])
+    buffer.seek(0)
+    return buffer
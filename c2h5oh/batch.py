@@ -0,0 +1,333 @@
+"""Batch processing of a whole WESAD dataset across Celery workers.
+
+    python -m c2h5oh.batch WESAD/ batch_out/ [--subjects S2,S3] [--local]
+
+Four stages, each fanned out over the workers and joined before the next:
+
+1. split      per subject: the pickle is split into one .npy per channel, so
+              later tasks memory-map only the channels they read.
+2. analyse    per (subject, channel group, c2h5oh.subjects.CHANNEL_GROUPS),
+              joined by merge_subjects into each subject's curves, stats,
+              plotting pyramid (c2h5oh.pyramid) and feature tables
+              (c2h5oh.feature_index; load_feature_index() queries them).
+              A subject with a failed part is left out of the later stages.
+3. render     per (subject, label, device) with c2h5oh.sensors.
+4. manifest   write_manifest lists every render (or its failure) and the
+              subjects whose analysis failed.
+
+Tasks only exchange paths under the output directory (a filesystem shared by
+the workers), retry with backoff, and leave a marker in progress/ when they
+finish, so batch_progress() can report on a running batch. --local runs the
+whole workflow in this process (task_always_eager), without a broker.
+"""
+import argparse
+import glob
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+from celery import chain, chord, group, shared_task
+
+from .feature_index import FeatureIndex, save_subject_tables
+from .normalisation import curve_stats, stats_from_dict, stats_to_dict
+from .pyramid import save_pyramid
+from .sensors import SEGMENT_DURATION_SEC, render_device_segment
+from .subjects import (
+    CHANNEL_GROUPS,
+    SUBJECT_CURVE_RATE,
+    analyse_channel_group,
+    find_segment,
+    label_curve,
+    missing_curves,
+    pyramid_series,
+)
+
+LABELS = {"baseline": 1, "stress": 2, "fun": 3, "meditation": 4}
+BATCH_DEVICES = ("chest", "wrist")
+MAX_RETRIES = 3
+RETRY_BACKOFF_SEC = 10  # doubled on every retry
+POLL_SEC = 5
+
+
+# --- Layout of the output directory ---
+def _subject_dir(out_dir, subject, *parts):
+    path = os.path.join(out_dir, subject, *parts)
+    os.makedirs(os.path.dirname(path) if parts else path, exist_ok=True)
+    return path
+
+
+def _channel_path(out_dir, subject, device, channel):
+    return _subject_dir(out_dir, subject, "raw", f"{device}_{channel}.npy")
+
+
+def _progress_path(out_dir, name):
+    return os.path.join(out_dir, "progress", f"{name}.json")
+
+
+def _mark_done(out_dir, name, result):
+    path = _progress_path(out_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f)
+    return result
+
+
+def _load_channels(out_dir, subject, device, channels):
+    """Memory-mapped raw channels of one device (missing ones left out)."""
+    arrays = {}
+    for channel in channels:
+        path = _channel_path(out_dir, subject, device, channel)
+        if os.path.exists(path):
+            arrays[channel] = np.load(path, mmap_mode="r")
+    return arrays
+
+
+def _raw_signals(out_dir, subject):
+    """{"signal": {device: {channel: memory-mapped array}}} of a split subject."""
+    signal = {}
+    for path in glob.glob(_subject_dir(out_dir, subject, "raw", "*_*.npy")):
+        device, channel = os.path.basename(path)[:-len(".npy")].split("_", 1)
+        signal.setdefault(device, {})[channel] = np.load(path, mmap_mode="r")
+    return {"signal": signal}
+
+
+def _retry_or_fail(task, exc, out_dir, name, **fields):
+    """Retry with exponential backoff; after the last attempt record the
+    failure (so the join still runs and the manifest shows it)."""
+    if task.request.retries < MAX_RETRIES:
+        raise task.retry(exc=exc, countdown=RETRY_BACKOFF_SEC * 2 ** task.request.retries)
+    return _mark_done(out_dir, name, {**fields, "status": "failed", "error": str(exc)})
+
+
+# --- Tasks ---
+@shared_task(bind=True, acks_late=True, max_retries=MAX_RETRIES)
+def split_subject(self, pickle_path, out_dir, subject):
+    name = f"split-{subject}"
+    try:
+        with open(pickle_path, "rb") as f:
+            data = pickle.load(f, encoding="latin1")
+        for device, channels in data["signal"].items():
+            for channel, values in channels.items():
+                path = _channel_path(out_dir, subject, device, channel)
+                np.save(path + ".tmp.npy", np.asarray(values))
+                os.replace(path + ".tmp.npy", path)
+        np.save(_subject_dir(out_dir, subject, "raw", "label.npy"), np.asarray(data["label"]).ravel())
+        return _mark_done(out_dir, name, {"subject": subject, "status": "ok"})
+    except Exception as e:
+        return _retry_or_fail(self, e, out_dir, name, subject=subject)
+
+
+@shared_task(bind=True, acks_late=True, max_retries=MAX_RETRIES)
+def analyse_group(self, out_dir, subject, group_name):
+    name = f"analyse-{subject}-{group_name}"
+    try:
+        device, channels, _ = CHANNEL_GROUPS[group_name]
+        arrays = _load_channels(out_dir, subject, device, channels)
+        labels = np.load(_subject_dir(out_dir, subject, "raw", "label.npy"), mmap_mode="r")
+        chest, wrist = (arrays, {}) if device == "chest" else ({}, arrays)
+        curves = analyse_channel_group(group_name, chest, wrist, len(label_curve(labels)))
+        np.savez(_subject_dir(out_dir, subject, "parts", f"{group_name}.npz"), **curves)
+        return _mark_done(out_dir, name, {"subject": subject, "group": group_name, "status": "ok"})
+    except Exception as e:
+        return _retry_or_fail(self, e, out_dir, name, subject=subject, group=group_name)
+
+
+def _merge_subject(out_dir, subject):
+    labels = np.load(_subject_dir(out_dir, subject, "raw", "label.npy"), mmap_mode="r")
+    curves = {"label": label_curve(labels)}
+    for part in sorted(glob.glob(_subject_dir(out_dir, subject, "parts", "*.npz"))):
+        with np.load(part) as data:
+            curves.update({name: data[name] for name in data.files})
+    with open(_subject_dir(out_dir, subject, "stats.json"), "w") as f:
+        json.dump(stats_to_dict(curve_stats(curves)), f)
+    series = pyramid_series(_raw_signals(out_dir, subject), curves)
+    save_pyramid(_subject_dir(out_dir, subject, "pyramid"), series)
+    save_subject_tables(_subject_dir(out_dir, subject, "features.npz"), curves, SUBJECT_CURVE_RATE)
+    # curves.npz is written last: the render stage only renders merged subjects
+    path = _subject_dir(out_dir, subject, "curves.npz")
+    np.savez(path + ".tmp.npz", **curves)
+    os.replace(path + ".tmp.npz", path)
+
+
+@shared_task(acks_late=True)
+def merge_subjects(results, out_dir, subjects):
+    """Join of the analysis stage: per subject, the parts become one curves
+    file plus whole-subject normalisation stats, pyramid and feature tables.
+
+    Subjects with a failed analysis part (or whose merge fails) are left
+    out and listed under "failed"; the rest of the batch carries on.
+    """
+    failed = {}
+    for result in results or []:
+        if result.get("status") == "failed":
+            failed.setdefault(result["subject"], f"{result.get('group', 'split')}: {result.get('error', '')}")
+    merged = []
+    for subject in subjects:
+        if subject in failed:
+            continue
+        try:
+            _merge_subject(out_dir, subject)
+            merged.append(subject)
+        except Exception as e:
+            failed[subject] = f"merge: {e}"
+    return _mark_done(out_dir, "merge", {
+        "subjects": merged,
+        "failed": [{"subject": subject, "error": error} for subject, error in sorted(failed.items())],
+        "status": "ok" if not failed else "partial",
+    })
+
+
+@shared_task(bind=True, acks_late=True, max_retries=MAX_RETRIES)
+def render_subject_segment(self, out_dir, subject, label_name, device):
+    name = f"render-{subject}-{label_name}-{device}"
+    entry = {"subject": subject, "label": label_name, "device": device}
+    curves_path = _subject_dir(out_dir, subject, "curves.npz")
+    if not os.path.exists(curves_path):
+        return _mark_done(out_dir, name, {**entry, "status": "skipped", "error": "subject analysis failed"})
+    try:
+        with np.load(curves_path) as data:
+            curves = {key: data[key] for key in data.files}
+        with open(_subject_dir(out_dir, subject, "stats.json")) as f:
+            stats = stats_from_dict(json.load(f))
+        missing = missing_curves(curves, device)
+        if missing:
+            return _mark_done(out_dir, name, {**entry, "status": "skipped", "error": f"no {', '.join(missing)}"})
+        start = find_segment(curves, LABELS[label_name], SEGMENT_DURATION_SEC, middle=True)
+        if start is None:
+            return _mark_done(out_dir, name, {**entry, "status": "skipped", "error": "no full segment"})
+        started = time.perf_counter()
+        song = render_device_segment(curves, stats, start, device)
+        path = _subject_dir(out_dir, subject, "renders", f"{label_name}_{device}.wav")
+        song.export(path, format="wav")
+        return _mark_done(out_dir, name, {
+            **entry, "status": "ok", "path": os.path.relpath(path, out_dir),
+            "render_sec": round(time.perf_counter() - started, 2),
+            "attempts": self.request.retries + 1,
+        })
+    except Exception as e:
+        return _retry_or_fail(self, e, out_dir, name, **entry)
+
+
+@shared_task
+def stage_done(results, out_dir, stage):
+    return _mark_done(out_dir, f"stage-{stage}", {"stage": stage, "status": "ok"})
+
+
+@shared_task
+def write_manifest(results, out_dir, subjects):
+    """Join of the render stage: manifest.json lists every render, and the
+    subjects whose analysis failed."""
+    renders = sorted(results, key=lambda r: (r["subject"], r["label"], r["device"]))
+    with open(_progress_path(out_dir, "merge")) as f:
+        failed_subjects = json.load(f).get("failed", [])
+    manifest = {
+        "subjects": list(subjects),
+        "failed_subjects": failed_subjects,
+        "renders": renders,
+        "counts": {
+            status: sum(r["status"] == status for r in renders)
+            for status in ("ok", "skipped", "failed")
+        },
+    }
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    _mark_done(out_dir, "manifest", {"status": "ok"})
+    return path
+
+
+# --- Workflow ---
+def find_subjects(dataset_dir, only=None):
+    """{subject: pickle path} for a WESAD layout (S2/S2.pkl, ...)."""
+    subjects = {}
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "S*", "S*.pkl"))):
+        subject = os.path.splitext(os.path.basename(path))[0]
+        if only is None or subject in only:
+            subjects[subject] = path
+    return subjects
+
+
+def build_workflow(subjects, out_dir):
+    """The Celery canvas for ``subjects`` ({subject: pickle path})."""
+    names = list(subjects)
+    split = chord(
+        group(split_subject.si(path, out_dir, subject) for subject, path in subjects.items()),
+        stage_done.s(out_dir, "split"),
+    )
+    analyse = chord(
+        group(analyse_group.si(out_dir, subject, g) for subject in names for g in CHANNEL_GROUPS),
+        merge_subjects.s(out_dir, names),
+    )
+    render = chord(
+        group(
+            render_subject_segment.si(out_dir, subject, label_name, device)
+            for subject in names for label_name in LABELS for device in BATCH_DEVICES
+        ),
+        write_manifest.s(out_dir, names),
+    )
+    return chain(split, analyse, render)
+
+
+def planned_tasks(subject_count):
+    splits = subject_count
+    analyses = subject_count * len(CHANNEL_GROUPS)
+    renders = subject_count * len(LABELS) * len(BATCH_DEVICES)
+    # + the split barrier, the merge and the manifest
+    return splits + analyses + renders + 3
+
+
+def batch_progress(out_dir):
+    """{"done", "total", "failed"} of the batch writing to ``out_dir``."""
+    with open(os.path.join(out_dir, "plan.json")) as f:
+        plan = json.load(f)
+    done = failed = 0
+    for path in glob.glob(os.path.join(out_dir, "progress", "*.json")):
+        done += 1
+        with open(path) as f:
+            failed += json.load(f).get("status") == "failed"
+    return {"done": done, "total": plan["tasks"], "failed": failed}
+
+
+def load_feature_index(out_dir):
+    """FeatureIndex (c2h5oh.feature_index) of every merged subject in ``out_dir``."""
+    paths = sorted(glob.glob(os.path.join(out_dir, "*", "features.npz")))
+    return FeatureIndex.of_subjects({os.path.basename(os.path.dirname(path)): path for path in paths})
+
+
+def run_batch(dataset_dir, out_dir, only=None, local=False):
+    subjects = find_subjects(dataset_dir, only)
+    if not subjects:
+        raise ValueError(f"No WESAD subjects found under {dataset_dir}.")
+    os.makedirs(out_dir, exist_ok=True)
+    shutil.rmtree(os.path.join(out_dir, "progress"), ignore_errors=True)
+    with open(os.path.join(out_dir, "plan.json"), "w") as f:
+        json.dump({"subjects": list(subjects), "tasks": planned_tasks(len(subjects))}, f)
+
+    if local:
+        # Local stand-in for a broker: every task runs eagerly in this process.
+        # Eager apply() only replays a task.retry() when it does not propagate;
+        # errors of the joins still surface through result.get().
+        from .celery import app
+
+        app.conf.update(task_always_eager=True, task_eager_propagates=False)
+    result = build_workflow(subjects, out_dir).apply_async()
+    while not result.ready():
+        progress = batch_progress(out_dir)
+        print(f"{progress['done']}/{progress['total']} tasks done, {progress['failed']} failed")
+        time.sleep(POLL_SEC)
+    return result.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse and render a WESAD dataset on Celery workers.")
+    parser.add_argument("dataset_dir")
+    parser.add_argument("out_dir")
+    parser.add_argument("--subjects", default=None, help="comma-separated, e.g. S2,S3")
+    parser.add_argument("--local", action="store_true", help="run in-process without a broker")
+    args = parser.parse_args()
+    only = set(args.subjects.split(",")) if args.subjects else None
+    print(f"Manifest written to {run_batch(args.dataset_dir, args.out_dir, only, args.local)}")
@@ -0,0 +1,343 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+
+# --- Shared render cache ---
+# A cache tier in front of each host's render store, shared by every web and
+# Celery host when it is backed by Redis: analysis curves and rendered audio
+# computed on one node are found by the others. Values are stored in chunks
+# under a manifest (so large WAVs never become one huge Redis value) and
+# get_or_compute() makes concurrent identical requests wait for one render.
+CACHE_CHUNK_BYTES = 1024 * 1024
+LOCK_TTL_SEC = 600  # a crashed renderer's lock expires after this
+LOCK_POLL_SEC = 0.2
+
+
+# --- Backends ---
+# A backend stores bytes under str keys: get(key), set(key, value, ttl=None),
+# add(key, value, ttl=None) (set only if absent; True if it was set) and
+# delete(*keys). ttl is in seconds, None for no expiry.
+class MemoryBackend:
+    """In-process, least recently used entries dropped beyond ``max_bytes``."""
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires at or None)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            self._pop(key)
+            return None
+        return entry
+
+    def _pop(self, key):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key, value, ttl):
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._pop(next(iter(self._entries)))
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, bytes(value), ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key, time.monotonic()) is not None:
+                return False
+            self._set(key, bytes(value), ttl)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._pop(key)
+
+
+class DiskBackend:
+    """One file per key under ``directory``; the first 8 bytes hold the expiry."""
+
+    NO_EXPIRY = 0.0
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def _header(ttl):
+        return np.float64(time.time() + ttl if ttl else DiskBackend.NO_EXPIRY).tobytes()
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < 8:
+            return None  # never written by set() / add(), which publish whole files
+        expires = float(np.frombuffer(data[:8], dtype=np.float64)[0])
+        if expires != self.NO_EXPIRY and expires <= time.time():
+            return None
+        return data[8:]
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def _write_tmp(self, path, value, ttl):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._header(ttl))
+            f.write(value)
+        return tmp_path
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        os.replace(self._write_tmp(path, value, ttl), path)
+
+    def add(self, key, value, ttl=None):
+        path = self._path(key)
+        if os.path.exists(path) and self._read(path) is None:
+            self.delete(key)  # expired
+        # The complete file is linked into place (link fails if the key
+        # exists), so a writer dying midway never leaves a half-written key
+        tmp_path = self._write_tmp(path, value, ttl)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class RedisBackend:
+    """Any client with redis-py's get / set(ex=, nx=) / delete, e.g. redis.Redis."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, ex=int(ttl) if ttl else None, nx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+class FakeRedis:
+    """Embedded stand-in for the part of redis-py RedisBackend uses, so the
+    Redis code path runs (and can be exercised) without a redis-server."""
+
+    def __init__(self):
+        self._memory = MemoryBackend(max_bytes=float("inf"))
+
+    def get(self, name):
+        return self._memory.get(name)
+
+    def set(self, name, value, ex=None, nx=False):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        if nx:
+            return True if self._memory.add(name, value, ex) else None
+        self._memory.set(name, value, ex)
+        return True
+
+    def delete(self, *names):
+        self._memory.delete(*names)
+        return len(names)
+
+
+# --- Chunked values and single flight ---
+class RenderCache:
+    def __init__(self, backend, ttl=None, chunk_bytes=CACHE_CHUNK_BYTES, prefix="c2h5oh"):
+        self.backend = backend
+        self.ttl = ttl
+        self.chunk_bytes = chunk_bytes
+        self.prefix = prefix
+        self._local_locks = {}  # key -> [lock, threads using it]; dropped when unused
+        self._local_locks_lock = threading.Lock()
+
+    def _key(self, key, *parts):
+        return ":".join((self.prefix, key) + parts)
+
+    def _manifest(self, key):
+        manifest = self.backend.get(self._key(key))
+        return json.loads(manifest) if manifest is not None else None
+
+    def get(self, key):
+        """The cached bytes, or None (also when a chunk has already expired)."""
+        manifest = self._manifest(key)
+        if manifest is None:
+            return None
+        chunks = []
+        for i in range(manifest["chunks"]):
+            chunk = self.backend.get(self._key(key, manifest["id"], str(i)))
+            if chunk is None:
+                return None
+            chunks.append(chunk)
+        value = b"".join(chunks)
+        return value if len(value) == manifest["size"] else None
+
+    def set(self, key, value, ttl=None):
+        """Store ``value`` in chunks; the manifest is written last, so readers
+        never see a partial value, and the previous version's chunks go."""
+        ttl = ttl or self.ttl
+        value = memoryview(value).cast("B")
+        version = uuid.uuid4().hex
+        count = max(1, -(-len(value) // self.chunk_bytes))
+        for i in range(count):
+            chunk = value[i * self.chunk_bytes:(i + 1) * self.chunk_bytes]
+            self.backend.set(self._key(key, version, str(i)), chunk.tobytes(), ttl)
+        previous = self._manifest(key)
+        manifest = {"id": version, "chunks": count, "size": len(value)}
+        self.backend.set(self._key(key), json.dumps(manifest).encode("utf-8"), ttl)
+        if previous is not None:
+            self.backend.delete(*(
+                self._key(key, previous["id"], str(i)) for i in range(previous["chunks"])
+            ))
+
+    def delete(self, key):
+        manifest = self._manifest(key)
+        self.backend.delete(self._key(key))
+        if manifest is not None:
+            self.backend.delete(*(
+                self._key(key, manifest["id"], str(i)) for i in range(manifest["chunks"])
+            ))
+
+    @contextmanager
+    def _local_lock(self, key):
+        with self._local_locks_lock:
+            entry = self._local_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._local_locks_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._local_locks[key]
+
+    def get_or_compute(self, key, compute, ttl=None, lock_ttl=LOCK_TTL_SEC):
+        """The cached bytes for ``key``, else compute() them once for everyone.
+
+        Threads of this process queue on a local lock; other processes / hosts
+        wait while a lock key in the backend is held, polling for the value. A
+        waiter whose renderer died (the lock expired without a value) computes
+        the value itself.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._local_lock(key):
+            lock_key, token = self._key(key, "lock"), uuid.uuid4().hex.encode("utf-8")
+            while True:
+                value = self.get(key)
+                if value is not None:
+                    return value
+                if self.backend.add(lock_key, token, lock_ttl):
+                    break
+                time.sleep(LOCK_POLL_SEC)
+            try:
+                value = compute()
+                self.set(key, value, ttl)
+                return value
+            finally:
+                # Not atomic without a server-side script; the window only
+                # matters if the lock expired mid-render
+                if self.backend.get(lock_key) == token:
+                    self.backend.delete(lock_key)
+
+    # Arrays (analysis curves) go through npz
+    def get_arrays(self, key):
+        value = self.get(key)
+        return _from_npz(value) if value is not None else None
+
+    def set_arrays(self, key, arrays, ttl=None):
+        self.set(key, _to_npz(arrays), ttl)
+
+    def get_or_compute_arrays(self, key, compute, ttl=None):
+        return _from_npz(self.get_or_compute(key, lambda: _to_npz(compute()), ttl))
+
+
+def _to_npz(arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _from_npz(value):
+    with np.load(io.BytesIO(value)) as data:
+        return {name: data[name] for name in data.files}
+
+
+def create_backend(name, url=None, directory=None):
+    """A backend by name: "memory", "disk", "redis" or "fake-redis"."""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "disk":
+        return DiskBackend(directory or os.path.join(settings.RENDER_STORE_DIR, "cache"))
+    if name == "redis":
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(url))
+    if name == "fake-redis":
+        return RedisBackend(FakeRedis())
+    raise ValueError(f"Unknown render cache backend '{name}'.")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """The process-wide RenderCache configured by RENDER_CACHE_* settings."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = create_backend(settings.RENDER_CACHE_BACKEND, settings.RENDER_CACHE_URL)
+            _cache = RenderCache(backend, ttl=settings.RENDER_CACHE_TTL_SEC)
+        return _cache
@@ -0,0 +1,10 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "c2h5oh.settings")
+
+app = Celery("c2h5oh")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks(["c2h5oh"])
+app.autodiscover_tasks(["c2h5oh"], related_name="batch")
@@ -0,0 +1,110 @@
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+
+# --- Downloads from the render store ---
+# Stored artifacts never change under their key: the key hashes the upload
+# with the generator and subject analysis versions and the render config
+# (views.upload_key, render_batch.spec_key). So they get a strong ETag made
+# from the key and a year of immutable caching. Repeat plays become a 304
+# (or no request at all) and seeks fetch just the byte range they need.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_CHUNK_SIZE = 64 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def artifact_etag(key, *parts):
+    """Strong ETag of the artifact ``parts`` (e.g. its extension) under ``key``."""
+    return '"' + "-".join((key,) + tuple(str(part) for part in parts)) + '"'
+
+
+def _etag_matches(header, etag):
+    """If-None-Match semantics: weak comparison, "*" matches anything."""
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def parse_range(header, size):
+    """(start, end) inclusive of a single "bytes=" range, None to serve the
+    whole file (no or unsupported header, multiple ranges), or "unsatisfiable"."""
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix: the last N bytes
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def conditional_response(request, etag, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """A 304 when ``request`` already holds ``etag``, else None."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+    return None
+
+
+def with_validators(response, etag, cache_control=IMMUTABLE_CACHE_CONTROL):
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+def file_response(request, path, etag, content_type, filename=None, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """Serve ``path`` straight from disk, honouring If-None-Match (304),
+    Range (206 / 416) and If-Range. ``filename`` makes it an attachment."""
+    not_modified = conditional_response(request, etag, cache_control)
+    if not_modified is not None:
+        return not_modified
+
+    size = os.path.getsize(path)
+    byte_range = parse_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range.strip() != etag:
+        byte_range = None  # the client's partial copy is of another version: send it all
+
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif byte_range is None:
+        response = FileResponse(
+            open(path, "rb"), as_attachment=filename is not None, filename=filename or "",
+            content_type=content_type,
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+        if filename is not None:
+            response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["Accept-Ranges"] = "bytes"
+    return with_validators(response, etag, cache_control)
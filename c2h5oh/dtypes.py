@@ -0,0 +1,103 @@
+import numpy as np
+
+
+# --- dtype policy ---
+# Every sample array is float32 end to end: raw signals at ingest, analysis
+# curves, the subject / feature store, synthesis and the mix buffers. int16
+# appears only at export (audio_arrays.array_to_segment). float64 is kept
+# only where values are *accumulated* over millions of samples (oscillator
+# phase, running sums), where float32 would drift.
+SIGNAL_DTYPE = np.float32
+AUDIO_DTYPE = np.float32
+PCM_DTYPE = np.int16
+
+
+def as_signal(values):
+    """A flat float32 signal; no copy if it already is one."""
+    return np.asarray(values, dtype=SIGNAL_DTYPE).ravel()
+
+
+def float_array(values):
+    """``values`` as an array, keeping a float dtype and making anything else float32.
+
+    Compute functions use this so they run in their caller's precision (which
+    is float32 under this policy, and float64 in the parity checks).
+    """
+    values = np.asarray(values)
+    return values if np.issubdtype(values.dtype, np.floating) else values.astype(SIGNAL_DTYPE)
+
+
+def as_signals(mapping):
+    """as_signal() over a dict of arrays (e.g. analysed curves), ints kept as-is."""
+    return {
+        name: values if np.issubdtype(np.asarray(values).dtype, np.integer) else as_signal(values)
+        for name, values in mapping.items()
+    }
+
+
+# --- float32 / float64 parity ---
+def _cast(value, dtype):
+    if isinstance(value, np.ndarray) and np.issubdtype(value.dtype, np.floating):
+        return value.astype(dtype)
+    return value
+
+
+def _flatten(output):
+    if isinstance(output, dict):
+        return {name: np.asarray(value, dtype=np.float64) for name, value in output.items()}
+    return {"output": np.asarray(output, dtype=np.float64)}
+
+
+def parity(func, *args, **kwargs):
+    """Run ``func`` on float64 and on float32 copies of its array arguments.
+
+    Returns {output name: {"max_abs", "max_rel"}}, max_rel being relative to
+    the float64 output's range.
+    """
+    reference = _flatten(func(*(_cast(a, np.float64) for a in args), **kwargs))
+    candidate = _flatten(func(*(_cast(a, np.float32) for a in args), **kwargs))
+    report = {}
+    for name, expected in reference.items():
+        error = np.abs(candidate[name] - expected)
+        span = float(np.ptp(expected)) if expected.size else 0.0
+        max_abs = float(error.max()) if error.size else 0.0
+        report[name] = {"max_abs": max_abs, "max_rel": max_abs / (span or 1.0)}
+    return report
+
+
+def run_parity_checks(seconds=60, sampling_rate=700, frame_rate=44100, seed=0):
+    """Parity of the hot paths on synthetic signals; returns {check: report}."""
+    from .engine import render_onset_train
+    from .filters import one_pole_lowpass
+    from .heart_rate import fast_heart_rate
+    from .multirate import process_slow_channels
+    from .normalisation import ChannelStats
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * sampling_rate) / sampling_rate
+    ecg = np.sin(2 * np.pi * 1.2 * t) ** 63 + 0.05 * rng.standard_normal(len(t))
+    eda = 2 + 0.3 * np.sin(2 * np.pi * t / 40) + 0.01 * rng.standard_normal(len(t))
+    resp = np.sin(2 * np.pi * 0.25 * t) + 0.05 * rng.standard_normal(len(t))
+    audio = rng.uniform(-1, 1, seconds * frame_rate)
+    drum = np.sin(2 * np.pi * 60 * np.arange(4410) / frame_rate)
+    onsets = [(ms, 1.0) for ms in range(0, seconds * 1000, 500)]
+
+    def slow_channels(eda, resp):
+        curves = process_slow_channels(sampling_rate, eda=eda, resp=resp)
+        return {name: np.asarray(curve) for name, curve in curves.items()}
+
+    return {
+        "fast_heart_rate": parity(fast_heart_rate, ecg, sampling_rate),
+        "slow_channels": parity(slow_channels, eda, resp),
+        "one_pole_lowpass": parity(one_pole_lowpass, audio, 1000, frame_rate),
+        "onset_train": parity(
+            lambda sample: render_onset_train(sample, onsets, frame_rate, len(audio)), drum
+        ),
+        "normalise": parity(lambda x: ChannelStats.of(x).normalise(x), eda),
+    }
+
+
+if __name__ == "__main__":
+    for check, report in run_parity_checks().items():
+        for name, errors in report.items():
+            print(f"{check:<18} {name:<12} max abs {errors['max_abs']:.2e}  max rel {errors['max_rel']:.2e}")
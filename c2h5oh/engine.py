@@ -0,0 +1,352 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import NamedTuple
+
+import numpy as np
+from scipy.signal import oaconvolve
+
+from .audio_arrays import as_array, db_to_gain
+from .stems import STEM_NAMES
+
+
+# --- Beat events ---
+# Generators are split in two: a cheap planning pass that walks the beat grid
+# and decides *what* plays *when* (a list of BeatEvents), and a synthesis pass
+# that renders those events into per-stem float32 buffers. Events are plain
+# hashable tuples, so two plans can be diffed to find exactly which sounds a
+# config change added or removed.
+class BeatEvent(NamedTuple):
+    position_ms: float
+    stem: str
+    instrument: str
+    params: tuple  # sorted (keyword, value) pairs passed to the instrument
+    gain_db: float = 0.0
+
+    @property
+    def duration_ms(self):
+        return dict(self.params)["dur_ms"]
+
+
+def beat_event(stem, position_ms, instrument, dur_ms, gain_db=0.0, **params):
+    params["dur_ms"] = float(dur_ms)
+    return BeatEvent(
+        float(position_ms), stem, instrument, tuple(sorted(params.items())), float(gain_db)
+    )
+
+
+def _samples(ms, frame_rate):
+    return int(round(ms * frame_rate / 1000))
+
+
+def render_sound(instruments, event, frame_rate, preview=False, cache=None, sample_source=None):
+    """Synthesise one event as float32 samples; identical sounds are memoised.
+
+    ``sample_source(event, frame_rate, preview)`` may supply the samples
+    instead (e.g. zero-copy views into the shared sample bank); it returns
+    None for anything it cannot provide.
+    """
+    samples = sample_source(event, frame_rate, preview) if sample_source is not None else None
+    if samples is not None:
+        if event.gain_db:
+            samples = samples * db_to_gain(event.gain_db)
+        return samples
+    key = (event.instrument, event.params, preview)
+    samples = cache.get(key) if cache is not None else None
+    if samples is None:
+        sound = instruments[event.instrument](preview=preview, **dict(event.params))
+        samples = as_array(sound, frame_rate)
+        if cache is not None:
+            cache[key] = samples
+    if event.gain_db:
+        samples = samples * db_to_gain(event.gain_db)
+    return samples
+
+
+# --- Onset trains ---
+# Repeated one-shots (drum hits) are not placed one by one: every hit of the
+# same sound becomes an impulse (scaled by its velocity) in a sparse train,
+# and the train is convolved with the sample once (overlap-add FFT). The cost
+# is a few vector operations per drum, however many hits there are.
+def render_onset_train(sample, onsets, frame_rate, length, offset=0):
+    """``sample`` placed at every (position_ms, gain) onset.
+
+    Returns ``length`` float32 samples starting at sample ``offset``; hits
+    straddling either edge are clipped like in mix_events_into.
+    """
+    out = np.zeros(length, dtype=np.float32)
+    if not onsets or len(sample) == 0:
+        return out
+    positions_ms, gains = zip(*onsets)
+    starts = np.round(np.asarray(positions_ms) * frame_rate / 1000).astype(np.int64) - offset
+    gains = np.asarray(gains, dtype=np.float32)
+    keep = (starts < length) & (starts + len(sample) > 0)
+    if not keep.any():
+        return out
+    starts, gains = starts[keep], gains[keep]
+    lead = max(0, -int(starts.min()))  # room for hits that start before the window
+    train = np.zeros(length + lead, dtype=np.float32)
+    np.add.at(train, starts + lead, gains)
+    out[:] = oaconvolve(train, sample)[lead:lead + length]
+    return out
+
+
+def mix_onset_trains_into(buffers, offset, events, instruments, frame_rate, preview=False,
+                          cache=None, sample_source=None):
+    """Add ``events`` into ``buffers`` with one onset train per distinct sound."""
+    trains = {}
+    for event in events:
+        if event.stem in buffers:
+            key = (event.stem, event.instrument, event.params)
+            trains.setdefault(key, []).append((event.position_ms, db_to_gain(event.gain_db)))
+    for (stem, instrument, params), onsets in trains.items():
+        sample = render_sound(
+            instruments, BeatEvent(0.0, stem, instrument, params), frame_rate, preview,
+            cache, sample_source,
+        )
+        buffer = buffers[stem]
+        buffer += render_onset_train(sample, onsets, frame_rate, len(buffer), offset)
+
+
+# --- Continuous voices ---
+# Some instruments (textures) are not rendered per event at all: a voice
+# callable(events, length, frame_rate, preview) synthesises all of a stem's
+# events of that instrument as one continuous signal from sample 0, treating
+# the events as automation control points.
+def mix_continuous_into(buffers, offset, events, voices, frame_rate, preview=False):
+    for instrument, voice in voices.items():
+        for stem, buffer in buffers.items():
+            voice_events = [e for e in events if e.instrument == instrument and e.stem == stem]
+            if voice_events:
+                buffer += voice(voice_events, offset + len(buffer), frame_rate, preview)[offset:]
+
+
+def mix_events_into(buffers, offset, events, instruments, frame_rate, preview=False,
+                    cache=None, sample_source=None, onset_instruments=(),
+                    continuous_instruments=None):
+    """Add events into ``buffers`` (stem -> float32 array starting at sample
+    ``offset``). Events outside the buffers are skipped, straddling ones are
+    clipped.
+
+    Events of ``onset_instruments`` are rendered first, as onset trains, and
+    those of ``continuous_instruments`` (instrument -> voice) as continuous
+    voices.
+    """
+    if continuous_instruments:
+        mix_continuous_into(buffers, offset, events, continuous_instruments, frame_rate, preview)
+        events = [e for e in events if e.instrument not in continuous_instruments]
+    if onset_instruments:
+        mix_onset_trains_into(
+            buffers, offset, [e for e in events if e.instrument in onset_instruments],
+            instruments, frame_rate, preview, cache, sample_source,
+        )
+        events = [e for e in events if e.instrument not in onset_instruments]
+    for event in sorted(events):
+        buffer = buffers.get(event.stem)
+        if buffer is None:
+            continue
+        start = _samples(event.position_ms, frame_rate) - offset
+        if start >= len(buffer) or start + _samples(event.duration_ms, frame_rate) <= 0:
+            continue
+        samples = render_sound(instruments, event, frame_rate, preview, cache, sample_source)
+        lo, hi = max(start, 0), min(start + len(samples), len(buffer))
+        if hi > lo:
+            buffer[lo:hi] += samples[lo - start:hi - start]
+
+
+# --- Block-parallel mixing ---
+# Long timelines are cut into fixed blocks that are mixed on a thread pool.
+# Each block is a disjoint view of the stem buffers, so workers never write
+# to the same samples; an event spanning a block edge is handed to every
+# block it overlaps and clipped by each. NumPy / SciPy release the GIL in
+# the heavy parts (adds, FFTs, filters), so threads scale without processes.
+# Renders that already run side by side (c2h5oh.admission) cap their own
+# mixer with mixer_workers(), so the two pools never multiply up to cores².
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or (os.cpu_count() or 1)
+RENDER_BLOCK_MS = 5000
+_mixer_workers = ContextVar("mixer_workers", default=None)
+
+
+@contextmanager
+def mixer_workers(workers):
+    """Mix renders started inside this block on at most ``workers`` threads."""
+    token = _mixer_workers.set(workers)
+    try:
+        yield
+    finally:
+        _mixer_workers.reset(token)
+
+
+def _workers(workers):
+    limit = _mixer_workers.get()
+    workers = RENDER_WORKERS if workers is None else workers
+    return workers if limit is None else max(1, min(workers, limit))
+
+
+def mix_blocks_into(buffers, events, instruments, frame_rate, preview=False, cache=None,
+                    sample_source=None, onset_instruments=(), workers=None,
+                    block_ms=RENDER_BLOCK_MS):
+    """mix_events_into over ``buffers`` (starting at sample 0), block by block
+    on ``workers`` threads (RENDER_WORKERS by default)."""
+    workers = _workers(workers)
+    length = max((len(buffer) for buffer in buffers.values()), default=0)
+    block = max(_samples(block_ms, frame_rate), 1)
+    events = sorted(events)
+    starts = np.array([_samples(e.position_ms, frame_rate) for e in events], dtype=np.int64)
+    ends = starts + np.array([_samples(e.duration_ms, frame_rate) for e in events], dtype=np.int64)
+
+    def mix_block(lo):
+        hi = min(lo + block, length)
+        overlapping = np.flatnonzero((starts < hi) & (ends > lo))
+        mix_events_into(
+            {name: buffer[lo:hi] for name, buffer in buffers.items()}, lo,
+            [events[i] for i in overlapping], instruments, frame_rate, preview, cache,
+            sample_source, onset_instruments,
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(mix_block, range(0, length, block)))
+
+
+# --- Render deadlines ---
+# A deadline (previews) never shortens the timeline: stems are rendered whole,
+# one after another in ``stems`` order, and once the deadline has passed the
+# remaining ones are left silent. ESSENTIAL_STEMS are rendered regardless, so
+# a late preview still plays the full segment, just with fewer layers.
+ESSENTIAL_STEMS = ("drums",)
+
+
+def _mix_into(buffers, events, instruments, frame_rate, preview, cache, sample_source,
+              onset_instruments, continuous_instruments, workers):
+    length = max((len(buffer) for buffer in buffers.values()), default=0)
+    if workers > 1 and length > _samples(RENDER_BLOCK_MS, frame_rate):
+        if continuous_instruments:
+            mix_continuous_into(buffers, 0, events, continuous_instruments, frame_rate, preview)
+            events = [e for e in events if e.instrument not in continuous_instruments]
+        mix_blocks_into(
+            buffers, events, instruments, frame_rate, preview, cache, sample_source,
+            onset_instruments, workers,
+        )
+    else:
+        mix_events_into(
+            buffers, 0, events, instruments, frame_rate, preview, cache, sample_source,
+            onset_instruments, continuous_instruments,
+        )
+
+
+def render_events(events, instruments, total_ms, frame_rate, preview=False,
+                  stems=STEM_NAMES, deadline=None, cache=None, sample_source=None,
+                  onset_instruments=(), continuous_instruments=None, workers=None):
+    """Render a whole plan into per-stem buffers of ``total_ms``.
+
+    With more than one worker, timelines longer than a block are mixed
+    block-parallel (continuous voices are rendered whole first). With a
+    ``deadline`` (a time.monotonic() value) the stems are rendered in order
+    and those not started by then, ESSENTIAL_STEMS aside, stay silent.
+    """
+    cache = {} if cache is None else cache
+    workers = _workers(workers)
+    length = _samples(total_ms, frame_rate)
+    buffers = {name: np.zeros(length, dtype=np.float32) for name in stems}
+    mix = partial(
+        _mix_into, instruments=instruments, frame_rate=frame_rate, preview=preview, cache=cache,
+        sample_source=sample_source, onset_instruments=onset_instruments,
+        continuous_instruments=continuous_instruments, workers=workers,
+    )
+    if deadline is None:
+        mix(buffers, events)
+        return buffers
+    dropped = []
+    for name in sorted(stems, key=lambda name: name not in ESSENTIAL_STEMS):
+        if name not in ESSENTIAL_STEMS and time.monotonic() > deadline:
+            dropped.append(name)
+            continue
+        mix({name: buffers[name]}, [e for e in events if e.stem == name])
+    if dropped:
+        print(f"Preview budget reached, left out: {', '.join(dropped)}")
+    return buffers
+
+
+def changed_ranges(old_events, new_events, stem):
+    """Merged (start_ms, end_ms) spans of one stem where two plans differ."""
+    old = {e for e in old_events if e.stem == stem}
+    new = {e for e in new_events if e.stem == stem}
+    spans = sorted((e.position_ms, e.position_ms + e.duration_ms) for e in old ^ new)
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+
+# --- Incremental re-render ---
+class IncrementalRenderer:
+    """Re-renders only what a config change touches.
+
+    Holds one segment's analysis ``features`` (never recomputed), the last
+    plan and the stem buffers. On render(config) the plan is rebuilt (cheap),
+    the config fields that changed select the affected stems, and within those
+    stems only the time ranges whose events differ are cleared and
+    re-synthesised. Everything else is reused as-is.
+    """
+
+    def __init__(self, plan, instruments, features, total_ms, frame_rate, sample_source=None,
+                 onset_instruments=(), continuous_instruments=None):
+        self.plan = plan  # callable(features, config) -> list of BeatEvents
+        self.instruments = instruments
+        self.sample_source = sample_source
+        self.onset_instruments = onset_instruments
+        self.continuous_instruments = continuous_instruments or {}
+        self.features = features
+        self.total_ms = total_ms
+        self.frame_rate = frame_rate
+        self.config = None
+        self.events = None
+        self.stems = None
+        self.sound_cache = {}
+
+    def prime(self, config, stem_arrays):
+        """Adopt stems that were already rendered (e.g. cached) with ``config``."""
+        self.config = config
+        self.events = self.plan(self.features, config)
+        self.stems = {name: np.array(samples, dtype=np.float32) for name, samples in stem_arrays.items()}
+
+    def render(self, config):
+        """Returns (stems, stats); stats says what was actually re-synthesised."""
+        events = self.plan(self.features, config)
+        if self.stems is None:
+            self.stems = render_events(
+                events, self.instruments, self.total_ms, self.frame_rate,
+                cache=self.sound_cache, sample_source=self.sample_source,
+                onset_instruments=self.onset_instruments,
+                continuous_instruments=self.continuous_instruments,
+            )
+            self.config, self.events = config, events
+            return self.stems, {"full": True, "ranges": {}}
+
+        ranges = {}
+        for stem in sorted(self.config.affected_stems(config)):
+            stem_events = [e for e in events if e.stem == stem]
+            spans = changed_ranges(self.events, events, stem)
+            if spans and any(e.instrument in self.continuous_instruments for e in stem_events):
+                # A moved control point reshapes the curves on both sides of it
+                spans = [(0.0, self.total_ms)]
+            for start_ms, end_ms in spans:
+                lo = _samples(start_ms, self.frame_rate)
+                hi = min(_samples(end_ms, self.frame_rate), len(self.stems[stem]))
+                window = self.stems[stem][lo:hi]
+                window[:] = 0.0
+                mix_events_into(
+                    {stem: window}, lo, stem_events, self.instruments,
+                    self.frame_rate, cache=self.sound_cache, sample_source=self.sample_source,
+                    onset_instruments=self.onset_instruments,
+                    continuous_instruments=self.continuous_instruments,
+                )
+                ranges.setdefault(stem, []).append((start_ms, end_ms))
+        self.config, self.events = config, events
+        return self.stems, {"full": False, "ranges": ranges}
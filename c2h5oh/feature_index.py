@@ -0,0 +1,254 @@
+import os
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .normalisation import ChannelStats
+
+
+# --- Feature index of moments across subjects ---
+# The per-second table check.export_for_music_app writes as JSON (kick, hats,
+# bass, melody, pads in 0-1, plus a bio state) is built at ingest from the
+# subject curves and stored per subject as compact arrays, next to a coarser
+# table of overlapping windows. FeatureIndex concatenates the subjects and
+# answers "which moments are calm / have kick above 0.8" as array masks and
+# "which moments sound like this one" with a KD-tree (scikit-learn), so
+# picking source windows for renders is a query instead of a scan of every
+# subject's curves.
+FEATURE_CURVES = {"kick": "hr", "hats": "eda", "bass": "emg_amplitude", "melody": "resp_rate", "pads": "temp"}
+FEATURES = tuple(FEATURE_CURVES)
+BIO_STATES = ("Calm", "Neutral", "High Arousal")
+HIGH_AROUSAL_LEVEL = 1.3  # kick + hats above this is "High Arousal"
+CALM_LEVEL = 0.6  # and below this "Calm"
+WINDOW_SEC = 10
+WINDOW_HOP_SEC = 5
+LEVELS = {"second": 1, "window": WINDOW_SEC}  # level: seconds per moment
+
+
+def bio_states(kick, hats):
+    """Index into BIO_STATES of every (kick, hats) level pair."""
+    arousal = np.asarray(kick) + np.asarray(hats)
+    return np.where(arousal > HIGH_AROUSAL_LEVEL, 2, np.where(arousal < CALM_LEVEL, 0, 1)).astype(np.int8)
+
+
+def _per_second(curve, seconds, rate):
+    blocks = np.asarray(curve[: seconds * rate], dtype=np.float32).reshape(seconds, rate)
+    if not np.isnan(blocks).any():
+        return blocks.mean(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN seconds stay NaN
+        return np.nanmean(blocks, axis=1)
+
+
+def second_table(curves, rate):
+    """Per-second moments of one subject's curves (sampled at ``rate``).
+
+    Each curve is averaged per second and min/max scaled over the subject,
+    as in check.export_for_music_app; a missing curve is a NaN column.
+    """
+    seconds = len(curves["label"]) // rate
+    columns = []
+    for name in FEATURES:
+        curve = curves.get(FEATURE_CURVES[name])
+        if curve is None:
+            columns.append(np.full(seconds, np.nan, dtype=np.float32))
+            continue
+        values = _per_second(curve, seconds, rate)
+        columns.append(np.clip(ChannelStats.of(values).normalise(values, method="minmax"), 0.0, 1.0))
+    features = np.stack(columns, axis=1).astype(np.float32) if seconds else np.empty((0, len(FEATURES)), np.float32)
+    return {
+        "start_sec": np.arange(seconds, dtype=np.int32),
+        "features": features,
+        "label": np.asarray(curves["label"][rate // 2 : seconds * rate : rate], dtype=np.int8),
+        "bio_state": bio_states(features[:, 0], features[:, 1]),
+    }
+
+
+def window_table(seconds, window_sec=WINDOW_SEC, hop_sec=WINDOW_HOP_SEC):
+    """Windows of ``window_sec`` every ``hop_sec`` over a second_table():
+    features are the per-feature means then standard deviations, the label
+    is the most common one and the bio state that of the mean levels."""
+    features = seconds["features"]
+    if len(features) < window_sec:
+        return {
+            "start_sec": np.empty(0, np.int32), "features": np.empty((0, 2 * len(FEATURES)), np.float32),
+            "label": np.empty(0, np.int8), "bio_state": np.empty(0, np.int8),
+        }
+    windows = sliding_window_view(features, window_sec, axis=0)[::hop_sec]  # (windows, features, window_sec)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns stay NaN
+        means, stds = np.nanmean(windows, axis=2), np.nanstd(windows, axis=2)
+    labels = sliding_window_view(seconds["label"], window_sec)[::hop_sec].astype(np.int64)
+    return {
+        "start_sec": np.arange(len(windows), dtype=np.int32) * hop_sec,
+        "features": np.hstack((means, stds)).astype(np.float32),
+        "label": np.array([np.bincount(row - row.min()).argmax() + row.min() for row in labels], dtype=np.int8),
+        "bio_state": bio_states(means[:, 0], means[:, 1]),
+    }
+
+
+def subject_tables(curves, rate):
+    """{"<level>_<column>": array} of one subject, ready for np.savez."""
+    seconds = second_table(curves, rate)
+    tables = {"second": seconds, "window": window_table(seconds)}
+    return {f"{level}_{column}": values for level, table in tables.items() for column, values in table.items()}
+
+
+def save_subject_tables(path, curves, rate):
+    """Write subject_tables() of ``curves`` to the .npz ``path`` (atomically)."""
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **subject_tables(curves, rate))
+    os.replace(tmp_path, path)
+    return path
+
+
+class FeatureIndex:
+    """Moments of many subjects: per level, one concatenated array per
+    column plus the subject of each row."""
+
+    def __init__(self, subject_ids, tables):
+        self.subject_ids = list(subject_ids)
+        self.tables = tables  # {level: {"subject", "start_sec", "features", "label", "bio_state"}}
+        self._trees = {}
+
+    @classmethod
+    def of_subjects(cls, subjects):
+        """Index of ``subjects`` ({subject_id: subject_tables() or npz path})."""
+        subject_ids, parts = [], {level: [] for level in LEVELS}
+        for code, (subject_id, arrays) in enumerate(subjects.items()):
+            if isinstance(arrays, str):
+                with np.load(arrays) as data:
+                    arrays = {name: data[name] for name in data.files}
+            subject_ids.append(subject_id)
+            for level in LEVELS:
+                table = {column: arrays[f"{level}_{column}"] for column in ("start_sec", "features", "label", "bio_state")}
+                table["subject"] = np.full(len(table["start_sec"]), code, dtype=np.int32)
+                parts[level].append(table)
+        tables = {}
+        for level, level_parts in parts.items():
+            width = len(FEATURES) * (2 if level == "window" else 1)
+            tables[level] = {
+                column: np.concatenate([part[column] for part in level_parts]) if level_parts else empty
+                for column, empty in (
+                    ("subject", np.empty(0, np.int32)), ("start_sec", np.empty(0, np.int32)),
+                    ("features", np.empty((0, width), np.float32)), ("label", np.empty(0, np.int8)),
+                    ("bio_state", np.empty(0, np.int8)),
+                )
+            }
+        return cls(subject_ids, tables)
+
+    def __len__(self):
+        return len(self.tables["second"]["start_sec"])
+
+    def _table(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}'. Expected any of: {', '.join(LEVELS)}.")
+        return self.tables[level]
+
+    def select(self, level="second", bio_state=None, labels=None, subjects=None, ranges=None):
+        """Rows of ``level`` matching every filter given: ``bio_state`` (a
+        name in BIO_STATES), ``labels`` (label ids), ``subjects`` (ids) and
+        ``ranges`` ({feature: (low, high)}, either bound None; on windows the
+        bounds apply to the feature's mean). Rows in subject then time order."""
+        table = self._table(level)
+        mask = np.ones(len(table["start_sec"]), dtype=bool)
+        if bio_state is not None:
+            if bio_state not in BIO_STATES:
+                raise ValueError(f"Unknown bio state '{bio_state}'. Expected any of: {', '.join(BIO_STATES)}.")
+            mask &= table["bio_state"] == BIO_STATES.index(bio_state)
+        if labels is not None:
+            mask &= np.isin(table["label"], list(labels))
+        if subjects is not None:
+            codes = [self.subject_ids.index(s) for s in subjects if s in self.subject_ids]
+            mask &= np.isin(table["subject"], codes)
+        for name, (low, high) in (ranges or {}).items():
+            if name not in FEATURES:
+                raise ValueError(f"Unknown feature '{name}'. Expected any of: {', '.join(FEATURES)}.")
+            column = table["features"][:, FEATURES.index(name)]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        return np.flatnonzero(mask)
+
+    def row_of(self, level, subject_id, start_sec):
+        """Row of the ``level`` moment of ``subject_id`` covering ``start_sec``;
+        raises KeyError when the index has none."""
+        table = self._table(level)
+        if subject_id not in self.subject_ids:
+            raise KeyError(subject_id)
+        rows = np.flatnonzero(
+            (table["subject"] == self.subject_ids.index(subject_id))
+            & (table["start_sec"] <= start_sec) & (start_sec < table["start_sec"] + LEVELS[level])
+        )
+        if len(rows) == 0:
+            raise KeyError(f"{subject_id}@{start_sec}s")
+        return int(rows[-1])
+
+    def _tree(self, level, columns):
+        """KD-tree over ``columns`` of the rows of ``level`` finite in all of
+        them, built once per column set."""
+        key = (level, columns)
+        if key not in self._trees:
+            from sklearn.neighbors import KDTree
+
+            features = self._table(level)["features"][:, list(columns)]
+            rows = np.flatnonzero(np.isfinite(features).all(axis=1))
+            self._trees[key] = (KDTree(features[rows]) if len(rows) else None), rows
+        return self._trees[key]
+
+    def nearest(self, level, vector, k=10, exclude_row=None):
+        """(rows, distances) of the ``k`` moments closest to ``vector`` (a
+        feature vector of ``level``), nearest first. NaN features (a missing
+        signal) are left out of the distance, as are moments without all the
+        others. With ``exclude_row``, moments of its subject overlapping it
+        are left out."""
+        table = self._table(level)
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if vector.shape != table["features"].shape[1:] or not np.isfinite(vector).any():
+            raise ValueError(f"A {level} vector has {table['features'].shape[1]} values, some finite.")
+        columns = tuple(np.flatnonzero(np.isfinite(vector)).tolist())
+        vector = vector[list(columns)]
+        tree, tree_rows = self._tree(level, columns)
+        if tree is None or k < 1:
+            return np.empty(0, dtype=int), np.empty(0)
+        fetch = k
+        while True:
+            fetch = min(fetch, len(tree_rows))
+            distances, positions = tree.query(vector[None, :], k=fetch)
+            rows, distances = tree_rows[positions[0]], distances[0]
+            if exclude_row is not None:
+                overlapping = (table["subject"][rows] == table["subject"][exclude_row]) & (
+                    np.abs(table["start_sec"][rows] - table["start_sec"][exclude_row]) < LEVELS[level]
+                )
+                rows, distances = rows[~overlapping], distances[~overlapping]
+            if len(rows) >= k or fetch == len(tree_rows):
+                return rows[:k], distances[:k]
+            fetch *= 2
+
+    def similar(self, level, subject_id, start_sec, k=10):
+        """nearest() to the moment of ``subject_id`` at ``start_sec``."""
+        row = self.row_of(level, subject_id, start_sec)
+        return self.nearest(level, self._table(level)["features"][row], k, exclude_row=row)
+
+    def moments(self, level, rows, distances=None):
+        """JSON-ready dicts of ``rows``; ``start_sec`` and ``duration_sec``
+        locate the moment in the subject's curves for rendering."""
+        table = self._table(level)
+        names = FEATURES if level == "second" else tuple(f"{n}_mean" for n in FEATURES) + tuple(f"{n}_std" for n in FEATURES)
+        moments = []
+        for i, row in enumerate(rows):
+            values = table["features"][row].astype(float)
+            moment = {
+                "subject": self.subject_ids[table["subject"][row]],
+                "start_sec": int(table["start_sec"][row]),
+                "duration_sec": LEVELS[level],
+                "label": int(table["label"][row]),
+                "bio_state": BIO_STATES[table["bio_state"][row]],
+                "features": {n: None if np.isnan(v) else round(v, 4) for n, v in zip(names, values.tolist())},
+            }
+            if distances is not None:
+                moment["distance"] = round(float(distances[i]), 5)
+            moments.append(moment)
+        return moments
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+# --- Lazy feature access ---
+# A planner reads each feature about once per beat (a few hundred reads for a
+# minute of music) or averages a short window next to a beat, yet the features
+# used to be full normalised copies of every channel at the input rate (42000
+# samples per channel for 60 s of chest data). A LazyFeature keeps the curve it
+# reads from (a subject store curve, a cached analysis curve, a multirate
+# LazyCurve) and normalises only the values a read returns.
+
+
+class LazyFeature:
+    """``transform(source[index])`` on every read; ``len()`` is the source's.
+
+    ``source`` is anything indexable by ints and slices. np.asarray()
+    materialises the whole feature, e.g. for the analysis store.
+    """
+
+    def __init__(self, source, transform=None):
+        self.source = source
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.source)
+
+    def __getitem__(self, index):
+        values = self.source[index]
+        return self.transform(values) if self.transform is not None else values
+
+    def __array__(self, dtype=None, copy=None):
+        values = np.asarray(self[:])
+        return values if dtype is None else values.astype(dtype)
+
+    def map(self, transform):
+        """A LazyFeature applying ``transform`` after this one's transform."""
+        if self.transform is None:
+            return LazyFeature(self.source, transform)
+        inner = self.transform
+        return LazyFeature(self.source, lambda values: transform(inner(values)))
+
+
+def lazy(values, transform=None):
+    """``values`` (an array, a LazyCurve or a LazyFeature) as a LazyFeature."""
+    if isinstance(values, LazyFeature):
+        return values.map(transform) if transform is not None else values
+    return LazyFeature(values, transform)
+
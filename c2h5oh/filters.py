@@ -0,0 +1,60 @@
+import numpy as np
+from scipy.signal import lfilter
+
+
+# --- One-pole filters ---
+# The same RC filters as pydub's low_pass_filter / high_pass_filter (and with
+# the same y[0] = x[0] start), run through lfilter instead of a Python loop.
+
+
+def _rc_alpha(cutoff, sample_rate):
+    rc = 1.0 / (cutoff * 2 * np.pi)
+    dt = 1.0 / sample_rate
+    return rc, dt
+
+
+def _coefficients(b, a, zi, samples):
+    """(b, a, zi) for lfilter in the samples' precision, so float32 audio stays float32."""
+    dtype = samples.dtype if np.issubdtype(samples.dtype, np.floating) else np.float32
+    return np.asarray(b, dtype), np.asarray(a, dtype), np.asarray(zi, dtype)
+
+
+def one_pole_lowpass(samples, cutoff, sample_rate):
+    if len(samples) == 0:
+        return np.asarray(samples, dtype=np.float32)
+    rc, dt = _rc_alpha(cutoff, sample_rate)
+    alpha = dt / (rc + dt)
+    b, a, zi = _coefficients([alpha], [1.0, alpha - 1.0], [(1.0 - alpha) * samples[0]], samples)
+    out, _ = lfilter(b, a, samples, zi=zi)
+    return out.astype(np.float32)
+
+
+def one_pole_highpass(samples, cutoff, sample_rate):
+    if len(samples) == 0:
+        return np.asarray(samples, dtype=np.float32)
+    rc, dt = _rc_alpha(cutoff, sample_rate)
+    alpha = rc / (rc + dt)
+    b, a, zi = _coefficients([alpha, -alpha], [1.0, -alpha], [(1.0 - alpha) * samples[0]], samples)
+    out, _ = lfilter(b, a, samples, zi=zi)
+    return out.astype(np.float32)
+
+
+def one_pole_lowpass_automated(samples, cutoffs, sample_rate, block_size=512):
+    """one_pole_lowpass with a time-varying cutoff (one value per sample).
+
+    The cutoff is updated once per block; the filter state is carried across
+    blocks, so the output has no seams however often the cutoff moves.
+    """
+    out = np.empty(len(samples), dtype=np.float32)
+    if len(samples) == 0:
+        return out
+    previous = samples[0]
+    for start in range(0, len(samples), block_size):
+        block = samples[start:start + block_size]
+        rc, dt = _rc_alpha(cutoffs[start + len(block) // 2], sample_rate)
+        alpha = dt / (rc + dt)
+        b, a, zi = _coefficients([alpha], [1.0, alpha - 1.0], [(1.0 - alpha) * previous], block)
+        filtered, _ = lfilter(b, a, block, zi=zi)
+        out[start:start + len(block)] = filtered
+        previous = filtered[-1]
+    return out
@@ -0,0 +1,169 @@
+import functools
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import AnalysisArtifact, RenderedOutput, Subject, Upload
+
+
+# --- Ledger of the render store ---
+# Every file the render store writes gets a row (c2h5oh.models), so renders
+# can be listed per subject / label / config version with indexed queries and
+# the store can be kept under RENDER_STORE_BUDGET_BYTES by evicting the least
+# recently used entries. The files remain the source of truth: a ledger that
+# is unavailable (e.g. migrations not run) is reported and otherwise ignored.
+TOUCH_INTERVAL_SEC = 60  # last_accessed is only rewritten when older than this
+EVICTION_MIN_AGE_SEC = 600  # never evict what was used this recently (pending renders)
+STORED_MODELS = (RenderedOutput, AnalysisArtifact, Upload)
+
+
+def _tolerant(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except DatabaseError as e:
+            print(f"Render ledger unavailable ({e}), skipping {func.__name__}")
+            return None
+
+    return wrapper
+
+
+def _relative(path):
+    return os.path.relpath(path, settings.RENDER_STORE_DIR)
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return os.path.getsize(path)
+
+
+def _subject(subject_id):
+    if subject_id is None:
+        return None
+    return Subject.objects.get_or_create(subject_id=subject_id)[0]
+
+
+def _record(model, path, **fields):
+    now = timezone.now()
+    row, _ = model.objects.update_or_create(
+        path=_relative(path),
+        defaults={"size_bytes": _size(path), "last_accessed": now, **fields},
+    )
+    return row
+
+
+@_tolerant
+def record_upload(key, content_hash, path, subject_id=None):
+    return _record(Upload, path, key=key, content_hash=content_hash, subject=_subject(subject_id))
+
+
+@_tolerant
+def record_artifact(kind, key, path, subject_id=None, config_version=""):
+    return _record(
+        AnalysisArtifact, path, kind=kind, key=key,
+        subject=_subject(subject_id), config_version=str(config_version),
+    )
+
+
+@_tolerant
+def record_output(key, path, ext="wav", subject_id=None, label="", config_version=""):
+    return _record(
+        RenderedOutput, path, key=key, ext=ext, subject=_subject(subject_id),
+        label=label or "", config_version=str(config_version),
+    )
+
+
+@_tolerant
+def record_encoded_output(key, path, ext):
+    """An encoded copy of a render, filed like its WAV master."""
+    master = RenderedOutput.objects.filter(key=key, ext="wav").first()
+    return _record(
+        RenderedOutput, path, key=key, ext=ext,
+        subject=master.subject if master else None,
+        label=master.label if master else "",
+        config_version=master.config_version if master else "",
+    )
+
+
+@_tolerant
+def touch(model, **lookup):
+    """Mark matching rows as used now (one UPDATE, skipped for recent touches)."""
+    now = timezone.now()
+    return model.objects.filter(
+        last_accessed__lt=now - timedelta(seconds=TOUCH_INTERVAL_SEC), **lookup
+    ).update(last_accessed=now)
+
+
+# --- Lookups ---
+def outputs_for(subject_id, label=None, config_version=None):
+    """Rendered outputs of a subject, newest first."""
+    outputs = RenderedOutput.objects.filter(subject__subject_id=subject_id)
+    if label is not None:
+        outputs = outputs.filter(label=label)
+    if config_version is not None:
+        outputs = outputs.filter(config_version=str(config_version))
+    return outputs.order_by("-created_at")
+
+
+def uploads_with_hash(content_hash):
+    return Upload.objects.filter(content_hash=content_hash)
+
+
+def stored_bytes():
+    return sum(
+        model.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+        for model in STORED_MODELS
+    )
+
+
+# --- Eviction ---
+def _remove(path):
+    path = os.path.join(settings.RENDER_STORE_DIR, path)
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@_tolerant
+def evict(budget_bytes=None):
+    """Delete least-recently-used store entries until the store fits ``budget_bytes``
+    (default RENDER_STORE_BUDGET_BYTES; 0 disables eviction). Returns bytes freed."""
+    budget_bytes = settings.RENDER_STORE_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    if not budget_bytes:
+        return 0
+    excess = stored_bytes() - budget_bytes
+    if excess <= 0:
+        return 0
+    cutoff = timezone.now() - timedelta(seconds=EVICTION_MIN_AGE_SEC)
+    candidates = sorted(
+        (
+            (last_accessed, model, pk, path, size)
+            for model in STORED_MODELS
+            for pk, path, size, last_accessed in model.objects.filter(last_accessed__lt=cutoff)
+            .values_list("pk", "path", "size_bytes", "last_accessed")
+        ),
+        key=lambda candidate: candidate[0],
+    )
+    freed = 0
+    for _, model, pk, path, size in candidates:
+        if freed >= excess:
+            break
+        _remove(path)
+        model.objects.filter(pk=pk).delete()
+        freed += size
+    return freed
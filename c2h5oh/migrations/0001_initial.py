@@ -0,0 +1,121 @@
+# Generated by Django 5.2.8
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Subject",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("subject_id", models.CharField(max_length=64, unique=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Upload",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=255, unique=True)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_accessed", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ("content_hash", models.CharField(db_index=True, max_length=64)),
+                ("key", models.CharField(max_length=64, unique=True)),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="uploads",
+                        to="c2h5oh.subject",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="AnalysisArtifact",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=255, unique=True)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_accessed", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("analysis", "Render features"),
+                            ("stems", "Render stems"),
+                            ("subject", "Subject curves"),
+                            ("subject_stats", "Subject statistics"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("key", models.CharField(max_length=64)),
+                ("config_version", models.CharField(blank=True, max_length=32)),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="artifacts",
+                        to="c2h5oh.subject",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["subject", "kind"], name="artifact_subject_kind_idx"),
+                    models.Index(fields=["config_version"], name="artifact_config_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("key", "kind", "config_version"), name="unique_artifact"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="RenderedOutput",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=255, unique=True)),
+                ("size_bytes", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_accessed", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ("key", models.CharField(max_length=64)),
+                ("ext", models.CharField(default="wav", max_length=8)),
+                ("label", models.CharField(blank=True, max_length=16)),
+                ("config_version", models.CharField(blank=True, max_length=32)),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outputs",
+                        to="c2h5oh.subject",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["subject", "label"], name="output_subject_label_idx"),
+                    models.Index(fields=["config_version"], name="output_config_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("key", "ext"), name="unique_rendered_output"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("c2h5oh", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="analysisartifact",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("analysis", "Render features"),
+                    ("stems", "Render stems"),
+                    ("subject", "Subject curves"),
+                    ("subject_stats", "Subject statistics"),
+                    ("pyramid", "Subject plotting pyramid"),
+                ],
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("c2h5oh", "0003_analysisartifact_waveform_kind"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="analysisartifact",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("analysis", "Render features"),
+                    ("stems", "Render stems"),
+                    ("subject", "Subject curves"),
+                    ("subject_stats", "Subject statistics"),
+                    ("pyramid", "Subject plotting pyramid"),
+                    ("waveform", "Render waveform peaks"),
+                    ("features", "Subject feature tables"),
+                ],
+                max_length=16,
+            ),
+        ),
+    ]
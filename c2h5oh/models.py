@@ -0,0 +1,89 @@
+from django.db import models
+from django.utils import timezone
+
+
+# --- Render ledger ---
+# Rows for everything the render store keeps on disk (c2h5oh.ledger records
+# them). The files stay the source of truth; the ledger makes them listable,
+# deduplicable by content hash and evictable by last access.
+class Subject(models.Model):
+    """One WESAD recording, identified by its upload hash."""
+
+    subject_id = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.subject_id[:12]
+
+
+class StoredFile(models.Model):
+    """A file (or directory) under RENDER_STORE_DIR, with what eviction needs."""
+
+    path = models.CharField(max_length=255, unique=True)  # relative to RENDER_STORE_DIR
+    size_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_accessed = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class Upload(StoredFile):
+    content_hash = models.CharField(max_length=64, db_index=True)
+    key = models.CharField(max_length=64, unique=True)  # render key the copy is kept for
+    subject = models.ForeignKey(Subject, null=True, on_delete=models.SET_NULL, related_name="uploads")
+
+
+class AnalysisArtifact(StoredFile):
+    """Analysis output: per-render features / stems / waveform, or
+    whole-subject curves / stats / plotting pyramid / feature tables."""
+
+    ANALYSIS = "analysis"
+    STEMS = "stems"
+    SUBJECT_CURVES = "subject"
+    SUBJECT_STATS = "subject_stats"
+    SIGNAL_PYRAMID = "pyramid"
+    WAVEFORM = "waveform"
+    SUBJECT_FEATURES = "features"
+    KINDS = [
+        (ANALYSIS, "Render features"),
+        (STEMS, "Render stems"),
+        (SUBJECT_CURVES, "Subject curves"),
+        (SUBJECT_STATS, "Subject statistics"),
+        (SIGNAL_PYRAMID, "Subject plotting pyramid"),
+        (WAVEFORM, "Render waveform peaks"),
+        (SUBJECT_FEATURES, "Subject feature tables"),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KINDS)
+    key = models.CharField(max_length=64)  # render key, or subject id for subject kinds
+    subject = models.ForeignKey(Subject, null=True, on_delete=models.CASCADE, related_name="artifacts")
+    config_version = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "kind", "config_version"], name="unique_artifact"),
+        ]
+        indexes = [
+            models.Index(fields=["subject", "kind"], name="artifact_subject_kind_idx"),
+            models.Index(fields=["config_version"], name="artifact_config_idx"),
+        ]
+
+
+class RenderedOutput(StoredFile):
+    """A rendered mixdown (WAV master or an encoded copy) under its render key."""
+
+    key = models.CharField(max_length=64)
+    ext = models.CharField(max_length=8, default="wav")
+    subject = models.ForeignKey(Subject, null=True, on_delete=models.CASCADE, related_name="outputs")
+    label = models.CharField(max_length=16, blank=True)  # segment rendered, e.g. "baseline"
+    config_version = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "ext"], name="unique_rendered_output"),
+        ]
+        indexes = [
+            models.Index(fields=["subject", "label"], name="output_subject_label_idx"),
+            models.Index(fields=["config_version"], name="output_config_idx"),
+        ]
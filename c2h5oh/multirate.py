@@ -0,0 +1,178 @@
+import time
+from fractions import Fraction
+
+import neurokit2 as nk
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from scipy.signal import resample_poly
+
+from .dtypes import float_array
+
+
+# --- Multi-rate analysis of slow channels ---
+# EDA, skin temperature and respiration move on a timescale of seconds, yet
+# arrive at the 700 Hz chest rate. They are anti-alias decimated to a rate
+# that fits their bandwidth first, cleaned / analysed there, and only read
+# back at a high rate where the planner actually looks (LazyCurve).
+SLOW_CHANNEL_RATES = {
+    "eda": 16,  # neurokit's EDA low-pass is 3 Hz (and it skips filtering below ~7 Hz)
+    "resp": 10,  # breathing band is 0.05-3 Hz
+    "temp": 4,
+}
+
+
+def decimate(signal, sampling_rate, target_rate):
+    """Anti-alias filter and resample ``signal`` to ``target_rate`` (polyphase FIR)."""
+    signal = float_array(signal)
+    ratio = Fraction(target_rate) / Fraction(sampling_rate)
+    return resample_poly(
+        signal, ratio.numerator, ratio.denominator, padtype="line"
+    ).astype(signal.dtype)
+
+
+class LazyCurve(NDArrayOperatorsMixin):
+    """A curve stored at its own (low) ``rate`` but indexed like an array at
+    ``query_rate``: curve[i] interpolates at i / query_rate seconds, so only
+    the samples a caller reads are ever upsampled.
+
+    Element-wise arithmetic (normalisation, clipping) is applied to the
+    low-rate samples and returns another LazyCurve; np.asarray() materialises
+    the whole curve at ``query_rate``.
+    """
+
+    def __init__(self, samples, rate, query_rate=None, length=None):
+        self.samples = float_array(samples)
+        self.rate = rate
+        self.query_rate = query_rate or rate
+        self.length = length if length is not None else int(len(self.samples) * self.query_rate / rate)
+
+    def __len__(self):
+        return self.length
+
+    def at_times(self, times_sec):
+        values = np.interp(times_sec, np.arange(len(self.samples)) / self.rate, self.samples)
+        return values.astype(self.samples.dtype) if np.ndim(values) else values
+
+    def at_rate(self, rate, length=None):
+        """The whole curve, materialised at ``rate``."""
+        length = length if length is not None else int(len(self.samples) * rate / self.rate)
+        return self.at_times(np.arange(length) / rate)
+
+    def reindexed(self, query_rate, length=None):
+        return LazyCurve(self.samples, self.rate, query_rate, length)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = np.arange(*index.indices(self.length))
+        else:
+            positions = np.asarray(index)
+            positions = np.where(positions < 0, positions + self.length, positions)
+        return self.at_times(positions / self.query_rate)
+
+    def __array__(self, dtype=None, copy=None):
+        curve = self.at_rate(self.query_rate, self.length)
+        return curve if dtype is None else curve.astype(dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or "out" in kwargs:
+            return NotImplemented
+        args = []
+        for value in inputs:
+            if isinstance(value, LazyCurve):
+                if (value.rate, value.query_rate, len(value.samples)) != (
+                    self.rate, self.query_rate, len(self.samples)
+                ):
+                    return NotImplemented
+                args.append(value.samples)
+            elif np.ndim(value) == 0:
+                args.append(value)
+            else:
+                return NotImplemented
+        return LazyCurve(ufunc(*args, **kwargs), self.rate, self.query_rate, self.length)
+
+    def clip(self, a_min=None, a_max=None, **kwargs):
+        return LazyCurve(np.clip(self.samples, a_min, a_max), self.rate, self.query_rate, self.length)
+
+    def min(self):
+        return self.samples.min()
+
+    def max(self):
+        return self.samples.max()
+
+    def mean(self):
+        return self.samples.mean()
+
+
+def process_slow_channels(sampling_rate, eda=None, resp=None, temp=None, length=None):
+    """Decimate-then-process the slow chest channels.
+
+    Returns LazyCurves indexed at ``sampling_rate`` (and ``length``, by default
+    the input length): "eda" (cleaned), "resp_swell" (cleaned breathing),
+    "resp_rate" (breaths/min) and "temp". Missing channels are left out.
+    """
+    curves = {}
+    if eda is not None:
+        rate = SLOW_CHANNEL_RATES["eda"]
+        low_rate = decimate(eda, sampling_rate, rate)
+        eda_clean = np.asarray(nk.eda_clean(low_rate, sampling_rate=rate), dtype=low_rate.dtype)
+        curves["eda"] = LazyCurve(eda_clean, rate, sampling_rate, length or len(eda))
+    if resp is not None:
+        rate = SLOW_CHANNEL_RATES["resp"]
+        low_rate = decimate(resp, sampling_rate, rate)
+        resp_clean = np.asarray(nk.rsp_clean(low_rate, sampling_rate=rate), dtype=low_rate.dtype)
+        resp_rate = np.asarray(nk.rsp_rate(resp_clean, sampling_rate=rate), dtype=low_rate.dtype)
+        curves["resp_swell"] = LazyCurve(resp_clean, rate, sampling_rate, length or len(resp))
+        curves["resp_rate"] = LazyCurve(resp_rate, rate, sampling_rate, length or len(resp))
+    if temp is not None:
+        rate = SLOW_CHANNEL_RATES["temp"]
+        curves["temp"] = LazyCurve(decimate(temp, sampling_rate, rate), rate, sampling_rate, length or len(temp))
+    return curves
+
+
+def full_rate_slow_channels(sampling_rate, eda=None, resp=None, temp=None):
+    """process_slow_channels without the decimation (everything at
+    ``sampling_rate``), so the report isolates the decimation error.
+
+    This is check.py's previous path, not exactly beat_maker_more_sensors':
+    that took the breathing rate from the raw respiration signal (its
+    ``window`` only applies to rsp_rate's "xcorr" method), where spurious
+    troughs of the uncleaned signal dominate any decimation error.
+    """
+    curves = {}
+    if eda is not None:
+        curves["eda"] = np.asarray(nk.eda_clean(eda, sampling_rate=sampling_rate))
+    if resp is not None:
+        resp_clean = nk.rsp_clean(resp, sampling_rate=sampling_rate)
+        curves["resp_swell"] = np.asarray(resp_clean)
+        curves["resp_rate"] = np.asarray(nk.rsp_rate(resp_clean, sampling_rate=sampling_rate))
+    if temp is not None:
+        curves["temp"] = float_array(temp)
+    return curves
+
+
+def multirate_error_report(sampling_rate, eda=None, resp=None, temp=None, query_times=None):
+    """Run the decimated and the full-rate processing and compare them where
+    a renderer would read them.
+
+    ``query_times`` (seconds, default: once per second) are e.g. beat times.
+    Returns {"timings": {...}, channel: {"rmse", "max_abs", "nrmse"}} where
+    nrmse is the RMSE relative to the full-rate curve's range.
+    """
+    start = time.perf_counter()
+    full = full_rate_slow_channels(sampling_rate, eda, resp, temp)
+    full_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    lazy = process_slow_channels(sampling_rate, eda, resp, temp)
+    multirate_sec = time.perf_counter() - start
+
+    report = {"timings": {"full_rate_sec": full_sec, "multirate_sec": multirate_sec}}
+    for name, reference in full.items():
+        times = query_times
+        if times is None:
+            times = np.arange(int(len(reference) / sampling_rate))
+        indices = np.minimum((np.asarray(times) * sampling_rate).astype(int), len(reference) - 1)
+        error = lazy[name].at_times(indices / sampling_rate) - reference[indices]
+        rmse = float(np.sqrt(np.mean(error ** 2)))
+        span = float(np.ptp(reference)) or 1.0
+        report[name] = {"rmse": rmse, "max_abs": float(np.max(np.abs(error))), "nrmse": rmse / span}
+    return report
@@ -0,0 +1,154 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+# --- Subject-level normalisation statistics ---
+# Per-channel statistics computed once over a subject's whole recording (or
+# chunk by chunk and merged) and stored with the subject. Normalising with
+# them instead of each segment's own min()/max() means independent chunks,
+# streamed windows and 60 s slices all map a value to the same 0-1 level.
+SKETCH_SIZE = 256  # quantile sketch points; rank error is about 1 / SKETCH_SIZE
+NORMALISE_QUANTILES = (0.01, 0.99)  # robust range: ignores the extreme 1% each side
+
+
+def _compress(values, weights, size=SKETCH_SIZE):
+    """Sort weighted points and merge neighbours into at most ``size`` equal-weight bins."""
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    if len(values) <= size:
+        return values, weights
+    cumulative = np.cumsum(weights)
+    bins = np.minimum(((cumulative - weights / 2) / cumulative[-1] * size).astype(int), size - 1)
+    bin_weights = np.bincount(bins, weights, size)
+    bin_sums = np.bincount(bins, weights * values, size)
+    keep = bin_weights > 0
+    return bin_sums[keep] / bin_weights[keep], bin_weights[keep]
+
+
+@dataclass
+class ChannelStats:
+    """Mergeable statistics of one channel: count, mean / variance (Chan et
+    al. parallel update), exact min / max and a compacting quantile sketch."""
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = np.inf
+    max: float = -np.inf
+    sketch_values: np.ndarray = field(default_factory=lambda: np.empty(0))
+    sketch_weights: np.ndarray = field(default_factory=lambda: np.empty(0))
+
+    @classmethod
+    def of(cls, samples):
+        samples = np.asarray(samples, dtype=float).ravel()
+        samples = samples[np.isfinite(samples)]
+        if len(samples) == 0:
+            return cls()
+        values, weights = _compress(samples, np.ones(len(samples)))
+        return cls(
+            count=len(samples),
+            mean=float(samples.mean()),
+            m2=float(((samples - samples.mean()) ** 2).sum()),
+            min=float(samples.min()),
+            max=float(samples.max()),
+            sketch_values=values,
+            sketch_weights=weights,
+        )
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        stats = cls()
+        for chunk in chunks:
+            stats = stats.merge(cls.of(chunk))
+        return stats
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        values, weights = _compress(
+            np.concatenate((self.sketch_values, other.sketch_values)),
+            np.concatenate((self.sketch_weights, other.sketch_weights)),
+        )
+        return ChannelStats(
+            count=count,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta ** 2 * self.count * other.count / count,
+            min=min(self.min, other.min),
+            max=max(self.max, other.max),
+            sketch_values=values,
+            sketch_weights=weights,
+        )
+
+    def update(self, samples):
+        return self.merge(ChannelStats.of(samples))
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        positions = (np.cumsum(self.sketch_weights) - self.sketch_weights / 2) / self.count
+        return float(np.interp(
+            q,
+            np.concatenate(([0.0], positions, [1.0])),
+            np.concatenate(([self.min], self.sketch_values, [self.max])),
+        ))
+
+    def normalise(self, samples, method="quantile", eps=1e-9):
+        """Map ``samples`` onto this channel's 0-1 range.
+
+        "quantile" (default) uses the NORMALISE_QUANTILES range and clips,
+        "minmax" the exact range (like MinMaxScaler), "zscore" mean / std.
+        """
+        return self.normaliser(method, eps)(samples)
+
+    def normaliser(self, method="quantile", eps=1e-9):
+        """normalise() as a function of ``samples`` with the range looked up
+        once, for features that normalise each value as it is read
+        (c2h5oh.features)."""
+        if method == "zscore":
+            mean, scale = self.mean, self.std + eps
+            return lambda samples: (samples - mean) / scale
+        if method == "minmax":
+            low, span = self.min, self.max - self.min + eps
+            return lambda samples: (samples - low) / span
+        if method != "quantile":
+            raise ValueError(f"Unknown normalisation method '{method}'.")
+        low, high = (self.quantile(q) for q in NORMALISE_QUANTILES)
+        span = high - low + eps
+        return lambda samples: np.clip((samples - low) / span, 0.0, 1.0)
+
+    def to_dict(self):
+        return {
+            "count": self.count, "mean": self.mean, "m2": self.m2,
+            "min": self.min, "max": self.max,
+            "sketch_values": self.sketch_values.tolist(),
+            "sketch_weights": self.sketch_weights.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        values = dict(values)
+        values["sketch_values"] = np.asarray(values["sketch_values"], dtype=float)
+        values["sketch_weights"] = np.asarray(values["sketch_weights"], dtype=float)
+        return cls(**values)
+
+
+def curve_stats(curves, skip=("label",)):
+    """ChannelStats for every curve of a subject."""
+    return {name: ChannelStats.of(curve) for name, curve in curves.items() if name not in skip}
+
+
+def stats_to_dict(stats):
+    return {name: channel.to_dict() for name, channel in stats.items()}
+
+
+def stats_from_dict(values):
+    return {name: ChannelStats.from_dict(channel) for name, channel in values.items()}
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+# --- Vectorised oscillators ---
+# Drop-in replacements for pydub.generators Sine / Square / Sawtooth /
+# WhiteNoise that produce a whole note as one float32 NumPy array in [-1, 1]
+# instead of yielding samples one by one from a Python generator.
+#
+# ``freq`` may be a scalar or a per-sample array (for glides / automation).
+# ``phase`` is in cycles [0, 1); Oscillator carries it across calls so
+# consecutive blocks join without clicks.
+NOISE_TABLE_SECONDS = 10
+NOISE_TABLE_RATE = 44100
+NOISE_SEED = 1234
+
+
+def samples_for(dur_ms, sample_rate):
+    """Sample count for a duration, rounded the way pydub's generators do."""
+    return int(dur_ms * sample_rate / 1000)
+
+
+def _phases(freq, n, sample_rate, phase):
+    """Phase (cycles) at every sample, per-sample increment, and end phase."""
+    if np.ndim(freq) == 0:
+        increment = float(freq) / sample_rate
+        t = phase + np.arange(n, dtype=np.float64) * increment
+        end_phase = (phase + n * increment) % 1.0
+        dt = np.full(n, increment)
+    else:
+        dt = np.asarray(freq, dtype=np.float64)[:n] / sample_rate
+        t = phase + np.concatenate(([0.0], np.cumsum(dt[:-1])))
+        end_phase = (phase + dt.sum()) % 1.0
+    return t % 1.0, dt, end_phase
+
+
+def _poly_blep(t, dt):
+    """PolyBLEP residual that rounds off the discontinuity at t == 0."""
+    out = np.zeros_like(t)
+    dt = np.maximum(dt, 1e-12)
+    rising = t < dt
+    x = t[rising] / dt[rising]
+    out[rising] = x + x - x * x - 1.0
+    falling = t > 1.0 - dt
+    x = (t[falling] - 1.0) / dt[falling]
+    out[falling] = x * x + x + x + 1.0
+    return out
+
+
+def _sine(t, dt):
+    return np.sin(2 * np.pi * t)
+
+
+def _square(t, dt):
+    naive = np.where(t < 0.5, 1.0, -1.0)
+    return naive + _poly_blep(t, dt) - _poly_blep((t + 0.5) % 1.0, dt)
+
+
+def _sawtooth(t, dt):
+    # Rising ramp -1 -> 1, like pydub's Sawtooth(duty_cycle=1.0)
+    return 2.0 * t - 1.0 - _poly_blep(t, dt)
+
+
+WAVEFORMS = {"sine": _sine, "square": _square, "sawtooth": _sawtooth}
+
+
+def _render(waveform, freq, n, sample_rate, phase=0.0):
+    t, dt, end_phase = _phases(freq, n, sample_rate, phase)
+    return WAVEFORMS[waveform](t, dt).astype(np.float32), end_phase
+
+
+def sine(freq, n, sample_rate, phase=0.0):
+    return _render("sine", freq, n, sample_rate, phase)[0]
+
+
+def square(freq, n, sample_rate, phase=0.0):
+    """Band-limited (PolyBLEP) square wave."""
+    return _render("square", freq, n, sample_rate, phase)[0]
+
+
+def sawtooth(freq, n, sample_rate, phase=0.0):
+    """Band-limited (PolyBLEP) rising sawtooth."""
+    return _render("sawtooth", freq, n, sample_rate, phase)[0]
+
+
+class Oscillator:
+    """Phase-continuous oscillator: successive render() calls join seamlessly."""
+
+    def __init__(self, waveform, sample_rate, phase=0.0):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unknown waveform '{waveform}'.")
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+        self.phase = phase
+
+    def render(self, freq, n):
+        samples, self.phase = _render(self.waveform, freq, n, self.sample_rate, self.phase)
+        return samples
+
+
+# --- Noise ---
+# One seeded white-noise table, generated once per process and sliced. A
+# slice is a read-only view, so callers must copy before writing in place.
+# The table is for short one-shots (snares, hats, per-beat hiss): anything
+# held longer than the table would audibly loop, so sustained textures use
+# noise_texture, which draws fresh noise per call from the voice's seed.
+_noise_table = np.random.default_rng(NOISE_SEED).uniform(
+    -1.0, 1.0, NOISE_TABLE_SECONDS * NOISE_TABLE_RATE
+).astype(np.float32)
+_noise_table.flags.writeable = False
+
+
+def noise(n, seed=0):
+    """``n`` samples of white noise. Equal seeds give equal noise."""
+    if n > len(_noise_table):
+        return noise_texture(n, seed)
+    offset = (int(seed) * 2654435761) % len(_noise_table)
+    if offset + n <= len(_noise_table):
+        return _noise_table[offset:offset + n]
+    return np.take(_noise_table, np.arange(offset, offset + n), mode="wrap")
+
+
+def noise_texture(n, seed=0):
+    """``n`` samples of white noise that never repeats, for sustained voices.
+
+    Drawn from a generator seeded with ``seed``, so a voice re-rendered
+    longer (e.g. by the block mixer) gets the same noise as a prefix.
+    """
+    rng = np.random.default_rng(int(seed) % 2**64)  # hash() seeds can be negative
+    return rng.uniform(-1.0, 1.0, n).astype(np.float32)
@@ -0,0 +1,144 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from .dtypes import SIGNAL_DTYPE, as_signal
+
+
+# --- Min/max signal pyramid ---
+# For plotting, a signal only needs its min and max per screen pixel. Every
+# channel (raw or a derived curve) is reduced once, at ingest, into levels of
+# (min, max) pairs over buckets of PYRAMID_FACTOR ** k samples. A view of any
+# time range at any pixel width then reads only the slice of the level that
+# fits it (memory-mapped .npy files) and at most ``width`` pairs come back.
+PYRAMID_FACTOR = 8  # bucket size grows 8x per level; level 1 is 8 samples
+MIN_LEVEL_BUCKETS = 512  # the coarsest level still has about this many pairs
+
+
+def _reduce(pairs, factor):
+    """Merge every ``factor`` consecutive (min, max) pairs into one (NaNs ignored)."""
+    full = len(pairs) // factor * factor
+    merged = np.empty((-(-len(pairs) // factor), 2), dtype=pairs.dtype)
+    blocks = pairs[:full].reshape(-1, factor, 2)
+    merged[: full // factor, 0] = np.fmin.reduce(blocks[:, :, 0], axis=1)
+    merged[: full // factor, 1] = np.fmax.reduce(blocks[:, :, 1], axis=1)
+    if full < len(pairs):
+        merged[-1, 0] = np.fmin.reduce(pairs[full:, 0])
+        merged[-1, 1] = np.fmax.reduce(pairs[full:, 1])
+    return merged
+
+
+def minmax_levels(samples):
+    """[(bucket, pairs)] for bucket = PYRAMID_FACTOR, PYRAMID_FACTOR ** 2, ...;
+    ``pairs`` has shape (buckets, 2). Each level is reduced from the one below."""
+    samples = as_signal(samples)
+    pairs = np.broadcast_to(samples[:, None], (len(samples), 2))  # a view, not a copy
+    levels, bucket = [], 1
+    while True:
+        pairs = _reduce(pairs, PYRAMID_FACTOR)
+        bucket *= PYRAMID_FACTOR
+        levels.append((bucket, pairs))
+        if len(pairs) <= MIN_LEVEL_BUCKETS:
+            return levels
+
+
+def build_pyramid(series):
+    """meta and levels of ``series`` ({name: (samples, rate)}): meta is
+    {name: {"rate", "length", "buckets"}}, levels {(name, bucket): pairs}."""
+    meta, levels = {}, {}
+    for name, (samples, rate) in series.items():
+        series_levels = minmax_levels(samples)
+        levels.update({(name, bucket): pairs for bucket, pairs in series_levels})
+        meta[name] = {"rate": rate, "length": len(samples), "buckets": [b for b, _ in series_levels]}
+    return meta, levels
+
+
+def save_pyramid(path, series):
+    """Build the pyramid of ``series`` and write it to the directory ``path``;
+    meta.json is written last and marks completion."""
+    os.makedirs(path, exist_ok=True)
+    meta, levels = build_pyramid(series)
+    for (name, bucket), pairs in levels.items():
+        np.save(os.path.join(path, f"{name}.{bucket}.npy"), pairs)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+class SignalPyramid:
+    """Windows of a pyramid, written by save_pyramid() (open) or held in
+    memory (of_series)."""
+
+    def __init__(self, meta, read_level):
+        self.meta = meta
+        self._read_level = read_level  # (name, bucket) -> pairs
+
+    @classmethod
+    def open(cls, path):
+        """The pyramid in ``path``; levels are memory-mapped when read."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(meta, lambda name, bucket: np.load(
+            os.path.join(path, f"{name}.{bucket}.npy"), mmap_mode="r"
+        ))
+
+    @classmethod
+    def of_series(cls, series):
+        meta, levels = build_pyramid(series)
+        return cls(meta, lambda name, bucket: levels[(name, bucket)])
+
+    def series(self):
+        """{name: {"rate", "duration_sec", "buckets"}} of every stored series."""
+        return {
+            name: {"rate": info["rate"], "duration_sec": info["length"] / info["rate"],
+                   "buckets": info["buckets"]}
+            for name, info in self.meta.items()
+        }
+
+    def window(self, name, start_sec, end_sec, width):
+        """The (min, max) pairs of ``name`` between ``start_sec`` and ``end_sec``
+        for a plot ``width`` pixels wide: the coarsest level that still has a
+        pair per pixel, merged down to at most ``width`` pairs.
+
+        Returns {"series", "start_sec", "bucket_sec", "min", "max"}; pair i
+        covers start_sec + i * bucket_sec onwards. Raises KeyError for an
+        unknown series and ValueError for an empty range.
+        """
+        info = self.meta[name]
+        rate, length, buckets = info["rate"], info["length"], info["buckets"]
+        start = min(max(int(math.floor(start_sec * rate)), 0), length)
+        end = min(max(int(math.ceil(min(end_sec, length / rate) * rate)), start), length)
+        if end <= start or width < 1:
+            raise ValueError(f"Empty window {start_sec}-{end_sec}s of '{name}'.")
+        samples_per_pixel = (end - start) / width
+        bucket = max([b for b in buckets if b <= samples_per_pixel] or buckets[:1])
+        first, last = start // bucket, -(-end // bucket)
+        pairs = np.asarray(self._read_level(name, bucket)[first:last])
+        group = max(1, -(-len(pairs) // width))
+        if group > 1:
+            pairs = _reduce(pairs, group)
+        return {
+            "series": name,
+            "start_sec": first * bucket / rate,
+            "bucket_sec": bucket * group / rate,
+            "min": pairs[:, 0].astype(SIGNAL_DTYPE),
+            "max": pairs[:, 1].astype(SIGNAL_DTYPE),
+        }
+
+
+def window_to_json(window):
+    """A window() result with JSON-safe lists (NaN gaps become null)."""
+    values = {}
+    for side in ("min", "max"):
+        column = window[side].astype(float)
+        values[side] = [None if math.isnan(v) else round(v, 5) for v in column.tolist()]
+    return {**window, **values}
+
+
+def plot_window(ax, window, **kwargs):
+    """Draw a window() as a filled min/max band on a matplotlib ``ax``."""
+    times = window["start_sec"] + np.arange(len(window["min"])) * window["bucket_sec"]
+    ax.fill_between(times, window["min"], window["max"], step="post", linewidth=0.6, **kwargs)
+    return ax
@@ -0,0 +1,206 @@
+from collections import namedtuple
+
+from . import ledger, render_store
+from .admission import Saturated, get_render_executor
+from .render_config import DEFAULT_POP_CONFIG, DEFAULT_SENSOR_CONFIG
+from .sensors import render_device_segment
+from .subjects import (
+    SUBJECT_ANALYSIS_VERSION,
+    SUBJECT_CURVE_RATE,
+    find_segment,
+    missing_curves,
+    pop_features,
+    subject_stats,
+)
+from .utils import (
+    FEATURE_RATE,
+    GENERATOR_VERSION,
+    SEGMENTS_TO_GENERATE,
+    render_song,
+)
+
+
+# --- Batch renders of one subject ---
+# One request names a subject (an upload, or the id of one already analysed)
+# and any number of (label, device, duration, quality) specs. The subject is
+# analysed once (c2h5oh.subjects), every spec renders from the same curves
+# and stats, and the answer is a manifest of links to the stored results.
+# A spec picks its segment by label, or by "start" (seconds into the subject,
+# e.g. a moment found in the feature index, c2h5oh.feature_index). Specs the
+# subject cannot render (no such segment, or a device whose curves it lacks,
+# e.g. wrist on a chest-only upload) are skipped with the reason.
+# Previews render concurrently on the render executor during the request;
+# full renders are queued, their links answer 202 until they are stored.
+RENDER_DEVICES = ("pop", "chest", "wrist")
+QUALITIES = ("preview", "full")
+MAX_BATCH_SPECS = 16
+MAX_SPEC_DURATION_SEC = 600
+DEFAULT_SPEC_DURATION_SEC = 60
+
+RenderSpec = namedtuple(
+    "RenderSpec", ("label", "device", "duration_sec", "quality", "start_sec"), defaults=(None,)
+)
+
+
+def parse_specs(raw_specs):
+    """RenderSpecs from the request's list of {"label" or "start", "device",
+    "duration", "quality"} objects; raises ValueError for anything malformed."""
+    if not isinstance(raw_specs, list) or not raw_specs:
+        raise ValueError("'renders' must be a non-empty list.")
+    if len(raw_specs) > MAX_BATCH_SPECS:
+        raise ValueError(f"At most {MAX_BATCH_SPECS} renders per batch.")
+    specs = []
+    for raw in raw_specs:
+        if not isinstance(raw, dict):
+            raise ValueError("Each render must be an object.")
+        label = raw.get("label")
+        device = raw.get("device", "pop")
+        quality = raw.get("quality", "full")
+        try:
+            duration_sec = int(raw.get("duration", DEFAULT_SPEC_DURATION_SEC))
+        except (TypeError, ValueError):
+            raise ValueError("'duration' must be a whole number of seconds.")
+        start_sec = raw.get("start")
+        if start_sec is not None:
+            try:
+                start_sec = int(start_sec)
+            except (TypeError, ValueError):
+                raise ValueError("'start' must be a whole number of seconds.")
+            if start_sec < 0:
+                raise ValueError("'start' must not be negative.")
+        if label not in SEGMENTS_TO_GENERATE and not (start_sec is not None and label is None):
+            raise ValueError(f"Unknown label '{label}'. Expected any of: {', '.join(SEGMENTS_TO_GENERATE)}.")
+        if device not in RENDER_DEVICES:
+            raise ValueError(f"Unknown device '{device}'. Expected any of: {', '.join(RENDER_DEVICES)}.")
+        if quality not in QUALITIES:
+            raise ValueError(f"Unknown quality '{quality}'. Expected any of: {', '.join(QUALITIES)}.")
+        if not 5 <= duration_sec <= MAX_SPEC_DURATION_SEC:
+            raise ValueError(f"'duration' must be between 5 and {MAX_SPEC_DURATION_SEC} seconds.")
+        specs.append(RenderSpec(label, device, duration_sec, quality, start_sec))
+    return list(dict.fromkeys(specs))  # duplicates render once
+
+
+def spec_key(subject_id, spec):
+    params = {"label": spec.label, "device": spec.device, "duration": spec.duration_sec, "quality": spec.quality}
+    if spec.start_sec is not None:
+        params["start"] = spec.start_sec
+    config = DEFAULT_POP_CONFIG if spec.device == "pop" else DEFAULT_SENSOR_CONFIG
+    return render_store.render_key(
+        subject_id, generator=GENERATOR_VERSION, analysis=SUBJECT_ANALYSIS_VERSION,
+        config=config.to_dict(), **params,
+    )
+
+
+def load_subject(subject_id):
+    """Curves and stats of an analysed subject, or None if it is not stored."""
+    if not render_store.has_subject(subject_id, SUBJECT_ANALYSIS_VERSION):
+        return None
+    curves = render_store.load_subject(subject_id, SUBJECT_ANALYSIS_VERSION)
+    return curves, subject_stats(subject_id, curves)
+
+
+def segment_start(curves, spec):
+    """Start of the spec's segment, or None when the label has none that long
+    (or the subject ends before ``start_sec + duration_sec``). Like the CLI
+    scripts, pop starts at the label, the sensor songs mid-label."""
+    if spec.start_sec is not None:
+        start = spec.start_sec * SUBJECT_CURVE_RATE
+        return start if start + spec.duration_sec * SUBJECT_CURVE_RATE <= len(curves["label"]) else None
+    return find_segment(
+        curves, SEGMENTS_TO_GENERATE[spec.label], spec.duration_sec, middle=spec.device != "pop"
+    )
+
+
+def skip_reason(curves, spec):
+    """Why the subject's ``curves`` cannot render ``spec``, or None."""
+    missing = missing_curves(curves, spec.device)
+    if missing:
+        return f"The subject has no {', '.join(missing)} for the {spec.device} song."
+    if segment_start(curves, spec) is not None:
+        return None
+    if spec.start_sec is not None:
+        return f"The subject ends before {spec.start_sec + spec.duration_sec}s."
+    return f"No full {spec.duration_sec}s segment of '{spec.label}'."
+
+
+def render_spec(curves, stats, spec):
+    """AudioSegment of one spec, or None when it has no segment."""
+    preview = spec.quality == "preview"
+    start = segment_start(curves, spec)
+    if start is None:
+        return None
+    if spec.device == "pop":
+        features = pop_features(curves, start, spec.duration_sec, stats)
+        return render_song(features, FEATURE_RATE, spec.duration_sec, preview=preview)
+    return render_device_segment(curves, stats, start, spec.device, spec.duration_sec, preview)
+
+
+def render_and_store_spec(subject_id, curves, stats, spec):
+    """Render ``spec`` into the store under its key. Returns "stored" or "skipped"."""
+    key = spec_key(subject_id, spec)
+    if render_store.has_result(key):
+        return "stored"
+    if skip_reason(curves, spec) is not None:
+        return "skipped"
+    audio_segment = render_spec(curves, stats, spec)
+    path = render_store.save_result(key, audio_segment)
+    ledger.record_output(
+        key, path, subject_id=subject_id, label=spec.label or "", config_version=GENERATOR_VERSION
+    )
+    return "stored"
+
+
+def _entry(subject_id, spec, status, error=None):
+    key = spec_key(subject_id, spec)
+    entry = {
+        "label": spec.label, "device": spec.device, "duration_sec": spec.duration_sec,
+        "quality": spec.quality, "key": key, "status": status,
+    }
+    if spec.start_sec is not None:
+        entry["start_sec"] = spec.start_sec
+    if status != "skipped":
+        entry.update({
+            "audio": f"/api/renders/{key}/",
+            "waveform": f"/api/renders/{key}/waveform/",
+            "spectrogram": f"/api/renders/{key}/spectrogram/",
+        })
+    else:
+        entry["error"] = error
+    return entry
+
+
+def run_batch(subject_id, curves, stats, specs, queue_full):
+    """Render ``specs`` of one analysed subject and return the manifest.
+
+    Previews are rendered now, side by side on the render executor (in this
+    thread when it is saturated); full renders already stored are linked,
+    the others handed to ``queue_full(subject_id, spec)``. Specs the subject
+    cannot render (skip_reason) are reported as skipped.
+    """
+    executor = get_render_executor()
+    statuses, previews, errors = {}, {}, {}
+    for spec in specs:
+        reason = skip_reason(curves, spec)
+        if render_store.has_result(spec_key(subject_id, spec)):
+            statuses[spec] = "stored"
+        elif reason is not None:
+            statuses[spec], errors[spec] = "skipped", reason
+        elif spec.quality == "full":
+            queue_full(subject_id, spec)
+            statuses[spec] = "queued"
+        else:
+            try:
+                previews[spec] = executor.submit(render_and_store_spec, subject_id, curves, stats, spec)
+            except Saturated:
+                statuses[spec] = render_and_store_spec(subject_id, curves, stats, spec)
+    for spec, future in previews.items():
+        statuses[spec] = future.result()
+    renders = [_entry(subject_id, spec, statuses[spec], errors.get(spec)) for spec in specs]
+    return {
+        "subject": subject_id,
+        "renders": renders,
+        "counts": {
+            status: sum(entry["status"] == status for entry in renders)
+            for status in ("stored", "queued", "skipped")
+        },
+    }
@@ -0,0 +1,110 @@
+from dataclasses import asdict, dataclass, field, fields, replace
+
+from .stems import STEM_NAMES
+
+
+# --- Render configuration ---
+# The mapping thresholds that used to be hardcoded in the generators. Each
+# field declares the stems it can influence (metadata["stems"]); the
+# incremental renderer uses that to skip stems a change cannot touch.
+SCALE_NAMES = ("major", "minor_harm", "lydian")
+
+
+def _param(default, *stems):
+    return field(default=default, metadata={"stems": frozenset(stems)})
+
+
+class _RenderConfig:
+    def changed_fields(self, other):
+        return [f.name for f in fields(self) if getattr(self, f.name) != getattr(other, f.name)]
+
+    def affected_stems(self, other):
+        stems = set()
+        for f in fields(self):
+            if getattr(self, f.name) != getattr(other, f.name):
+                stems |= f.metadata["stems"]
+        return stems
+
+    def to_dict(self):
+        return asdict(self)
+
+    def updated(self, values):
+        """Copy with overrides from e.g. a JSON body; raises ValueError on bad input."""
+        known = {f.name: f for f in fields(self)}
+        unknown = set(values) - set(known)
+        if unknown:
+            raise ValueError(f"Unknown config field(s): {', '.join(sorted(unknown))}.")
+        changes = {}
+        for name, value in values.items():
+            if known[name].type in (float, "float"):
+                try:
+                    changes[name] = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Config field '{name}' must be a number.")
+            elif value not in SCALE_NAMES:
+                raise ValueError(
+                    f"Config field '{name}' must be one of: {', '.join(SCALE_NAMES)}."
+                )
+            else:
+                changes[name] = value
+        config = replace(self, **changes)
+        config.validate()
+        return config
+
+    def validate(self):
+        if self.bpm_min >= self.bpm_max:
+            raise ValueError("bpm_min must be lower than bpm_max.")
+
+
+@dataclass(frozen=True)
+class PopConfig(_RenderConfig):
+    """c2h5oh.utils pop song (ECG + EMG)."""
+
+    # Tempo clamp: moves every beat, so it touches every stem
+    bpm_min: float = _param(65.0, *STEM_NAMES)
+    bpm_max: float = _param(135.0, *STEM_NAMES)
+    # HR above this switches verse -> chorus (8th-note hats, chorus chords)
+    chorus_bpm: float = _param(90.0, "drums", "harmony")
+    chorus_pad_gain_db: float = _param(3.0, "harmony")
+    # EMG level that triggers a melody note / moves it up instead of down
+    melody_gate: float = _param(0.2, "melody")
+    melody_up_threshold: float = _param(0.5, "melody")
+    scale: str = _param("major", "melody")
+
+
+@dataclass(frozen=True)
+class SensorConfig(_RenderConfig):
+    """c2h5oh.sensors chest and wrist songs."""
+
+    bpm_min: float = _param(60.0, *STEM_NAMES)
+    bpm_max: float = _param(140.0, *STEM_NAMES)
+    # determine_musical_mode / determine_musical_mode_wrist cut-offs. The mode
+    # picks drums, guitar and melody; the textures are mode independent.
+    meditation_hr: float = _param(75.0, "drums", "harmony", "melody")
+    meditation_resp_rate: float = _param(15.0, "drums", "harmony", "melody")
+    meditation_acc: float = _param(0.2, "drums", "harmony", "melody")
+    stress_hr: float = _param(85.0, "drums", "harmony", "melody")
+    stress_eda: float = _param(0.4, "drums", "harmony", "melody")
+    amusement_hr: float = _param(75.0, "drums", "harmony", "melody")
+    amusement_emg: float = _param(0.2, "drums", "harmony", "melody")
+    amusement_acc: float = _param(0.3, "drums", "harmony", "melody")
+    # Melody gates per mode
+    meditation_melody_gate: float = _param(0.1, "melody")
+    amusement_melody_gate: float = _param(0.15, "melody")
+    amusement_melody_up: float = _param(0.4, "melody")
+    # Wrist-only movement percussion
+    movement_perc_acc: float = _param(0.3, "drums")
+    # Skin temperature range mapped onto the drone (degrees C)
+    temp_min: float = _param(30.0, "textures")
+    temp_max: float = _param(37.0, "textures")
+    base_scale: str = _param("major", "melody")
+    meditation_scale: str = _param("lydian", "melody")
+
+    def validate(self):
+        super().validate()
+        if self.temp_min >= self.temp_max:
+            raise ValueError("temp_min must be lower than temp_max.")
+
+
+DEFAULT_POP_CONFIG = PopConfig()
+DEFAULT_SENSOR_CONFIG = SensorConfig()
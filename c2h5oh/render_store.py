@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .dtypes import as_signals
+from .feature_index import FeatureIndex, save_subject_tables
+from .pyramid import SignalPyramid, save_pyramid
+from .waveform import peaks_to_dat, spectrogram_thumbnail, waveform_peaks
+
+
+# --- Content-addressed render store ---
+# Every render is identified by a key derived from the uploaded pickle bytes
+# and the generator parameters that change the audio. Preview and full renders
+# of the same upload share a key: the preview is served immediately and the
+# full-quality file appears under that key once the background job finishes.
+HASH_CHUNK_SIZE = 1024 * 1024
+_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+def is_key(value):
+    """Whether ``value`` is a render key or subject id (a SHA-256 hex digest).
+    Anything taken from a request must pass this before it names a path."""
+    return isinstance(value, str) and _KEY.fullmatch(value) is not None
+
+
+def _store_dir(*parts):
+    path = os.path.join(settings.RENDER_STORE_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def hash_upload(file_obj):
+    """SHA-256 of an uploaded file (Django UploadedFile or plain file object)."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    if hasattr(file_obj, "chunks"):
+        for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def render_key(upload_hash, **params):
+    """Cache key for one render of an upload. ``params`` must be JSON-serialisable."""
+    payload = json.dumps({"upload": upload_hash, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def upload_path(key):
+    return os.path.join(_store_dir("uploads"), f"{key}.pkl")
+
+
+def result_path(key, ext="wav"):
+    return os.path.join(_store_dir("results"), f"{key}.{ext}")
+
+
+def save_upload(key, file_obj):
+    """Keep a copy of the upload so a background worker can re-render it."""
+    path = upload_path(key)
+    if os.path.exists(path):
+        return path
+    file_obj.seek(0)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if hasattr(file_obj, "chunks"):
+            for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+                f.write(chunk)
+        else:
+            f.write(file_obj.read())
+    os.replace(tmp_path, path)
+    file_obj.seek(0)
+    return path
+
+
+def session_path(key):
+    """Full-session render (c2h5oh.session) of an upload."""
+    return os.path.join(_store_dir("sessions"), f"{key}.wav")
+
+
+def has_upload(key):
+    return os.path.exists(upload_path(key))
+
+
+def has_session(key):
+    return os.path.exists(session_path(key))
+
+
+def has_result(key, ext="wav"):
+    return os.path.exists(result_path(key, ext))
+
+
+def save_result(key, audio_segment, ext="wav"):
+    """Export an AudioSegment atomically so readers never see a partial file."""
+    path = result_path(key, ext)
+    tmp_path = path + ".tmp"
+    audio_segment.export(tmp_path, format=ext)
+    os.replace(tmp_path, path)
+    return path
+
+
+def save_encoded_result(key, buffer, ext):
+    """Store an already-encoded copy (e.g. FLAC) of a result."""
+    path = result_path(key, ext)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+    return path
+
+
+def stems_dir(key):
+    return os.path.join(settings.RENDER_STORE_DIR, "stems", key)
+
+
+def has_stems(key):
+    return os.path.exists(os.path.join(stems_dir(key), "meta.json"))
+
+
+def save_stems(key, stem_arrays, frame_rate):
+    """Cache float32 stem arrays; meta.json is written last and marks completion."""
+    path = _store_dir("stems", key)
+    for name, samples in stem_arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), samples.astype(np.float32))
+    meta = {"frame_rate": frame_rate, "stems": sorted(stem_arrays)}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+def load_stems(key):
+    """Memory-mapped stem arrays and their frame rate."""
+    path = stems_dir(key)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in meta["stems"]
+    }
+    return arrays, meta["frame_rate"]
+
+
+def waveform_dir(key):
+    return os.path.join(settings.RENDER_STORE_DIR, "waveforms", key)
+
+
+def has_waveform(key):
+    return os.path.exists(os.path.join(waveform_dir(key), "meta.json"))
+
+
+def save_waveform(key, samples, frame_rate, spectrogram=True):
+    """Peaks (audiowaveform .dat per zoom level) and optionally a spectrogram
+    PNG of a final mix (c2h5oh.waveform); meta.json is written last."""
+    path = _store_dir("waveforms", key)
+    peaks = waveform_peaks(samples)
+    for samples_per_pixel, pairs in peaks.items():
+        with open(os.path.join(path, f"peaks-{samples_per_pixel}.dat"), "wb") as f:
+            f.write(peaks_to_dat(pairs, frame_rate, samples_per_pixel))
+    if spectrogram:
+        image = Image.fromarray(spectrogram_thumbnail(samples, frame_rate))
+        image.save(os.path.join(path, "spectrogram.png"), "PNG")
+    meta = {
+        "frame_rate": frame_rate,
+        "duration_sec": len(samples) / frame_rate,
+        "samples_per_pixel": sorted(peaks),
+        "spectrogram": spectrogram,
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+def load_waveform_meta(key):
+    with open(os.path.join(waveform_dir(key), "meta.json")) as f:
+        return json.load(f)
+
+
+def peaks_path(key, samples_per_pixel):
+    return os.path.join(waveform_dir(key), f"peaks-{samples_per_pixel}.dat")
+
+
+def spectrogram_path(key):
+    return os.path.join(waveform_dir(key), "spectrogram.png")
+
+
+def analysis_path(key):
+    return os.path.join(_store_dir("analysis"), f"{key}.npz")
+
+
+def has_analysis(key):
+    return os.path.exists(analysis_path(key))
+
+
+def save_analysis(key, features):
+    """Cache the analysed curves (HR, EMG envelope, ...) of a render."""
+    path = analysis_path(key)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **as_signals(features))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_analysis(key):
+    with np.load(analysis_path(key)) as data:
+        return {name: data[name] for name in data.files}
+
+
+# --- Subject store ---
+# Whole-recording analysis curves (c2h5oh.subjects), keyed by the upload hash
+# (one WESAD pickle is one subject) and shared by every render of it.
+def subject_path(subject_id, version):
+    return os.path.join(_store_dir("subjects"), f"{subject_id}.v{version}.npz")
+
+
+def has_subject(subject_id, version):
+    return os.path.exists(subject_path(subject_id, version))
+
+
+def save_subject(subject_id, version, curves):
+    path = subject_path(subject_id, version)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **as_signals(curves))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_subject(subject_id, version, names=None):
+    """The stored curves, or only ``names`` of them (npz members load lazily)."""
+    with np.load(subject_path(subject_id, version)) as data:
+        return {name: data[name] for name in (names or data.files)}
+
+
+def subject_stats_path(subject_id, version):
+    return os.path.join(_store_dir("subjects"), f"{subject_id}.v{version}.stats.json")
+
+
+def has_subject_stats(subject_id, version):
+    return os.path.exists(subject_stats_path(subject_id, version))
+
+
+def save_subject_stats(subject_id, version, stats):
+    """Per-channel normalisation statistics (c2h5oh.normalisation, as dicts)."""
+    path = subject_stats_path(subject_id, version)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_subject_stats(subject_id, version):
+    with open(subject_stats_path(subject_id, version)) as f:
+        return json.load(f)
+
+
+def pyramid_dir(subject_id, version):
+    return os.path.join(settings.RENDER_STORE_DIR, "pyramids", f"{subject_id}.v{version}")
+
+
+def has_pyramid(subject_id, version):
+    return os.path.exists(os.path.join(pyramid_dir(subject_id, version), "meta.json"))
+
+
+def save_subject_pyramid(subject_id, version, series):
+    """Min/max plotting pyramid (c2h5oh.pyramid) of ``series`` ({name: (samples, rate)})."""
+    return save_pyramid(pyramid_dir(subject_id, version), series)
+
+
+def load_subject_pyramid(subject_id, version):
+    return SignalPyramid.open(pyramid_dir(subject_id, version))
+
+
+def features_path(subject_id, version):
+    return os.path.join(_store_dir("features"), f"{subject_id}.v{version}.npz")
+
+
+def has_subject_features(subject_id, version):
+    return os.path.exists(features_path(subject_id, version))
+
+
+def save_subject_features(subject_id, version, curves, rate):
+    """Per-second and per-window feature tables (c2h5oh.feature_index) of ``curves``."""
+    return save_subject_tables(features_path(subject_id, version), curves, rate)
+
+
+_FEATURE_INDEXES = {}
+
+
+def load_feature_index(version):
+    """FeatureIndex of every stored subject. A subject's tables never change
+    under its version, so the index is rebuilt only when subjects are added."""
+    suffix = f".v{version}.npz"
+    paths = {
+        name[: -len(suffix)]: os.path.join(_store_dir("features"), name)
+        for name in sorted(os.listdir(_store_dir("features")))
+        if name.endswith(suffix)
+    }
+    cache_key = (version, tuple(paths))
+    if cache_key not in _FEATURE_INDEXES:
+        _FEATURE_INDEXES.clear()
+        _FEATURE_INDEXES[cache_key] = FeatureIndex.of_subjects(paths)
+    return _FEATURE_INDEXES[cache_key]
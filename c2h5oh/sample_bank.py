@@ -0,0 +1,107 @@
+import fcntl
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .audio_arrays import as_array
+
+
+# --- Shared sample bank ---
+# Drum hits and sustained (un-enveloped) instrument voices rendered once and
+# published as one read-only file: a JSON index padded to HEADER_BYTES, then
+# the float32 samples back to back. Every worker process memory-maps the same
+# file, so the pages live once in the page cache (tmpfs under /dev/shm) and
+# mixing reads straight from zero-copy views into it.
+BANK_FORMAT = 1
+HEADER_BYTES = 64 * 1024  # keeps the payload page-aligned
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+DEFAULT_BANK_PATH = os.getenv(
+    "SAMPLE_BANK_PATH", os.path.join(_SHM_DIR, "c2h5oh-sample-bank.bin")
+)
+
+
+class SampleBank:
+    """Read-only view of a published bank file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_BYTES).rstrip(b"\0"))
+        self.path = path
+        self.version = header["version"]
+        self.frame_rate = header["frame_rate"]
+        self.index = header["index"]  # name -> [offset, length] in samples
+        self._data = np.memmap(path, dtype=np.float32, mode="r", offset=HEADER_BYTES)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get(self, name):
+        """Zero-copy float32 view of one sample, or None."""
+        entry = self.index.get(name)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._data[offset:offset + length]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+
+def _read_version(path):
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_BYTES).rstrip(b"\0"))
+        return header.get("format"), header.get("version")
+    except (OSError, ValueError):
+        return None, None
+
+
+def build_sample_bank(path, voices, frame_rate, version):
+    """Render ``voices`` (name -> callable returning samples) into a bank file.
+
+    The file is written next to ``path`` and renamed into place, so processes
+    that still map an older bank keep their (unlinked) copy until they exit.
+    """
+    arrays, index, offset = [], {}, 0
+    for name, voice in voices.items():
+        samples = as_array(voice(), frame_rate)
+        index[name] = [offset, len(samples)]
+        offset += len(samples)
+        arrays.append(samples)
+
+    header = json.dumps(
+        {"format": BANK_FORMAT, "version": version, "frame_rate": frame_rate, "index": index}
+    ).encode("utf-8")
+    if len(header) > HEADER_BYTES:
+        raise ValueError("Sample bank index does not fit in the header.")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_BYTES, b"\0"))
+        for samples in arrays:
+            f.write(samples.tobytes())
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, path)
+    return path
+
+
+def attach_sample_bank(voices, frame_rate, version, path=DEFAULT_BANK_PATH):
+    """Attach to the published bank, building it first if it is missing or stale.
+
+    Safe to call from many processes at once: the first one builds under an
+    exclusive file lock, the rest wait and then map the finished file. Call it
+    in a pre-fork master (Celery worker_init, gunicorn --preload) to warm up.
+    """
+    if _read_version(path) != (BANK_FORMAT, version):
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if _read_version(path) != (BANK_FORMAT, version):
+                    print(f"Building sample bank {path} ({version})...")
+                    build_sample_bank(path, voices, frame_rate, version)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return SampleBank(path)
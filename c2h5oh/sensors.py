@@ -0,0 +1,499 @@
+import time
+
+import numpy as np
+import neurokit2 as nk
+
+from .audio_arrays import apply_envelope, array_to_segment, db_to_gain
+from .engine import IncrementalRenderer, beat_event, render_events
+from .features import lazy
+from .filters import one_pole_highpass, one_pole_lowpass, one_pole_lowpass_automated
+from .multirate import LazyCurve, process_slow_channels
+from .oscillators import noise, noise_texture, samples_for, sawtooth, sine
+from .render_config import DEFAULT_SENSOR_CONFIG
+from .stems import mix_stems
+from .subjects import SUBJECT_CURVE_RATE, chest_features, wrist_features
+from .textures import automation_curve, coverage_envelope, switch_weights
+
+
+# --- Multi-sensor songs ---
+# The chest (ECG, EMG, EDA, respiration, temperature) and wrist (BVP, EDA,
+# TEMP, ACC) generators: instruments, planners and rendering, shared by the
+# beat_maker_more_sensors script, batch renders (c2h5oh.render_batch) and the
+# dataset workflow (c2h5oh.batch).
+SEGMENT_DURATION_SEC = 60
+# Preview renders: low-rate mono, no filters, time budget
+FULL_SAMPLE_RATE = 44100
+PREVIEW_SAMPLE_RATE = 11025
+PREVIEW_LATENCY_BUDGET_SEC = 1.0
+
+
+# --- Musical Constants & Modes ---
+SCALE_MAJOR = [261.63, 293.66, 329.63, 349.23, 392.00, 440.00, 493.88, 523.25]
+SCALE_MINOR_HARM = [261.63, 293.66, 311.13, 349.23, 392.00, 415.30, 493.88, 523.25]
+SCALE_LYDIAN = [261.63, 293.66, 329.63, 369.99, 392.00, 440.00, 493.88, 523.25]
+SCALES = {'major': SCALE_MAJOR, 'minor_harm': SCALE_MINOR_HARM, 'lydian': SCALE_LYDIAN}
+
+CHORDS = {
+    'C': [261.63, 329.63, 392.00], 'Am': [220.00, 261.63, 329.63],
+    'F': [174.61, 220.00, 261.63], 'G': [196.00, 246.94, 293.66],
+}
+BASE_PROG = ['C', 'Am', 'F', 'G']
+
+
+# --- Instruments ---
+# Float32 arrays from the NumPy oscillators; preview=True synthesises at
+# PREVIEW_SAMPLE_RATE and skips the filters
+def _rate(preview):
+    return PREVIEW_SAMPLE_RATE if preview else FULL_SAMPLE_RATE
+
+
+def _n(dur_ms, preview):
+    return samples_for(dur_ms, _rate(preview))
+
+
+def get_kick(dur_ms=100, preview=False):
+    return apply_envelope(sine(60, _n(dur_ms, preview), _rate(preview)), _rate(preview), fade_out_ms=60)
+
+
+def get_snare(dur_ms=150, preview=False):
+    low = sine(180, _n(dur_ms, preview), _rate(preview)) * db_to_gain(-8)
+    high = noise(_n(dur_ms, preview), seed=1)
+    if not preview:
+        high = one_pole_highpass(high, 2000, _rate(preview))
+    return apply_envelope(low + high * db_to_gain(-12), _rate(preview), fade_out_ms=100)
+
+
+def get_hihat(dur_ms=50, preview=False):
+    hihat = noise(_n(dur_ms, preview), seed=2)
+    if not preview:
+        hihat = one_pole_highpass(hihat, 8000, _rate(preview))
+    return apply_envelope(hihat, _rate(preview), fade_out_ms=40, gain_db=-18)
+
+
+def get_piano_note(freq, dur_ms=400, preview=False):
+    voice = sine(freq, _n(dur_ms, preview), _rate(preview))
+    if not preview:
+        saw = one_pole_lowpass(sawtooth(freq, _n(dur_ms, preview), _rate(preview)), 1000, _rate(preview))
+        voice = voice + saw * db_to_gain(-15)
+    return apply_envelope(voice, _rate(preview), 5, 300, -8)
+
+
+def get_guitar_chord(chord_name, intensity_0_to_1, dur_ms=2000, preview=False):
+    root_freqs = CHORDS.get(chord_name, CHORDS['C'])
+    # Power chord = Root + 5th
+    power_chord_freqs = [root_freqs[0], root_freqs[2]]
+    guitar = np.zeros(_n(dur_ms, preview), dtype=np.float32)
+    # EDA intensity controls filter brightness. Higher = brighter/buzzier.
+    filter_cutoff = 500 + (intensity_0_to_1 * 3000)
+
+    for freq in power_chord_freqs:
+        # Sawtooth wave for electric guitar-like grit
+        string = sawtooth(freq / 2, len(guitar), _rate(preview))
+        if not preview:
+            string = one_pole_lowpass(string, filter_cutoff, _rate(preview))
+        guitar += string
+
+    return apply_envelope(guitar, _rate(preview), 100, 500, -25 + (intensity_0_to_1 * 12))
+
+
+def get_breathing_pad(chord_name, resp_val_0_to_1, dur_ms=500, preview=False):
+    pad_slice = np.zeros(_n(dur_ms, preview), dtype=np.float32)
+    for freq in CHORDS.get(chord_name, CHORDS['C']):
+        pad_slice += sine(freq, len(pad_slice), _rate(preview))
+    # Breathing value directly controls the volume of this pad slice
+    volume_db = -40 + (resp_val_0_to_1 * 25)
+    return apply_envelope(pad_slice, _rate(preview), 100, 100, volume_db)
+
+
+def get_warmth_drone(temp_val_0_to_1, dur_ms=1000, preview=False):
+    # White noise filtered based on body temperature.
+    # Warmer temp = higher cutoff frequency = "brighter" hiss.
+    cutoff = 100 + (temp_val_0_to_1 * 800)
+    volume = -35 + (temp_val_0_to_1 * 8)
+    # Seeded from the parameters so consecutive slices do not repeat
+    hiss = noise(_n(dur_ms, preview), seed=hash((temp_val_0_to_1, dur_ms)))
+    if preview:
+        # Unfiltered noise is much brighter, so pull it down instead
+        volume -= 12
+    else:
+        hiss = one_pole_lowpass(hiss, cutoff, _rate(preview))
+    return apply_envelope(hiss, _rate(preview), 500, 500, volume)
+
+
+def get_pulse_bass(bvp_val_0_to_1, dur_ms=200, preview=False):
+    # Bass sound driven by Blood Volume Pulse (wrist BVP sensor)
+    # Higher BVP = deeper/louder bass hit
+    base_freq = 40 + (bvp_val_0_to_1 * 30)  # 40-70 Hz range
+    bass = sine(base_freq, _n(dur_ms, preview), _rate(preview))
+    # Add harmonics for richness
+    bass += sine(base_freq * 2, len(bass), _rate(preview)) * db_to_gain(-10)
+    volume = -20 + (bvp_val_0_to_1 * 15)
+    return apply_envelope(bass, _rate(preview), 10, 100, volume)
+
+
+def get_movement_percussion(acc_intensity_0_to_1, dur_ms=80, preview=False):
+    # Percussive hit based on accelerometer movement
+    # More movement = brighter, louder percussion
+    if acc_intensity_0_to_1 < 0.1:
+        return np.zeros(_n(dur_ms, preview), dtype=np.float32)
+
+    freq = 200 + (acc_intensity_0_to_1 * 400)
+    perc = sine(freq, _n(dur_ms, preview), _rate(preview))
+    hiss = noise(len(perc), seed=3)
+    if not preview:
+        hiss = one_pole_highpass(hiss, 3000, _rate(preview))
+    volume = -25 + (acc_intensity_0_to_1 * 20)
+    return apply_envelope(perc + hiss * db_to_gain(-15), _rate(preview), fade_out_ms=50, gain_db=volume)
+
+
+# --- Continuous textures ---
+# The drone and the breathing pad as single voices over the whole segment
+# (c2h5oh.textures): the per-beat drone / breathing_pad events only supply
+# control points for gain, cutoff and chord automation, so there are no
+# per-beat fades and no per-beat synth-and-filter cost.
+DRONE_NOISE_SEED = 4
+
+
+def render_drone_texture(events, length, frame_rate, preview=False):
+    temp = automation_curve(events, 'temp_val_0_to_1', length, frame_rate)
+    hiss = noise_texture(length, seed=DRONE_NOISE_SEED)
+    volume = -35 + (temp * 8)
+    if preview:
+        volume -= 12
+    else:
+        hiss = one_pole_lowpass_automated(hiss, 100 + (temp * 800), frame_rate)
+    return hiss * db_to_gain(volume) * coverage_envelope(events, length, frame_rate, 500)
+
+
+def render_breathing_texture(events, length, frame_rate, preview=False):
+    resp = automation_curve(events, 'resp_val_0_to_1', length, frame_rate)
+    pad = np.zeros(length, dtype=np.float32)
+    for chord_name, weight in switch_weights(events, 'chord_name', length, frame_rate).items():
+        active = np.flatnonzero(weight)
+        if not len(active):
+            continue
+        lo, hi = active[0], active[-1] + 1
+        for freq in CHORDS.get(chord_name, CHORDS['C']):
+            # Phase as if the sine had been running since sample 0
+            pad[lo:hi] += sine(freq, hi - lo, frame_rate, phase=(lo * freq / frame_rate) % 1.0) * weight[lo:hi]
+    return pad * db_to_gain(-40 + (resp * 25)) * coverage_envelope(events, length, frame_rate, 100)
+
+
+TEXTURE_VOICES = {'drone': render_drone_texture, 'breathing_pad': render_breathing_texture}
+
+
+# --- Logic & Generation ---
+# Each song is analysed once (analyse_*), arranged into BeatEvents driven by a
+# SensorConfig (plan_*) and synthesised by c2h5oh.engine. The plan is cheap, so
+# an IncrementalRenderer can re-plan on every config tweak and only re-render
+# the stems and time ranges that actually changed.
+INSTRUMENTS = {
+    'kick': get_kick, 'snare': get_snare, 'hihat': get_hihat, 'piano': get_piano_note,
+    'guitar': get_guitar_chord, 'breathing_pad': get_breathing_pad, 'drone': get_warmth_drone,
+    'pulse_bass': get_pulse_bass, 'movement_perc': get_movement_percussion,
+}
+KICK_MS, SNARE_MS, HIHAT_MS = 100, 150, 50
+# Rendered as onset trains (one FFT convolution per drum, see c2h5oh.engine)
+ONSET_INSTRUMENTS = ('kick', 'snare', 'hihat')
+
+
+def determine_musical_mode(hr_bpm, eda_norm, resp_rate_bpm, emg_norm, config=DEFAULT_SENSOR_CONFIG):
+    # Thresholds may need tuning based on specific subject data (see SensorConfig)
+    if hr_bpm < config.meditation_hr and resp_rate_bpm < config.meditation_resp_rate:
+        return 'MEDITATION'
+    if hr_bpm > config.stress_hr and eda_norm > config.stress_eda:
+        return 'STRESS'
+    if hr_bpm > config.amusement_hr and emg_norm > config.amusement_emg:
+        return 'AMUSEMENT'
+    return 'BASELINE'
+
+
+def _normalise_temp(temp, config):
+    # Fixed expected physiological range (30C-37C by default), applied as the planner reads
+    low, span = config.temp_min, config.temp_max - config.temp_min
+    return lazy(temp, lambda values: np.clip((values - low) / span, 0.0, 1.0))
+
+
+def _plan_mode_layers(events, mode, beat_counter, chord_idx, last_melody_idx, time_ms, ms_per_beat,
+                      cur_eda, melody_val, config):
+    """Layer 2 (mode-specific instruments), shared by the chest and wrist songs.
+    ``melody_val`` is EMG on the chest and ACC on the wrist. Returns the new melody index."""
+    if mode == 'MEDITATION':
+        scale = SCALES[config.meditation_scale]
+        # No drums. Sparse, echoing melody notes if muscles slightly active
+        if beat_counter % 2 == 0 and melody_val > config.meditation_melody_gate:
+            events.append(beat_event('melody', time_ms, 'piano', 2500, gain_db=-15,
+                                     freq=scale[last_melody_idx % 8]))
+            # Slow melody movement
+            last_melody_idx += 1
+
+    elif mode == 'STRESS':
+        # Aggressive drums (Kick on every beat, busy hi-hats)
+        events.append(beat_event('drums', time_ms, 'kick', KICK_MS, gain_db=2))
+        events.append(beat_event('drums', time_ms, 'hihat', HIHAT_MS))
+        events.append(beat_event('drums', time_ms + (ms_per_beat / 2), 'hihat', HIHAT_MS, gain_db=-5))  # 8th notes
+        if beat_counter % 2 == 1:
+            events.append(beat_event('drums', time_ms, 'snare', SNARE_MS))
+        # Distorted Guitar Power Chords on beat 1 of every bar, brightness from EDA
+        if beat_counter % 4 == 0:
+            events.append(beat_event('harmony', time_ms, 'guitar', ms_per_beat * 4,
+                                     chord_name=BASE_PROG[chord_idx % 4], intensity_0_to_1=float(cur_eda)))
+
+    elif mode == 'AMUSEMENT':
+        scale = SCALES[config.base_scale]
+        # Upbeat Pop (Bouncy kick pattern, syncopated snare)
+        if beat_counter % 4 == 0 or beat_counter % 4 == 2:  # Kick on 1 and 3
+            events.append(beat_event('drums', time_ms, 'kick', KICK_MS))
+        if beat_counter % 4 == 1 or beat_counter % 4 == 3:  # Snare on 2 and 4
+            events.append(beat_event('drums', time_ms, 'snare', SNARE_MS))
+        # Off-beat hi-hats
+        events.append(beat_event('drums', time_ms + (ms_per_beat / 2), 'hihat', HIHAT_MS))
+
+        # Active, plucky melody
+        if melody_val > config.amusement_melody_gate:
+            events.append(beat_event('melody', time_ms, 'piano', 300, freq=scale[last_melody_idx % 8]))
+            # Faster melody movement
+            last_melody_idx += 1 if melody_val > config.amusement_melody_up else -1
+
+    else:  # BASELINE
+        # Chill beat
+        if beat_counter % 4 == 0:
+            events.append(beat_event('drums', time_ms, 'kick', KICK_MS))
+        if beat_counter % 4 == 2:
+            events.append(beat_event('drums', time_ms, 'snare', SNARE_MS))
+        events.append(beat_event('drums', time_ms, 'hihat', HIHAT_MS, gain_db=-10))
+
+    return last_melody_idx
+
+
+def analyse_chest(emg, eda, resp, temp, rate, stats):
+    """Pre-process the chest signals into the curves the planner reads.
+
+    EDA, respiration and temperature go through the multi-rate path
+    (c2h5oh.multirate): processed at a few Hz and returned as LazyCurves that
+    the planner indexes at ``rate``, interpolating only at the beats it reads.
+    The 0-1 features are normalised per read too (c2h5oh.features), with the
+    subject's ``stats`` (recording_stats), so every segment is scaled alike.
+    """
+    # Normalize EMG (0-1)
+    emg_norm = lazy(nk.emg_amplitude(emg), stats['emg_amplitude'].normaliser())
+
+    slow = process_slow_channels(rate, eda=eda, resp=resp, temp=temp, length=len(emg))
+    # Normalize EDA (0-1)
+    eda_norm = lazy(slow['eda'], stats['eda'].normaliser())
+    # Respiration: rate in BPM and normalized swell 0-1
+    resp_swell = lazy(slow['resp_swell'], stats['resp_swell'].normaliser())
+
+    # Temperature stays in degrees C; SensorConfig decides the mapped range
+    return {'emg_norm': emg_norm, 'eda_norm': eda_norm, 'resp_rate': slow['resp_rate'],
+            'resp_swell': resp_swell, 'temp': slow['temp']}
+
+
+def plan_song(features, rate, total_sec, config=DEFAULT_SENSOR_CONFIG):
+    """Arrange the chest song from analysed ``features`` (see analyse_chest, plus 'ecg_rate')."""
+    ecg_rate, emg_norm, eda_norm = features['ecg_rate'], features['emg_norm'], features['eda_norm']
+    resp_swell, resp_rate_sig = features['resp_swell'], features['resp_rate']
+    temp_norm = _normalise_temp(features['temp'], config)
+    events = []
+
+    current_time_ms = 0
+    beat_counter = 0
+    chord_idx = 0
+    last_melody_idx = 0
+    current_mode = 'BASELINE'
+
+    while current_time_ms < (total_sec * 1000) - 2000:
+        # A. Get bio-data snapshot for this exact moment
+        sec_idx = min(int((current_time_ms / 1000) * rate), len(ecg_rate) - 1)
+
+        cur_bpm = np.clip(ecg_rate[sec_idx], config.bpm_min, config.bpm_max)
+        ms_per_beat = 60000 / cur_bpm
+
+        cur_eda = eda_norm[sec_idx]
+        cur_emg = emg_norm[sec_idx]
+        cur_resp_swell = resp_swell[sec_idx]
+        cur_temp = np.mean(temp_norm[sec_idx:min(len(temp_norm), sec_idx + rate)])
+        # Get average respiration rate over last 5 seconds for stability
+        cur_resp_rate = np.mean(resp_rate_sig[max(0, sec_idx - rate * 5):sec_idx + 1]) if sec_idx > rate * 5 else 15
+
+        # B. "Band Leader": Determine Mode every 4 beats
+        if beat_counter % 4 == 0:
+            new_mode = determine_musical_mode(cur_bpm, cur_eda, cur_resp_rate, cur_emg, config)
+            if new_mode != current_mode:
+                print(
+                    f"[{int(current_time_ms / 1000)}s] Mode Switch: {current_mode} -> {new_mode} | HR: {cur_bpm:.0f}, RespRate: {cur_resp_rate:.1f}")
+                current_mode = new_mode
+
+        # --- C. MUSICAL LAYERS ---
+        # Layer 1: Always-on Textures (Temperature Drone & Breathing Pads)
+        # Drone updates every beat for smooth temperature shifts
+        events.append(beat_event('textures', current_time_ms, 'drone', ms_per_beat, temp_val_0_to_1=float(cur_temp)))
+        # Pad swells match breathing exactly
+        events.append(beat_event('textures', current_time_ms, 'breathing_pad', ms_per_beat,
+                                 chord_name=BASE_PROG[chord_idx % 4], resp_val_0_to_1=float(cur_resp_swell)))
+
+        # Layer 2: Mode-Specific Instruments
+        last_melody_idx = _plan_mode_layers(events, current_mode, beat_counter, chord_idx, last_melody_idx,
+                                            current_time_ms, ms_per_beat, cur_eda, cur_emg, config)
+
+        # Advance time based on current subject heart rate
+        current_time_ms += ms_per_beat
+        beat_counter += 1
+        if beat_counter % 4 == 0: chord_idx += 1
+
+    return events
+
+
+def render_planned(events, total_sec, preview=False, deadline=None, stems=False, continuous_textures=True):
+    """continuous_textures=False renders the drone and pad per beat, as before.
+    Previews get PREVIEW_LATENCY_BUDGET_SEC from here unless given a ``deadline``."""
+    if preview and deadline is None:
+        deadline = time.monotonic() + PREVIEW_LATENCY_BUDGET_SEC
+    frame_rate = _rate(preview)
+    buffers = render_events(events, INSTRUMENTS, total_sec * 1000, frame_rate, preview, deadline=deadline,
+                            onset_instruments=ONSET_INSTRUMENTS,
+                            continuous_instruments=TEXTURE_VOICES if continuous_textures else None)
+    layers = {name: array_to_segment(samples, frame_rate) for name, samples in buffers.items()}
+    return layers if stems else mix_stems(layers)
+
+
+def generate_song_structure(ecg_rate, emg, eda, resp, temp, rate, total_sec, stats, preview=False, deadline=None,
+                            stems=False, config=DEFAULT_SENSOR_CONFIG):
+    """Chest-device song. stems=True returns the drums / harmony / melody / textures
+    buses (see c2h5oh.stems) instead of the mixdown."""
+    print(f"--> Generating {total_sec}s of audio...")
+    features = analyse_chest(emg, eda, resp, temp, rate, stats)
+    features['ecg_rate'] = ecg_rate
+    events = plan_song(features, rate, total_sec, config)
+    return render_planned(events, total_sec, preview, deadline, stems)
+
+
+def determine_musical_mode_wrist(hr_bpm, eda_norm, acc_intensity, config=DEFAULT_SENSOR_CONFIG):
+    # Mode determination for wrist data (no EMG or respiration)
+    if hr_bpm < config.meditation_hr and acc_intensity < config.meditation_acc:
+        return 'MEDITATION'
+    if hr_bpm > config.stress_hr and eda_norm > config.stress_eda:
+        return 'STRESS'
+    if acc_intensity > config.amusement_acc:
+        return 'AMUSEMENT'
+    return 'BASELINE'
+
+
+def analyse_wrist(eda, temp, acc, bvp_sampling_rate, eda_sampling_rate, acc_sampling_rate, stats):
+    """Pre-process the wrist signals, indexed on the BVP grid.
+
+    EDA, TEMP and ACC stay at their own rates as LazyCurves (c2h5oh.multirate)
+    and are only interpolated and normalised (with the subject's ``stats``)
+    where the planner reads them.
+    """
+    length = int(len(eda) * bvp_sampling_rate / eda_sampling_rate)
+    # Normalize EDA (0-1) - no cleaning due to low sampling rate
+    eda_resampled = lazy(LazyCurve(eda, eda_sampling_rate, bvp_sampling_rate, length),
+                         stats['wrist_eda'].normaliser())
+
+    # Temperature stays in degrees C; SensorConfig decides the mapped range
+    temp_resampled = LazyCurve(temp, eda_sampling_rate, bvp_sampling_rate, length)
+
+    # Calculate accelerometer magnitude (movement intensity) - replaces EMG for melody control
+    acc_magnitude = np.sqrt(np.sum(acc**2, axis=1))
+    acc_resampled = lazy(LazyCurve(acc_magnitude, acc_sampling_rate, bvp_sampling_rate),
+                         stats['acc_magnitude'].normaliser())
+
+    return {'eda_norm': eda_resampled, 'temp': temp_resampled, 'acc_norm': acc_resampled}
+
+
+def plan_wrist_song(features, bvp_sampling_rate, total_sec, config=DEFAULT_SENSOR_CONFIG):
+    """Arrange the wrist song from analysed ``features`` (see analyse_wrist, plus 'bvp_rate')."""
+    bvp_rate, eda_resampled, acc_resampled = features['bvp_rate'], features['eda_norm'], features['acc_norm']
+    temp_resampled = _normalise_temp(features['temp'], config)
+    events = []
+
+    current_time_ms = 0
+    beat_counter = 0
+    chord_idx = 0
+    last_melody_idx = 0
+    current_mode = 'BASELINE'
+
+    while current_time_ms < (total_sec * 1000) - 2000:
+        # Get bio-data snapshot
+        sec_idx = min(int((current_time_ms / 1000) * bvp_sampling_rate), len(bvp_rate) - 1)
+
+        # BVP controls tempo (same as ECG in chest)
+        cur_bpm = np.clip(bvp_rate[sec_idx], config.bpm_min, config.bpm_max)
+        ms_per_beat = 60000 / cur_bpm
+
+        cur_eda = eda_resampled[min(sec_idx, len(eda_resampled) - 1)]
+        cur_temp = temp_resampled[min(sec_idx, len(temp_resampled) - 1)]
+        cur_acc = acc_resampled[min(sec_idx, len(acc_resampled) - 1)]
+
+        # Determine mode every 4 beats (using ACC instead of EMG for movement)
+        if beat_counter % 4 == 0:
+            new_mode = determine_musical_mode_wrist(cur_bpm, cur_eda, cur_acc, config)
+            if new_mode != current_mode:
+                print(f"[{int(current_time_ms / 1000)}s] Wrist Mode: {current_mode} -> {new_mode} | HR: {cur_bpm:.0f}, Movement: {cur_acc:.2f}")
+                current_mode = new_mode
+
+        # Layer 1: Always-on Textures
+        # Temperature Drone (SAME as chest)
+        events.append(beat_event('textures', current_time_ms, 'drone', ms_per_beat, temp_val_0_to_1=float(cur_temp)))
+
+        # Layer 2: Mode-Specific Instruments (ACC replaces EMG for the melody)
+        last_melody_idx = _plan_mode_layers(events, current_mode, beat_counter, chord_idx, last_melody_idx,
+                                            current_time_ms, ms_per_beat, cur_eda, cur_acc, config)
+
+        # BONUS: Movement percussion (unique to wrist - extra layer showing movement)
+        if current_mode == 'AMUSEMENT' and cur_acc > config.movement_perc_acc:
+            events.append(beat_event('drums', current_time_ms + int(ms_per_beat * 0.25), 'movement_perc',
+                                     int(ms_per_beat * 0.3), acc_intensity_0_to_1=float(cur_acc)))
+
+        current_time_ms += ms_per_beat
+        beat_counter += 1
+        if beat_counter % 4 == 0:
+            chord_idx += 1
+
+    return events
+
+
+def generate_wrist_song_structure(bvp_rate, eda, temp, acc, bvp_sampling_rate, eda_sampling_rate, acc_sampling_rate, total_sec,
+                                  stats, preview=False, deadline=None, stems=False, config=DEFAULT_SENSOR_CONFIG):
+    """Generate music from wrist device sensors: BVP, EDA, TEMP, ACC
+
+    Sensor Mapping (consistent with chest):
+    - TEMP (wrist) → Temperature Drone (same as chest TEMP)
+    - EDA (wrist) → Guitar intensity (same as chest EDA)
+    - BVP (wrist) → Heart rate for tempo (same as chest ECG)
+    - ACC (wrist) → Replaces EMG for melody + adds movement percussion
+
+    ``stats`` are the subject's normalisation stats (recording_stats).
+    stems=True returns the per-layer buses instead of the mixdown.
+    """
+    print(f"--> Generating {total_sec}s of WRIST audio...")
+    features = analyse_wrist(eda, temp, acc, bvp_sampling_rate, eda_sampling_rate, acc_sampling_rate, stats)
+    features['bvp_rate'] = bvp_rate
+    events = plan_wrist_song(features, bvp_sampling_rate, total_sec, config)
+    return render_planned(events, total_sec, preview, deadline, stems)
+
+
+def incremental_renderer(features, rate, total_sec, wrist=False, preview=False, continuous_textures=True):
+    """IncrementalRenderer over analysed chest (or wrist) features for tuning sweeps:
+
+        renderer = incremental_renderer(features, SUBJECT_CURVE_RATE, 60)
+        stems, stats = renderer.render(DEFAULT_SENSOR_CONFIG.updated({'stress_eda': 0.3}))
+    """
+    plan = plan_wrist_song if wrist else plan_song
+    return IncrementalRenderer(lambda f, config: plan(f, rate, total_sec, config),
+                               INSTRUMENTS, features, total_sec * 1000, _rate(preview),
+                               onset_instruments=ONSET_INSTRUMENTS,
+                               continuous_instruments=TEXTURE_VOICES if continuous_textures else None)
+
+
+# --- Rendering from subject curves ---
+DEVICES = {'chest': (chest_features, plan_song), 'wrist': (wrist_features, plan_wrist_song)}
+
+
+def render_device_segment(curves, stats, start, device, duration_sec=SEGMENT_DURATION_SEC, preview=False):
+    """Render of one device's song for the segment at ``start`` (curve samples)."""
+    features, plan = DEVICES[device]
+    segment_features = features(curves, start, duration_sec, stats)
+    events = plan(segment_features, SUBJECT_CURVE_RATE, duration_sec)
+    return render_planned(events, duration_sec, preview)
@@ -0,0 +1,183 @@
+import wave
+
+import numpy as np
+
+from .audio_arrays import to_pcm16
+from .engine import _samples, mix_events_into
+from .normalisation import curve_stats
+from .render_config import DEFAULT_POP_CONFIG
+from .stems import STEM_NAMES
+from .subjects import SUBJECT_CURVE_RATE, pop_features
+from .utils import (
+    FULL_SAMPLE_RATE,
+    INSTRUMENTS,
+    ONSET_INSTRUMENTS,
+    SEGMENTS_TO_GENERATE,
+    bank_samples,
+    plan_song,
+)
+
+
+# --- Full-session arrangement ---
+# Instead of one 60 s window per label, the whole recording becomes one piece:
+# every run of a label in the recording is a section with its own PopConfig,
+# neighbouring sections overlap by SESSION_CROSSFADE_SEC and are crossfaded
+# (equal power), and the audio is rendered SESSION_BLOCK_SEC at a time and
+# streamed to a WAV file. A section is planned when the first block reaches
+# it and dropped once the blocks are past it, so memory and the cost per
+# minute do not grow with the session length. POST /api/sessions/ queues it
+# (tasks.render_full_session); GET /api/sessions/<key>/ reports progress and
+# then serves the file.
+SESSION_BLOCK_SEC = 30
+SESSION_CROSSFADE_SEC = 4.0
+MIN_SECTION_SEC = 20  # shorter label runs are absorbed by the section before
+PLAN_TAIL_SEC = 2  # plan_song leaves the last 2 s of its window empty
+
+# PopConfig overrides per WESAD label; labels not listed (0 and the
+# questionnaire periods 5-7) play as transitions with the default config
+SESSION_SECTIONS = {
+    SEGMENTS_TO_GENERATE["baseline"]: {},
+    SEGMENTS_TO_GENERATE["stress"]: {"scale": "minor_harm", "chorus_bpm": 85.0},
+    SEGMENTS_TO_GENERATE["fun"]: {"scale": "lydian", "melody_gate": 0.15},
+    SEGMENTS_TO_GENERATE["meditation"]: {"melody_gate": 0.35, "chorus_pad_gain_db": 0.0},
+}
+LABEL_NAMES = {label_id: name for name, label_id in SEGMENTS_TO_GENERATE.items()}
+
+
+def label_runs(labels, min_samples=0):
+    """Index of the runs in a label curve: [(label_id, start, end)], end
+    exclusive. Runs shorter than ``min_samples`` are merged into the run before
+    (or, at the very start, the run after)."""
+    labels = np.asarray(labels)
+    if len(labels) == 0:
+        return []
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(labels)) + 1, [len(labels)]))
+    runs = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        label_id, start, end = int(labels[start]), int(start), int(end)
+        if runs and (end - start < min_samples or runs[-1][0] == label_id):
+            runs[-1] = (runs[-1][0], runs[-1][1], end)
+        elif runs and runs[-1][2] - runs[-1][1] < min_samples:
+            runs[-1] = (label_id, runs[-1][1], end)
+        else:
+            runs.append((label_id, start, end))
+    return runs
+
+
+class Section:
+    """One label run: its config, planned window and crossfade gain."""
+
+    def __init__(self, label_id, start_sec, end_sec, session_sec, crossfade_sec):
+        self.label_id = label_id
+        self.name = LABEL_NAMES.get(label_id, "transition")
+        self.config = DEFAULT_POP_CONFIG.updated(SESSION_SECTIONS.get(label_id, {}))
+        self.start_sec, self.end_sec = start_sec, end_sec
+        half = crossfade_sec / 2
+        # Fades only where there is a neighbour
+        self.fade_in = (start_sec - half, start_sec + half) if start_sec > 0 else None
+        self.fade_out = (end_sec - half, end_sec + half) if end_sec < session_sec else None
+        self.plan_start = max(0.0, start_sec - half)
+        self.plan_end = min(session_sec, end_sec + half + PLAN_TAIL_SEC)
+        self.events = None
+
+    def overlaps(self, lo_sec, hi_sec):
+        audible_end = self.fade_out[1] if self.fade_out else self.end_sec
+        audible_start = self.fade_in[0] if self.fade_in else self.start_sec
+        return audible_start < hi_sec and audible_end > lo_sec
+
+    def plan(self, curves, stats):
+        """Plan the section's window once; event positions are session time."""
+        if self.events is None:
+            start = int(self.plan_start * SUBJECT_CURVE_RATE)
+            duration_sec = self.plan_end - self.plan_start
+            features = pop_features(curves, start, duration_sec, stats)
+            offset_ms = self.plan_start * 1000
+            self.events = [
+                event._replace(position_ms=event.position_ms + offset_ms)
+                for event in plan_song(features, SUBJECT_CURVE_RATE, duration_sec, self.config)
+            ]
+            self._starts = np.array([e.position_ms for e in self.events])
+            self._ends = self._starts + np.array([e.duration_ms for e in self.events])
+        return self.events
+
+    def release(self):
+        self.events = None
+
+    def events_between(self, lo_ms, hi_ms):
+        overlapping = np.flatnonzero((self._starts < hi_ms) & (self._ends > lo_ms))
+        return [self.events[i] for i in overlapping]
+
+    def gain(self, times_sec):
+        """Equal-power crossfade gain of this section at ``times_sec``."""
+        gain = np.ones(len(times_sec), dtype=np.float32)
+        for fade, rising in ((self.fade_in, True), (self.fade_out, False)):
+            if fade is None:
+                continue
+            position = np.clip((times_sec - fade[0]) / (fade[1] - fade[0]), 0.0, 1.0)
+            if not rising:
+                position = 1.0 - position
+            gain *= np.sin(position * np.pi / 2).astype(np.float32)
+        return gain
+
+
+def session_sections(curves, crossfade_sec=SESSION_CROSSFADE_SEC, min_section_sec=MIN_SECTION_SEC):
+    session_sec = len(curves["label"]) / SUBJECT_CURVE_RATE
+    return [
+        Section(label_id, start / SUBJECT_CURVE_RATE, end / SUBJECT_CURVE_RATE, session_sec, crossfade_sec)
+        for label_id, start, end in label_runs(
+            curves["label"], int(min_section_sec * SUBJECT_CURVE_RATE)
+        )
+    ]
+
+
+def render_session_blocks(curves, stats=None, frame_rate=FULL_SAMPLE_RATE,
+                          block_sec=SESSION_BLOCK_SEC, progress=None):
+    """Yield the mixdown of a whole subject session block by block (float32).
+
+    ``curves`` are whole-subject curves (c2h5oh.subjects); ``stats`` their
+    normalisation stats, computed here when missing. ``progress(done_sec,
+    total_sec, section_name)`` is called after every block.
+    """
+    stats = stats or curve_stats(curves)
+    sections = session_sections(curves)
+    total_sec = len(curves["label"]) / SUBJECT_CURVE_RATE
+    total = _samples(total_sec * 1000, frame_rate)
+    block = _samples(block_sec * 1000, frame_rate)
+    for lo in range(0, total, block):
+        cache = {}  # per block: tempo-dependent durations would grow it for hours
+        hi = min(lo + block, total)
+        lo_ms, hi_ms = lo * 1000 / frame_rate, hi * 1000 / frame_rate
+        mix = np.zeros(hi - lo, dtype=np.float32)
+        times_sec = (lo + np.arange(hi - lo)) / frame_rate
+        current = None
+        for section in sections:
+            if not section.overlaps(lo_ms / 1000, hi_ms / 1000):
+                if section.events is not None and section.plan_end * 1000 <= lo_ms:
+                    section.release()
+                continue
+            section.plan(curves, stats)
+            buffers = {name: np.zeros(hi - lo, dtype=np.float32) for name in STEM_NAMES}
+            mix_events_into(
+                buffers, lo, section.events_between(lo_ms, hi_ms), INSTRUMENTS, frame_rate,
+                cache=cache, sample_source=bank_samples, onset_instruments=ONSET_INSTRUMENTS,
+            )
+            mix += sum(buffers.values()) * section.gain(times_sec)
+            current = current or section.name
+        if progress is not None:
+            progress(hi / frame_rate, total / frame_rate, current)
+        yield mix
+
+
+def render_session(curves, path, stats=None, frame_rate=FULL_SAMPLE_RATE,
+                   block_sec=SESSION_BLOCK_SEC, progress=None):
+    """Render a whole subject session into a mono 16-bit WAV at ``path``,
+    streamed block by block. Returns the duration in seconds."""
+    frames = 0
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(frame_rate)
+        for mix in render_session_blocks(curves, stats, frame_rate, block_sec, progress):
+            out.writeframes(to_pcm16(mix).tobytes())
+            frames += len(mix)
+    return frames / frame_rate
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "c2h5oh",
 ]
 
 MIDDLEWARE = [
@@ -124,3 +125,60 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Celery
+# Broker used for background renders (e.g. the full-quality upgrade of a preview)
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+# Fail fast when the broker is down: queued renders then run in-process
+# (c2h5oh.tasks) instead of waiting out the connection retries
+CELERY_BROKER_CONNECTION_TIMEOUT = float(os.getenv("CELERY_BROKER_CONNECTION_TIMEOUT", "1"))
+CELERY_BROKER_CONNECTION_MAX_RETRIES = 0
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "socket_connect_timeout": CELERY_BROKER_CONNECTION_TIMEOUT,
+    "max_retries": 0,
+}
+# Publishing also subscribes to the result: without these the Redis result
+# backend retries for about 20 s before giving up
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
+    "socket_connect_timeout": CELERY_BROKER_CONNECTION_TIMEOUT,
+    "retry_policy": {"max_retries": 0},
+}
+# Renders are long: a worker takes one task at a time, so adding workers
+# spreads a batch (c2h5oh.batch) evenly instead of leaving tasks prefetched
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+
+# Render store
+# Uploaded pickles and rendered audio, keyed by content hash
+
+RENDER_STORE_DIR = os.getenv("RENDER_STORE_DIR", str(BASE_DIR / "render_store"))
+# Least recently used entries are evicted beyond this size (c2h5oh.ledger); 0 = unbounded
+RENDER_STORE_BUDGET_BYTES = int(os.getenv("RENDER_STORE_BUDGET_BYTES", str(5 * 1024 ** 3)))
+# Full renders also store waveform peaks; the spectrogram thumbnail is optional
+RENDER_SPECTROGRAM = os.getenv("RENDER_SPECTROGRAM", "1").lower() in ("1", "true", "yes", "on")
+
+
+# Render cache
+# Tier shared by all hosts in front of each host's render store (c2h5oh.cache):
+# "memory" (this process), "disk", "redis" (RENDER_CACHE_URL) or "fake-redis"
+
+RENDER_CACHE_BACKEND = os.getenv("RENDER_CACHE_BACKEND", "memory")
+RENDER_CACHE_URL = os.getenv("RENDER_CACHE_URL", "redis://localhost:6379/1")
+RENDER_CACHE_TTL_SEC = int(os.getenv("RENDER_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+
+
+# Render admission (async endpoint)
+# CPU-bound renders run on a bounded pool sized to the cores; at most
+# RENDER_QUEUE_DEPTH more wait for a worker, anything beyond gets a 429.
+# The cores are split between the two pools: each admitted render mixes on
+# RENDER_EXECUTOR_MIXER_WORKERS threads (not the block-parallel mixer's
+# RENDER_WORKERS), so WORKERS * MIXER_WORKERS threads are busy at most.
+
+RENDER_EXECUTOR_MIXER_WORKERS = int(os.getenv("RENDER_EXECUTOR_MIXER_WORKERS", "1"))
+RENDER_EXECUTOR_WORKERS = int(os.getenv("RENDER_EXECUTOR_WORKERS", "0")) or max(
+    1, (os.cpu_count() or 1) // RENDER_EXECUTOR_MIXER_WORKERS
+)
+RENDER_QUEUE_DEPTH = int(os.getenv("RENDER_QUEUE_DEPTH", "4"))
@@ -0,0 +1,51 @@
+import numpy as np
+
+from .audio_arrays import array_to_segment, segment_to_array
+
+
+# --- Stems ---
+# Every generator layer is rendered into one of these buses. Keeping them
+# apart lets a cached render be remixed (gains / mutes) with a few vector
+# adds instead of re-running the whole pipeline.
+STEM_NAMES = ("drums", "harmony", "melody", "textures")
+
+
+def stems_to_arrays(stems):
+    """Convert AudioSegment stems to float32 arrays at one common frame rate."""
+    frame_rate = max(stem.frame_rate for stem in stems.values())
+    arrays = {
+        name: segment_to_array(stem.set_frame_rate(frame_rate))
+        for name, stem in stems.items()
+    }
+    return arrays, frame_rate
+
+
+def validate_mix_params(gains_db=None, muted=()):
+    if not isinstance(gains_db or {}, dict) or not isinstance(muted, (list, tuple)):
+        raise ValueError("'gains' must be an object and 'mute' a list of stem names.")
+    unknown = (set(gains_db or {}) | set(muted)) - set(STEM_NAMES)
+    if unknown:
+        raise ValueError(
+            f"Unknown stem(s): {', '.join(sorted(unknown))}. "
+            f"Expected any of: {', '.join(STEM_NAMES)}."
+        )
+
+
+def remix(stem_arrays, gains_db=None, muted=()):
+    """Sum stem arrays with per-stem gain (dB) and mute flags."""
+    gains_db = gains_db or {}
+    length = max((len(samples) for samples in stem_arrays.values()), default=0)
+    mix = np.zeros(length, dtype=np.float32)
+    for name, samples in stem_arrays.items():
+        if name in muted:
+            continue
+        gain = np.float32(10 ** (float(gains_db.get(name, 0.0)) / 20))
+        mix[: len(samples)] += samples * gain
+    return mix
+
+
+def mix_stems(stems, gains_db=None, muted=()):
+    """Mix AudioSegment stems down to a single AudioSegment."""
+    arrays, frame_rate = stems_to_arrays(stems)
+    return array_to_segment(remix(arrays, gains_db, muted), frame_rate)
+
@@ -0,0 +1,286 @@
+import numpy as np
+import neurokit2 as nk
+
+from . import render_store
+from .cache import get_render_cache
+from .dtypes import SIGNAL_DTYPE, as_signal, as_signals
+from .features import LazyFeature
+from .multirate import process_slow_channels
+from .normalisation import curve_stats, stats_from_dict, stats_to_dict
+
+
+# --- Whole-subject analysis ---
+# Every physiological curve a generator reads is derived once from the
+# subject's complete recording (no edge artefacts at segment boundaries) and
+# kept at SUBJECT_CURVE_RATE on one shared timeline. Renders then just slice:
+# the per-request DSP cost is a few array views and a min/max.
+SUBJECT_CURVE_RATE = 50  # Hz; 20 ms is finer than any beat grid decision
+CHEST_SAMPLING_RATE = 700
+WRIST_BVP_SAMPLING_RATE = 64
+WRIST_EDA_SAMPLING_RATE = 4
+WRIST_ACC_SAMPLING_RATE = 32
+WRIST_SAMPLING_RATES = {
+    "BVP": WRIST_BVP_SAMPLING_RATE, "EDA": WRIST_EDA_SAMPLING_RATE,
+    "TEMP": WRIST_EDA_SAMPLING_RATE, "ACC": WRIST_ACC_SAMPLING_RATE,
+}
+# Bump when the curves change: stored subjects are only reused on a match
+SUBJECT_ANALYSIS_VERSION = 3
+
+
+def to_curve_rate(signal, sampling_rate, length=None):
+    """Resample a curve onto the SUBJECT_CURVE_RATE timeline (linear interpolation)."""
+    signal = as_signal(signal)
+    if length is None:
+        length = int(len(signal) * SUBJECT_CURVE_RATE / sampling_rate)
+    source_times = np.arange(len(signal)) / sampling_rate
+    curve = np.interp(np.arange(length) / SUBJECT_CURVE_RATE, source_times, signal)
+    return curve.astype(SIGNAL_DTYPE)
+
+
+def _heart_rate(signal, sampling_rate, ppg=False):
+    if ppg:
+        clean = nk.ppg_clean(signal, sampling_rate=sampling_rate)
+        _, peaks = nk.ppg_peaks(clean, sampling_rate=sampling_rate)
+    else:
+        clean = nk.ecg_clean(signal, sampling_rate=sampling_rate)
+        _, peaks = nk.ecg_peaks(clean, sampling_rate=sampling_rate)
+    return nk.signal_rate(peaks, sampling_rate=sampling_rate, desired_length=len(signal))
+
+
+def curve_length(labels):
+    """Length of a subject's curves, from its (chest-rate) label array."""
+    return int(len(labels) * SUBJECT_CURVE_RATE / CHEST_SAMPLING_RATE)
+
+
+def label_curve(labels):
+    labels = np.asarray(labels).ravel()
+    positions = np.arange(curve_length(labels)) * CHEST_SAMPLING_RATE // SUBJECT_CURVE_RATE
+    return labels[positions].astype(np.int16)
+
+
+def _analyse_ecg(chest, wrist, length):
+    if "ECG" not in chest:
+        return {}
+    print("Analysing subject heart rate (ECG)...")
+    rate = CHEST_SAMPLING_RATE
+    return {"hr": to_curve_rate(_heart_rate(as_signal(chest["ECG"]), rate), rate, length)}
+
+
+def _analyse_emg(chest, wrist, length):
+    if "EMG" not in chest:
+        return {}
+    rate = CHEST_SAMPLING_RATE
+    return {"emg_amplitude": to_curve_rate(nk.emg_amplitude(as_signal(chest["EMG"])), rate, length)}
+
+
+def _analyse_chest_slow(chest, wrist, length):
+    # Slow channels are decimated before processing (c2h5oh.multirate)
+    slow = process_slow_channels(
+        CHEST_SAMPLING_RATE,
+        eda=as_signal(chest["EDA"]) if "EDA" in chest else None,
+        resp=as_signal(chest["Resp"]) if "Resp" in chest else None,
+        temp=as_signal(chest["Temp"]) if "Temp" in chest else None,
+    )
+    return {
+        name: curve.at_rate(SUBJECT_CURVE_RATE, length).astype(SIGNAL_DTYPE)
+        for name, curve in slow.items()
+    }
+
+
+def _analyse_bvp(chest, wrist, length):
+    if "BVP" not in wrist:
+        return {}
+    print("Analysing subject heart rate (BVP)...")
+    bvp_rate = _heart_rate(as_signal(wrist["BVP"]), WRIST_BVP_SAMPLING_RATE, ppg=True)
+    return {"bvp_rate": to_curve_rate(bvp_rate, WRIST_BVP_SAMPLING_RATE, length)}
+
+
+def _analyse_wrist_slow(chest, wrist, length):
+    curves = {}
+    if "EDA" in wrist:
+        curves["wrist_eda"] = to_curve_rate(wrist["EDA"], WRIST_EDA_SAMPLING_RATE, length)
+    if "TEMP" in wrist:
+        curves["wrist_temp"] = to_curve_rate(wrist["TEMP"], WRIST_EDA_SAMPLING_RATE, length)
+    if "ACC" in wrist:
+        acc_magnitude = np.sqrt(np.sum(np.asarray(wrist["ACC"], dtype=SIGNAL_DTYPE) ** 2, axis=1))
+        curves["acc_magnitude"] = to_curve_rate(acc_magnitude, WRIST_ACC_SAMPLING_RATE, length)
+    return curves
+
+
+# Independent slices of the analysis: (device, channels read, analyser). Each
+# can run on its own (e.g. one Celery task each, c2h5oh.batch)
+CHANNEL_GROUPS = {
+    "ecg": ("chest", ("ECG",), _analyse_ecg),
+    "emg": ("chest", ("EMG",), _analyse_emg),
+    "chest_slow": ("chest", ("EDA", "Resp", "Temp"), _analyse_chest_slow),
+    "bvp": ("wrist", ("BVP",), _analyse_bvp),
+    "wrist_slow": ("wrist", ("EDA", "TEMP", "ACC"), _analyse_wrist_slow),
+}
+
+
+def analyse_channel_group(group, chest, wrist, length):
+    """The curves of one CHANNEL_GROUPS entry; ``chest`` / ``wrist`` map
+    channel names to raw arrays and may hold only the channels it reads."""
+    return CHANNEL_GROUPS[group][2](chest, wrist, length)
+
+
+def analyse_subject(data):
+    """Curves of a whole WESAD recording, all float32 at SUBJECT_CURVE_RATE.
+
+    Chest: "hr", "emg_amplitude", "eda", "resp_rate", "resp_swell", "temp".
+    Wrist: "bvp_rate", "wrist_eda", "wrist_temp", "acc_magnitude". Plus
+    "label". Channels missing from the recording are left out.
+    """
+    chest = data["signal"]["chest"]
+    wrist = data["signal"].get("wrist", {})
+    curves = {"label": label_curve(data["label"])}
+    length = len(curves["label"])
+    for group in CHANNEL_GROUPS:
+        curves.update(analyse_channel_group(group, chest, wrist, length))
+    return curves
+
+
+def pyramid_series(data, curves):
+    """{name: (samples, rate)} for the plotting pyramid (c2h5oh.pyramid): every
+    raw channel ("chest_ecg", "wrist_acc_x", ...) and every curve."""
+    series = {name: (curve, SUBJECT_CURVE_RATE) for name, curve in curves.items()}
+    for device, channels in data["signal"].items():
+        for channel, values in channels.items():
+            rate = CHEST_SAMPLING_RATE if device == "chest" else WRIST_SAMPLING_RATES.get(channel)
+            if rate is None:
+                continue
+            name, values = f"{device}_{channel.lower()}", np.asarray(values)
+            if values.ndim > 1 and values.shape[1] > 1:
+                series.update({f"{name}_{axis}": (column, rate) for axis, column in zip("xyz", values.T)})
+            else:
+                series[name] = (values, rate)
+    return series
+
+
+def subject_curves(data, subject_id):
+    """The subject's curves from the store, analysing and saving them on a miss.
+
+    A miss goes through the shared render cache (c2h5oh.cache) first: curves
+    another host analysed are reused, and only one host analyses at a time.
+    The subject's plotting pyramid and feature tables (c2h5oh.feature_index)
+    are stored alongside, also once.
+    """
+    if render_store.has_subject(subject_id, SUBJECT_ANALYSIS_VERSION):
+        curves = render_store.load_subject(subject_id, SUBJECT_ANALYSIS_VERSION)
+    else:
+        curves = get_render_cache().get_or_compute_arrays(
+            f"subject:{subject_id}:v{SUBJECT_ANALYSIS_VERSION}",
+            lambda: as_signals(analyse_subject(data)),
+        )
+        render_store.save_subject(subject_id, SUBJECT_ANALYSIS_VERSION, curves)
+    if not render_store.has_pyramid(subject_id, SUBJECT_ANALYSIS_VERSION):
+        render_store.save_subject_pyramid(subject_id, SUBJECT_ANALYSIS_VERSION, pyramid_series(data, curves))
+    if not render_store.has_subject_features(subject_id, SUBJECT_ANALYSIS_VERSION):
+        render_store.save_subject_features(subject_id, SUBJECT_ANALYSIS_VERSION, curves, SUBJECT_CURVE_RATE)
+    return curves
+
+
+# Groups with the curves normalise() is used on; the heart rates are read in
+# BPM, and they are also the slow part of the analysis
+LEVEL_GROUPS = ("emg", "chest_slow", "wrist_slow")
+
+
+def recording_stats(data, subject_id=None):
+    """Normalisation stats of a whole WESAD recording without its heart-rate
+    analysis (a fraction of a second per hour), for renders that do not wait
+    for analyse_subject (previews, the CLI scripts): the subject's stored
+    stats when there are any, else those of its level curves. Either way
+    they match what subject_stats holds for the same recording."""
+    if subject_id is not None and render_store.has_subject_stats(subject_id, SUBJECT_ANALYSIS_VERSION):
+        return stats_from_dict(render_store.load_subject_stats(subject_id, SUBJECT_ANALYSIS_VERSION))
+    chest = data["signal"]["chest"]
+    wrist = data["signal"].get("wrist", {})
+    length = curve_length(data["label"])
+    curves = {}
+    for group in LEVEL_GROUPS:
+        curves.update(analyse_channel_group(group, chest, wrist, length))
+    return curve_stats(curves)
+
+
+def subject_stats(subject_id, curves):
+    """The subject's per-channel normalisation stats, computed and stored on a miss."""
+    if render_store.has_subject_stats(subject_id, SUBJECT_ANALYSIS_VERSION):
+        return stats_from_dict(render_store.load_subject_stats(subject_id, SUBJECT_ANALYSIS_VERSION))
+    stats = curve_stats(curves)
+    render_store.save_subject_stats(subject_id, SUBJECT_ANALYSIS_VERSION, stats_to_dict(stats))
+    return stats
+
+
+# --- Slicing ---
+def find_segment(curves, label_id, duration_sec, middle=False):
+    """Start (curve samples) of a ``duration_sec`` slice inside a label, or None.
+
+    Starts at the label's first sample, or at its middle like the CLI scripts.
+    """
+    indices = np.flatnonzero(curves["label"] == label_id)
+    if len(indices) == 0:
+        return None
+    start = int(indices[len(indices) // 2] if middle else indices[0])
+    if start + duration_sec * SUBJECT_CURVE_RATE > len(curves["label"]):
+        return None
+    return start
+
+
+def slice_curves(curves, start, duration_sec):
+    end = start + int(round(duration_sec * SUBJECT_CURVE_RATE))
+    return {name: curve[start:end] for name, curve in curves.items()}
+
+
+# Feature builders: level-type channels are normalised with the subject's
+# stats (c2h5oh.normalisation), so a slice is scaled the same whichever slice
+# it is. Without ``stats`` they are computed from ``curves`` (the whole subject).
+# Features are views of the curves, normalised as the planner reads them
+# (c2h5oh.features).
+# Curves each song's features read: the pop song (c2h5oh.utils) and the
+# chest / wrist songs (c2h5oh.sensors)
+DEVICE_CURVES = {
+    "pop": ("hr", "emg_amplitude"),
+    "chest": ("hr", "emg_amplitude", "eda", "resp_rate", "resp_swell", "temp"),
+    "wrist": ("bvp_rate", "wrist_eda", "wrist_temp", "acc_magnitude"),
+}
+
+
+def missing_curves(curves, device):
+    """Curves the ``device`` song reads that the subject has not got."""
+    return [name for name in DEVICE_CURVES[device] if name not in curves]
+
+
+def pop_features(curves, start, duration_sec, stats=None):
+    """c2h5oh.utils plan_song features for one slice."""
+    stats = stats or curve_stats(curves)
+    segment = slice_curves(curves, start, duration_sec)
+    return {
+        "ecg_rate": segment["hr"],
+        "emg_norm": LazyFeature(segment["emg_amplitude"], stats["emg_amplitude"].normaliser()),
+    }
+
+
+def chest_features(curves, start, duration_sec, stats=None):
+    """c2h5oh.sensors plan_song features for one slice."""
+    stats = stats or curve_stats(curves)
+    segment = slice_curves(curves, start, duration_sec)
+    return {
+        "ecg_rate": segment["hr"],
+        "emg_norm": LazyFeature(segment["emg_amplitude"], stats["emg_amplitude"].normaliser()),
+        "eda_norm": LazyFeature(segment["eda"], stats["eda"].normaliser()),
+        "resp_rate": segment["resp_rate"],
+        "resp_swell": LazyFeature(segment["resp_swell"], stats["resp_swell"].normaliser()),
+        "temp": segment["temp"],
+    }
+
+
+def wrist_features(curves, start, duration_sec, stats=None):
+    """c2h5oh.sensors plan_wrist_song features for one slice."""
+    stats = stats or curve_stats(curves)
+    segment = slice_curves(curves, start, duration_sec)
+    return {
+        "bvp_rate": segment["bvp_rate"],
+        "eda_norm": LazyFeature(segment["wrist_eda"], stats["wrist_eda"].normaliser()),
+        "temp": segment["wrist_temp"],
+        "acc_norm": LazyFeature(segment["acc_magnitude"], stats["acc_magnitude"].normaliser()),
+    }
@@ -0,0 +1,247 @@
+import io
+import os
+import threading
+
+from celery import shared_task
+from celery.result import AsyncResult
+from celery.signals import worker_init
+from django.conf import settings
+from pydub import AudioSegment
+
+from . import ledger, render_store
+from .audio_arrays import array_to_segment, segment_to_array
+from .cache import get_render_cache
+from .models import AnalysisArtifact
+from .render_batch import RenderSpec, load_subject, render_and_store_spec
+from .stems import remix, stems_to_arrays
+from .subjects import SUBJECT_ANALYSIS_VERSION
+from .utils import (
+    FEATURE_RATE,
+    GENERATOR_VERSION,
+    SEGMENT_DURATION_SEC,
+    analyse_pickle_data,
+    first_full_segment,
+    get_sample_bank,
+    render_song,
+)
+
+
+@worker_init.connect
+def warm_sample_bank(**kwargs):
+    # Runs in the worker's master before the pool forks, so the bank is
+    # built once and every child inherits the same read-only mapping.
+    get_sample_bank()
+
+
+def render_and_store(key, file_obj, subject_id=None):
+    """Full-quality render of an upload. Caches the analysis (for /api/tune/),
+    the stems (for /api/remix/), the mixdown and its waveform under ``key``;
+    the whole-subject curves go to the subject store under ``subject_id``
+    (the upload hash)."""
+    if subject_id is None:
+        subject_id = render_store.hash_upload(file_obj)
+    features = analyse_pickle_data(file_obj, subject_id=subject_id)
+    if features is None:
+        raise ValueError("Could not analyse the uploaded file.")
+    render_store.save_analysis(key, features)
+    stems = render_song(features, FEATURE_RATE, SEGMENT_DURATION_SEC, stems=True)
+    stem_arrays, frame_rate = stems_to_arrays(stems)
+    render_store.save_stems(key, stem_arrays, frame_rate)
+    mix = remix(stem_arrays)
+    audio_segment = array_to_segment(mix, frame_rate)
+    render_store.save_result(key, audio_segment)
+    render_store.save_waveform(key, mix, frame_rate, settings.RENDER_SPECTROGRAM)
+    record_render(key, subject_id)
+    ledger.evict()
+    return audio_segment
+
+
+def record_render(key, subject_id):
+    """Ledger rows (c2h5oh.ledger) for everything a full render stored."""
+    version = SUBJECT_ANALYSIS_VERSION
+    label = ""
+    if render_store.has_subject(subject_id, version):
+        ledger.record_artifact(
+            AnalysisArtifact.SUBJECT_CURVES, subject_id,
+            render_store.subject_path(subject_id, version), subject_id, version,
+        )
+        segment = first_full_segment(render_store.load_subject(subject_id, version, names=["label"]))
+        label = segment[0] if segment else ""
+    if render_store.has_subject_stats(subject_id, version):
+        ledger.record_artifact(
+            AnalysisArtifact.SUBJECT_STATS, subject_id,
+            render_store.subject_stats_path(subject_id, version), subject_id, version,
+        )
+    if render_store.has_pyramid(subject_id, version):
+        ledger.record_artifact(
+            AnalysisArtifact.SIGNAL_PYRAMID, subject_id,
+            render_store.pyramid_dir(subject_id, version), subject_id, version,
+        )
+    if render_store.has_subject_features(subject_id, version):
+        ledger.record_artifact(
+            AnalysisArtifact.SUBJECT_FEATURES, subject_id,
+            render_store.features_path(subject_id, version), subject_id, version,
+        )
+    ledger.record_artifact(
+        AnalysisArtifact.ANALYSIS, key, render_store.analysis_path(key), subject_id, GENERATOR_VERSION
+    )
+    ledger.record_artifact(
+        AnalysisArtifact.STEMS, key, render_store.stems_dir(key), subject_id, GENERATOR_VERSION
+    )
+    ledger.record_artifact(
+        AnalysisArtifact.WAVEFORM, key, render_store.waveform_dir(key), subject_id, GENERATOR_VERSION
+    )
+    ledger.record_output(
+        key, render_store.result_path(key), subject_id=subject_id, label=label,
+        config_version=GENERATOR_VERSION,
+    )
+
+
+def result_cache_key(key):
+    return f"result:{key}"
+
+
+def fetch_shared_result(key):
+    """Copy a full render another host finished (shared render cache) into
+    the local store. Returns whether there was one."""
+    wav = get_render_cache().get(result_cache_key(key))
+    if wav is None:
+        return False
+    path = render_store.save_encoded_result(key, io.BytesIO(wav), "wav")
+    ledger.record_output(key, path)
+    return True
+
+
+def ensure_waveform(key):
+    """Waveform of a stored result that has none yet (copied from another
+    host, or rendered before waveforms were stored). Returns whether the
+    result exists."""
+    if render_store.has_waveform(key):
+        return True
+    if not render_store.has_result(key):
+        return False
+    audio_segment = AudioSegment.from_wav(render_store.result_path(key))
+    path = render_store.save_waveform(
+        key, segment_to_array(audio_segment), audio_segment.frame_rate, settings.RENDER_SPECTROGRAM
+    )
+    ledger.record_artifact(AnalysisArtifact.WAVEFORM, key, path, config_version=GENERATOR_VERSION)
+    return True
+
+
+def render_shared(key, file_obj, subject_id=None):
+    """render_and_store, run once across all hosts for concurrent identical
+    requests (c2h5oh.cache single flight); the WAV ends up in the local store
+    either way."""
+
+    def render():
+        render_and_store(key, file_obj, subject_id)
+        with open(render_store.result_path(key), "rb") as f:
+            return f.read()
+
+    wav = get_render_cache().get_or_compute(result_cache_key(key), render)
+    if not render_store.has_result(key):
+        path = render_store.save_encoded_result(key, io.BytesIO(wav), "wav")
+        ledger.record_output(key, path)
+
+
+@shared_task
+def render_full_quality(key):
+    """Full-quality render of a stored upload, saved under the preview's key."""
+    if render_store.has_result(key) or fetch_shared_result(key):
+        return key
+    with open(render_store.upload_path(key), "rb") as f:
+        render_shared(key, f)
+    return key
+
+
+@shared_task(bind=True)
+def render_full_session(self, key):
+    """Full-session render (c2h5oh.session) of a stored upload. Progress is
+    published as task state PROGRESS with {"done_sec", "total_sec", "section"}
+    (not when run in-process, without a result backend)."""
+    from .session import render_session
+    from .subjects import subject_curves, subject_stats
+    from .utils import load_pkl_data
+
+    path = render_store.session_path(key)
+    if os.path.exists(path):
+        return path
+    with open(render_store.upload_path(key), "rb") as f:
+        subject_id = render_store.hash_upload(f)
+        data = load_pkl_data(f)
+    if data is None:
+        raise ValueError("Could not load the stored upload.")
+    curves = subject_curves(data, subject_id)
+    del data  # only the curves are needed from here on
+
+    def progress(done_sec, total_sec, section):
+        if self.request.is_eager:
+            return
+        self.update_state(
+            state="PROGRESS",
+            meta={"done_sec": round(done_sec, 1), "total_sec": round(total_sec, 1), "section": section},
+        )
+
+    tmp_path = path + ".tmp"
+    render_session(curves, tmp_path, subject_stats(subject_id, curves), progress=progress)
+    os.replace(tmp_path, path)
+    return path
+
+
+@shared_task
+def render_batch_spec(subject_id, spec):
+    """Full render of one batch spec (c2h5oh.render_batch) from the stored subject."""
+    subject = load_subject(subject_id)
+    if subject is None:
+        raise ValueError(f"Subject '{subject_id}' is not in the subject store.")
+    curves, stats = subject
+    return render_and_store_spec(subject_id, curves, stats, RenderSpec(*spec))
+
+
+def _enqueue(task, args, task_id=None):
+    """Hand ``task`` to a Celery worker from a background thread, so the
+    request never waits on the broker; without a reachable broker the
+    thread runs the task itself."""
+    def publish():
+        try:
+            task.apply_async(args=args, task_id=task_id, retry=False)
+        except Exception as e:
+            print(f"Celery unavailable ({e}), running {task.name}{tuple(args)} in-process")
+            task.apply(args=args, task_id=task_id, throw=True)
+
+    threading.Thread(target=publish, daemon=True).start()
+
+
+def queue_batch_spec(subject_id, spec):
+    _enqueue(render_batch_spec, [subject_id, list(spec)])
+
+
+def queue_full_render(key):
+    # Prefer a Celery worker; without a reachable broker the upgrade still
+    # happens, in this process
+    _enqueue(render_full_quality, [key])
+
+
+def session_task_id(key):
+    """Task id of the full-session render of ``key``: one per upload, so its
+    progress can be polled by key alone."""
+    return f"session-{key}"
+
+
+def session_progress(key):
+    """(state, info) of the full-session task of ``key`` from the result
+    backend; (None, None) when the backend cannot be reached."""
+    result = AsyncResult(session_task_id(key))
+    try:
+        return result.state, result.info
+    except Exception as e:
+        print(f"Celery result backend unavailable ({e})")
+        return None, None
+
+
+def queue_full_session(key):
+    """Queue the full-session render of the stored upload ``key`` unless it
+    is already running. Returns its task id."""
+    if session_progress(key)[0] not in ("STARTED", "PROGRESS"):
+        _enqueue(render_full_session, [key], session_task_id(key))
+    return session_task_id(key)
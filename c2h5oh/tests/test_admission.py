@@ -0,0 +1,23 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from c2h5oh import engine
+from c2h5oh.admission import RenderExecutor, Saturated
+
+
+class RenderExecutorTests(SimpleTestCase):
+    def test_jobs_mix_on_the_executor_share_of_the_cores(self):
+        executor = RenderExecutor(workers=2, queue_depth=0, mixer_workers=1)
+        self.assertEqual(executor.submit(engine._workers, None).result(), 1)
+        self.assertEqual(executor.submit(engine._workers, 8).result(), 1)
+        self.assertEqual(engine._workers(None), engine.RENDER_WORKERS)
+
+    def test_saturated_beyond_capacity(self):
+        executor = RenderExecutor(workers=1, queue_depth=0)
+        blocker = threading.Event()
+        future = executor.submit(blocker.wait)
+        with self.assertRaises(Saturated):
+            executor.submit(lambda: None)
+        blocker.set()
+        future.result()
@@ -0,0 +1,92 @@
+import glob
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
+
+import neurokit2 as nk
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh import batch
+from c2h5oh.celery import app
+from c2h5oh.subjects import CHANNEL_GROUPS, CHEST_SAMPLING_RATE, WRIST_SAMPLING_RATES
+
+SECONDS = 75
+BASELINE_SEC = 15  # label 1 for this long: one full 60 s segment from its middle
+
+
+def _synthetic_subject(seed):
+    rng = np.random.default_rng(seed)
+    n = SECONDS * CHEST_SAMPLING_RATE
+    t = np.arange(n) / CHEST_SAMPLING_RATE
+    chest = {
+        "ECG": nk.ecg_simulate(duration=SECONDS, sampling_rate=CHEST_SAMPLING_RATE, random_state=seed)[:n],
+        "EMG": 0.1 * rng.standard_normal(n),
+        "EDA": 2 + 0.3 * np.sin(2 * np.pi * t / 40),
+        "Resp": np.sin(2 * np.pi * 0.25 * t),
+        "Temp": 33 + 0.1 * np.sin(2 * np.pi * t / 60),
+    }
+    wrist = {}
+    for channel, rate in WRIST_SAMPLING_RATES.items():
+        wt = np.arange(SECONDS * rate) / rate
+        wrist[channel] = (
+            rng.standard_normal((len(wt), 3)) if channel == "ACC" else np.sin(2 * np.pi * 1.2 * wt) + 2
+        )
+    label = np.zeros(n, dtype=int)
+    label[: BASELINE_SEC * CHEST_SAMPLING_RATE] = 1
+    return {
+        "signal": {
+            "chest": {name: values.reshape(-1, 1) for name, values in chest.items()},
+            "wrist": {name: values.reshape(len(values), -1) for name, values in wrist.items()},
+        },
+        "label": label,
+    }
+
+
+class LocalBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.dataset, self.out_dir = os.path.join(self.root, "WESAD"), os.path.join(self.root, "out")
+        for seed, subject in enumerate(("S2", "S3")):
+            os.makedirs(os.path.join(self.dataset, subject))
+            with open(os.path.join(self.dataset, subject, f"{subject}.pkl"), "wb") as f:
+                pickle.dump(_synthetic_subject(seed), f)
+        eager = {key: app.conf[key] for key in ("task_always_eager", "task_eager_propagates")}
+        self.addCleanup(app.conf.update, eager)
+
+    def test_local_run_writes_manifest_and_progress(self):
+        load_channels = batch._load_channels
+
+        def unreadable_s3_ecg(out_dir, subject, device, channels):
+            if subject == "S3" and "ECG" in channels:
+                raise RuntimeError("bad ECG")
+            return load_channels(out_dir, subject, device, channels)
+
+        with mock.patch.object(batch, "_load_channels", unreadable_s3_ecg), \
+                mock.patch.object(batch, "RETRY_BACKOFF_SEC", 0):
+            manifest_path = batch.run_batch(self.dataset, self.out_dir, local=True)
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest["subjects"], ["S2", "S3"])
+        self.assertEqual([entry["subject"] for entry in manifest["failed_subjects"]], ["S3"])
+        renders = {(r["subject"], r["label"], r["device"]): r for r in manifest["renders"]}
+        self.assertEqual(len(renders), 2 * len(batch.LABELS) * len(batch.BATCH_DEVICES))
+        for device in batch.BATCH_DEVICES:
+            self.assertEqual(renders[("S2", "baseline", device)]["status"], "ok")
+            self.assertTrue(os.path.exists(os.path.join(self.out_dir, renders[("S2", "baseline", device)]["path"])))
+            self.assertEqual(renders[("S2", "stress", device)]["status"], "skipped")
+            self.assertEqual(renders[("S3", "baseline", device)]["status"], "skipped")
+        self.assertEqual(manifest["counts"]["failed"], 0)
+
+        progress = batch.batch_progress(self.out_dir)
+        self.assertEqual(progress["done"], progress["total"])
+        self.assertEqual(progress["failed"], 1)  # S3's ECG part
+        markers = {os.path.basename(p)[:-len(".json")] for p in glob.glob(os.path.join(self.out_dir, "progress", "*.json"))}
+        self.assertTrue({"split-S2", "split-S3", "merge", "manifest", "stage-split"} <= markers)
+        self.assertTrue({f"analyse-S2-{group}" for group in CHANNEL_GROUPS} <= markers)
+        self.assertEqual(len(batch.load_feature_index(self.out_dir).subject_ids), 1)
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from c2h5oh.cache import DiskBackend, FakeRedis, MemoryBackend, RedisBackend, RenderCache
+
+
+class RenderCacheTests:
+    """Run against every backend; subclasses provide make_backend()."""
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        self.cache = RenderCache(self.backend, chunk_bytes=10)
+
+    def test_chunked_round_trip(self):
+        value = bytes(range(256)) * 3
+        self.cache.set("render", value)
+        self.assertEqual(self.cache._manifest("render")["chunks"], 77)
+        self.assertEqual(self.cache.get("render"), value)
+        self.cache.set("empty", b"")
+        self.assertEqual(self.cache.get("empty"), b"")
+
+    def test_ttl_expiry(self):
+        self.cache.set("render", b"x" * 25, ttl=1)
+        self.assertEqual(self.cache.get("render"), b"x" * 25)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get("render"))
+
+    def test_overwrite_removes_previous_chunks(self):
+        self.cache.set("render", b"a" * 25)
+        previous = self.cache._manifest("render")
+        self.cache.set("render", b"b" * 5)
+        for i in range(previous["chunks"]):
+            self.assertIsNone(self.backend.get(self.cache._key("render", previous["id"], str(i))))
+        self.assertEqual(self.cache.get("render"), b"b" * 5)
+        self.cache.delete("render")
+        self.assertIsNone(self.cache.get("render"))
+
+    def _compute_concurrently(self, caches):
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return b"rendered" * 10
+
+        threads = [
+            threading.Thread(target=lambda c=cache: results.append(c.get_or_compute("render", compute)))
+            for cache in caches
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return calls, results
+
+    def test_get_or_compute_computes_once_across_threads(self):
+        calls, results = self._compute_concurrently([self.cache] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"rendered" * 10] * 8)
+        self.assertEqual(self.cache._local_locks, {})
+
+    def test_get_or_compute_computes_once_across_hosts(self):
+        # Separate RenderCaches on one backend stand in for separate hosts
+        calls, results = self._compute_concurrently([RenderCache(self.backend, chunk_bytes=10) for _ in range(4)])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"rendered" * 10] * 4)
+
+
+class MemoryBackendTests(RenderCacheTests, SimpleTestCase):
+    def make_backend(self):
+        return MemoryBackend()
+
+
+class FakeRedisBackendTests(RenderCacheTests, SimpleTestCase):
+    def make_backend(self):
+        return RedisBackend(FakeRedis())
+
+
+class DiskBackendTests(RenderCacheTests, SimpleTestCase):
+    def make_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return DiskBackend(directory)
+
+    def test_truncated_lock_does_not_block_waiters(self):
+        # A writer that died before its header: the key is not held
+        with open(self.backend._path("c2h5oh:render:lock"), "wb") as f:
+            f.write(b"\x00\x01")
+        self.assertEqual(self.cache.get_or_compute("render", lambda: b"value"), b"value")
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase
+
+from c2h5oh.downloads import IMMUTABLE_CACHE_CONTROL, artifact_etag, file_response, parse_range
+
+CONTENT = bytes(range(256)) * 4
+ETAG = artifact_etag("ab" * 32, "wav")
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = {
+            None: None,
+            "bytes=0-99": (0, 99),
+            "bytes=100-": (100, 1023),
+            "bytes=-24": (1000, 1023),
+            "bytes=-5000": (0, 1023),
+            "bytes=1000-5000": (1000, 1023),
+            "bytes=1024-": "unsatisfiable",
+            "bytes=10-5": "unsatisfiable",
+            "bytes=-0": "unsatisfiable",
+            "bytes=0-1,5-9": None,
+            "items=0-9": None,
+            "bytes=-": None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, len(CONTENT)), expected)
+
+
+class FileResponseTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, "song.wav")
+        with open(self.path, "wb") as f:
+            f.write(CONTENT)
+        self.factory = RequestFactory()
+
+    def _get(self, filename=None, **headers):
+        response = file_response(self.factory.get("/", headers=headers), self.path, ETAG, "audio/wav", filename)
+        self.addCleanup(response.close)
+        return response
+
+    def _body(self, response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file_with_validators(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), CONTENT)
+        self.assertEqual(response["ETag"], ETAG)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_range_is_partial_content(self):
+        response = self._get(Range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), CONTENT[100:200])
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(CONTENT)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(response["ETag"], ETAG)
+
+    def test_suffix_range_of_an_attachment(self):
+        response = self._get(filename="song.wav", Range="bytes=-24")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), CONTENT[-24:])
+        self.assertIn("attachment", response["Content-Disposition"])
+
+    def test_unsatisfiable_range(self):
+        response = self._get(Range=f"bytes={len(CONTENT)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_matching_etag_is_not_modified(self):
+        for header in (ETAG, f"W/{ETAG}", f'"other", {ETAG}', "*"):
+            with self.subTest(if_none_match=header):
+                response = self._get(**{"If-None-Match": header, "Range": "bytes=0-9"})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], ETAG)
+                self.assertEqual(response.content, b"")
+
+    def test_other_etag_is_served(self):
+        response = self._get(**{"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range_with_current_etag_keeps_the_range(self):
+        response = self._get(**{"Range": "bytes=0-9", "If-Range": ETAG})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), CONTENT[:10])
+
+    def test_if_range_with_stale_etag_sends_the_whole_file(self):
+        for if_range in ('"other"', "Wed, 21 Oct 2015 07:28:00 GMT"):
+            with self.subTest(if_range=if_range):
+                response = self._get(**{"Range": "bytes=0-9", "If-Range": if_range})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self._body(response), CONTENT)
@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from c2h5oh.dtypes import run_parity_checks
+
+# Largest float32 error allowed, relative to the float64 output's range
+MAX_REL_ERROR = 1e-4
+
+
+class ParityTests(SimpleTestCase):
+    """float32 hot paths against float64 runs of the same code."""
+
+    def test_float32_matches_float64(self):
+        for check, report in run_parity_checks().items():
+            for name, errors in report.items():
+                with self.subTest(check=check, output=name):
+                    self.assertLess(errors["max_rel"], MAX_REL_ERROR)
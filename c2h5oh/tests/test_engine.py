@@ -0,0 +1,73 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh.engine import beat_event, mix_blocks_into, mix_events_into
+
+FRAME_RATE = 8000
+LENGTH = 4 * FRAME_RATE
+# FFT convolution differs from direct overlay only by rounding
+TOLERANCE = 1e-4
+
+
+def _ping(dur_ms=120, pitch=440.0, preview=False):
+    t = np.arange(int(dur_ms * FRAME_RATE / 1000)) / FRAME_RATE
+    return (np.sin(2 * np.pi * pitch * t) * np.exp(-t * 30)).astype(np.float32)
+
+
+INSTRUMENTS = {"ping": _ping, "pong": _ping}
+
+
+def _events(seed=0, count=60):
+    rng = np.random.default_rng(seed)
+    return [
+        beat_event(
+            rng.choice(["drums", "melody"]), float(rng.uniform(-100, 4100)), rng.choice(["ping", "pong"]),
+            120, gain_db=float(rng.uniform(-12, 0)), pitch=float(rng.choice([220.0, 440.0])),
+        )
+        for _ in range(count)
+    ]
+
+
+def _mix(events, offset=0, length=LENGTH, **kwargs):
+    buffers = {stem: np.zeros(length, dtype=np.float32) for stem in ("drums", "melody")}
+    mix_events_into(buffers, offset, events, INSTRUMENTS, FRAME_RATE, **kwargs)
+    return buffers
+
+
+class OnsetTrainTests(SimpleTestCase):
+    """Onset trains (one FFT convolution per sound) against per-event overlay."""
+
+    def test_onset_trains_match_overlay(self):
+        events = _events()
+        overlay = _mix(events)
+        trains = _mix(events, onset_instruments=("ping", "pong"))
+        for stem in overlay:
+            with self.subTest(stem=stem):
+                self.assertTrue(overlay[stem].any())
+                np.testing.assert_allclose(trains[stem], overlay[stem], atol=TOLERANCE)
+
+    def test_onset_trains_clip_at_the_window_edges(self):
+        events = _events(seed=1)
+        offset, length = FRAME_RATE + 17, FRAME_RATE // 2
+        overlay = _mix(events, offset, length)
+        trains = _mix(events, offset, length, onset_instruments=("ping",))
+        for stem in overlay:
+            with self.subTest(stem=stem):
+                np.testing.assert_allclose(trains[stem], overlay[stem], atol=TOLERANCE)
+
+
+class BlockMixTests(SimpleTestCase):
+    """Block-parallel mixing against one single-threaded pass."""
+
+    def test_blocks_match_single_threaded_mix(self):
+        events = _events(seed=2, count=200)
+        whole = _mix(events, onset_instruments=("ping",))
+        for workers, block_ms in ((1, 500), (4, 500), (4, 333)):
+            blocks = {stem: np.zeros(LENGTH, dtype=np.float32) for stem in whole}
+            mix_blocks_into(
+                blocks, events, INSTRUMENTS, FRAME_RATE, onset_instruments=("ping",),
+                workers=workers, block_ms=block_ms,
+            )
+            for stem in whole:
+                with self.subTest(workers=workers, block_ms=block_ms, stem=stem):
+                    np.testing.assert_allclose(blocks[stem], whole[stem], atol=TOLERANCE)
@@ -0,0 +1,44 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh.feature_index import FeatureIndex, subject_tables
+
+RATE = 50
+A, B = "a" * 64, "b" * 64
+
+
+def _curves(seed, temp=True):
+    rng = np.random.default_rng(seed)
+    n = RATE * 300
+    curves = {
+        "label": np.repeat([1, 2, 3], n // 3).astype(np.int16),
+        "hr": rng.normal(70, 5, n).astype(np.float32),
+        "eda": np.linspace(0, 1, n, dtype=np.float32),
+        "emg_amplitude": rng.random(n, dtype=np.float32),
+        "resp_rate": rng.random(n, dtype=np.float32),
+    }
+    if temp:
+        curves["temp"] = rng.random(n, dtype=np.float32)
+    return curves
+
+
+class FeatureIndexTests(SimpleTestCase):
+    def test_similar_excludes_the_overlapping_moments(self):
+        index = FeatureIndex.of_subjects({A: subject_tables(_curves(0), RATE), B: subject_tables(_curves(1), RATE)})
+        rows, distances = index.similar("window", A, 100, k=5)
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+        for moment in index.moments("window", rows, distances):
+            self.assertFalse(moment["subject"] == A and abs(moment["start_sec"] - 100) < 10)
+
+    def test_similar_without_a_signal_uses_the_others(self):
+        index = FeatureIndex.of_subjects({A: subject_tables(_curves(0, temp=False), RATE), B: subject_tables(_curves(1), RATE)})
+        rows, _ = index.similar("second", A, 100, k=3)
+        self.assertEqual(len(rows), 3)
+        rows, _ = index.similar("window", B, 100, k=3)
+        self.assertEqual({m["subject"] for m in index.moments("window", rows)}, {B})
+
+    def test_nearest_rejects_an_all_nan_vector(self):
+        index = FeatureIndex.of_subjects({A: subject_tables(_curves(0), RATE)})
+        with self.assertRaises(ValueError):
+            index.nearest("second", np.full(5, np.nan))
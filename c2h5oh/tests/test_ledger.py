@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from c2h5oh import ledger
+from c2h5oh.models import AnalysisArtifact, RenderedOutput, Upload
+
+SIZE = 100
+
+
+class EvictionTests(TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir, ignore_errors=True)
+        settings = override_settings(RENDER_STORE_DIR=self.store_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _file(self, name, size=SIZE):
+        path = os.path.join(self.store_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        return path
+
+    def _age(self, row, hours):
+        type(row).objects.filter(pk=row.pk).update(last_accessed=timezone.now() - timedelta(hours=hours))
+
+    def _stored(self):
+        return {model.__name__: sorted(model.objects.values_list("path", flat=True)) for model in ledger.STORED_MODELS}
+
+    def test_evicts_least_recently_used_down_to_the_budget(self):
+        rows = [
+            ledger.record_output("a" * 64, self._file("renders/a.wav")),
+            ledger.record_upload("b" * 64, "hash", self._file("uploads/b.pkl")),
+            ledger.record_artifact("stems", "c" * 64, self._file("stems/c/drums.npy")),
+            ledger.record_output("d" * 64, self._file("renders/d.wav")),
+        ]
+        for row, hours in zip(rows, (3, 4, 2, 1)):
+            self._age(row, hours)
+        self.assertEqual(ledger.stored_bytes(), 4 * SIZE)
+
+        freed = ledger.evict(budget_bytes=2 * SIZE)
+
+        self.assertEqual(freed, 2 * SIZE)
+        self.assertEqual(ledger.stored_bytes(), 2 * SIZE)
+        self.assertEqual(self._stored(), {
+            "RenderedOutput": [os.path.join("renders", "d.wav")],
+            "AnalysisArtifact": [os.path.join("stems", "c", "drums.npy")],
+            "Upload": [],
+        })
+        self.assertFalse(os.path.exists(os.path.join(self.store_dir, "renders/a.wav")))
+        self.assertFalse(os.path.exists(os.path.join(self.store_dir, "uploads/b.pkl")))
+        self.assertTrue(os.path.exists(os.path.join(self.store_dir, "renders/d.wav")))
+
+    def test_directories_are_removed_whole(self):
+        self._file("waveforms/w/peaks-256.dat")
+        self._file("waveforms/w/meta.json")
+        row = ledger.record_artifact("waveform", "w" * 64, os.path.join(self.store_dir, "waveforms/w"))
+        self.assertEqual(row.size_bytes, 2 * SIZE)
+        self._age(row, 1)
+
+        self.assertEqual(ledger.evict(budget_bytes=1), 2 * SIZE)
+        self.assertFalse(os.path.exists(os.path.join(self.store_dir, "waveforms/w")))
+        self.assertFalse(AnalysisArtifact.objects.exists())
+
+    def test_recently_used_entries_are_kept(self):
+        old = ledger.record_output("a" * 64, self._file("renders/a.wav"))
+        self._age(old, 1)
+        ledger.record_output("b" * 64, self._file("renders/b.wav"))
+
+        self.assertEqual(ledger.evict(budget_bytes=1), SIZE)
+        self.assertEqual(list(RenderedOutput.objects.values_list("key", flat=True)), ["b" * 64])
+
+    def test_under_budget_or_disabled_evicts_nothing(self):
+        row = ledger.record_upload("a" * 64, "hash", self._file("uploads/a.pkl"))
+        self._age(row, 1)
+        self.assertEqual(ledger.evict(budget_bytes=SIZE), 0)
+        self.assertEqual(ledger.evict(budget_bytes=0), 0)
+        self.assertTrue(Upload.objects.exists())
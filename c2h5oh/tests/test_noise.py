@@ -0,0 +1,37 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh.engine import beat_event
+from c2h5oh.oscillators import NOISE_TABLE_RATE, NOISE_TABLE_SECONDS, noise, noise_texture
+from c2h5oh.sensors import render_drone_texture
+
+FRAME_RATE = NOISE_TABLE_RATE
+TABLE_LENGTH = NOISE_TABLE_SECONDS * NOISE_TABLE_RATE
+
+
+def _correlation(a, b):
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+class NoiseTests(SimpleTestCase):
+    def test_sustained_noise_does_not_loop(self):
+        samples = noise_texture(2 * TABLE_LENGTH + 1000, seed=4)
+        self.assertLess(abs(_correlation(samples[:1000], samples[TABLE_LENGTH:TABLE_LENGTH + 1000])), 0.2)
+
+    def test_longer_render_extends_the_same_noise(self):
+        np.testing.assert_array_equal(noise_texture(TABLE_LENGTH + 500, seed=4)[:1000], noise_texture(1000, seed=4))
+
+    def test_long_noise_requests_leave_the_table(self):
+        samples = noise(TABLE_LENGTH + 1000, seed=-3)
+        self.assertLess(abs(_correlation(samples[:1000], samples[TABLE_LENGTH:])), 0.2)
+
+    def test_drone_hiss_does_not_repeat_with_the_table(self):
+        length = TABLE_LENGTH + FRAME_RATE
+        events = [
+            beat_event("harmony", ms, "drone", 1000, temp_val_0_to_1=0.5)
+            for ms in range(0, length * 1000 // FRAME_RATE, 1000)
+        ]
+        hiss = render_drone_texture(events, length, FRAME_RATE, preview=True)
+        window = slice(FRAME_RATE // 2, FRAME_RATE // 2 + 2000)
+        shifted = slice(window.start + TABLE_LENGTH, window.stop + TABLE_LENGTH)
+        self.assertLess(abs(_correlation(hiss[window], hiss[shifted])), 0.2)
@@ -0,0 +1,35 @@
+import io
+import pickle
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh import utils
+from c2h5oh.normalisation import curve_stats
+from c2h5oh.subjects import CHEST_SAMPLING_RATE, analyse_subject, recording_stats
+
+from .test_batch import SECONDS, _synthetic_subject
+
+
+class RecordingStatsTests(SimpleTestCase):
+    def setUp(self):
+        self.data = _synthetic_subject(0)
+
+    def test_match_the_stats_of_the_whole_subject_analysis(self):
+        subject = curve_stats(analyse_subject(self.data))
+        stats = recording_stats(self.data)
+        self.assertIn("emg_amplitude", stats)
+        for name, channel in stats.items():
+            with self.subTest(name=name):
+                self.assertEqual(channel.count, subject[name].count)
+                self.assertAlmostEqual(channel.quantile(0.5), subject[name].quantile(0.5), places=4)
+
+    def test_preview_segment_is_scaled_by_the_recording(self):
+        # The recording gets loud after the segment: with per-segment min/max
+        # the quiet segment would still span 0-1
+        emg = self.data["signal"]["chest"]["EMG"]
+        emg[(SECONDS - 15) * CHEST_SAMPLING_RATE:] *= 20
+        features = utils.analyse_pickle_data(io.BytesIO(pickle.dumps(self.data)), preview=True)
+        emg_norm = np.asarray(features["emg_norm"])
+        self.assertEqual(len(emg_norm), utils.SEGMENT_DURATION_SEC * utils.FEATURE_RATE)
+        self.assertLess(emg_norm.max(), 0.5)
@@ -0,0 +1,45 @@
+import io
+import pickle
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from c2h5oh import utils
+from c2h5oh.engine import beat_event, render_events
+
+from .test_batch import _synthetic_subject
+
+FRAME_RATE = 8000
+
+
+def _tone(dur_ms=100, preview=False):
+    return np.ones(int(dur_ms * FRAME_RATE / 1000), dtype=np.float32)
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_late_render_keeps_its_length_and_the_drums(self):
+        events = [
+            beat_event(stem, ms, "tone", 100) for ms in range(0, 10000, 500)
+            for stem in ("drums", "harmony", "melody")
+        ]
+        buffers = render_events(
+            events, {"tone": _tone}, 10000, FRAME_RATE, deadline=time.monotonic() - 1, workers=1,
+        )
+        self.assertEqual({len(samples) for samples in buffers.values()}, {10 * FRAME_RATE})
+        self.assertEqual(np.count_nonzero(buffers["drums"]), 20 * 800)
+        self.assertFalse(buffers["harmony"].any() or buffers["melody"].any())
+
+    def test_render_in_time_has_every_stem(self):
+        events = [beat_event(stem, 0, "tone", 100) for stem in ("drums", "melody")]
+        buffers = render_events(events, {"tone": _tone}, 1000, FRAME_RATE, deadline=time.monotonic() + 60)
+        self.assertTrue(buffers["drums"].any() and buffers["melody"].any())
+
+
+class PreviewTests(SimpleTestCase):
+    def test_preview_covers_the_whole_segment(self):
+        upload = io.BytesIO(pickle.dumps(_synthetic_subject(0)))
+        with mock.patch.object(utils, "PREVIEW_LATENCY_BUDGET_SEC", 0):
+            song = utils.process_pickle_data(upload, preview=True)
+        self.assertEqual(len(song), utils.SEGMENT_DURATION_SEC * 1000)
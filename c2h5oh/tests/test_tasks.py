@@ -0,0 +1,23 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from c2h5oh import tasks
+
+
+class QueueFullRenderTests(SimpleTestCase):
+    def test_returns_before_the_broker_answers_and_falls_back_in_process(self):
+        rendered = threading.Event()
+
+        def slow_unreachable_broker(*args, **kwargs):
+            time.sleep(0.5)
+            raise ConnectionError("broker down")
+
+        with mock.patch.object(tasks.render_full_quality, "apply_async", side_effect=slow_unreachable_broker), \
+                mock.patch.object(tasks.render_full_quality, "run", side_effect=lambda key: rendered.set()):
+            started = time.perf_counter()
+            tasks.queue_full_render("ab" * 32)
+            self.assertLess(time.perf_counter() - started, 0.1)
+            self.assertTrue(rendered.wait(5))
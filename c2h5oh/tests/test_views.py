@@ -0,0 +1,154 @@
+import io
+import json
+import pickle
+import shutil
+import tempfile
+import time
+import wave
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from c2h5oh import render_batch, render_store, tasks, views
+from c2h5oh.audio_arrays import array_to_segment
+from c2h5oh.render_batch import RenderSpec
+from c2h5oh.render_config import PopConfig, SensorConfig
+
+from .test_batch import _synthetic_subject
+
+KEY = "ab" * 32
+
+
+class StoredRenderTests(TestCase):
+    def setUp(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir, ignore_errors=True)
+        settings = override_settings(RENDER_STORE_DIR=store_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        tone = 0.2 * np.sin(2 * np.pi * 440 * np.arange(22050) / 44100)
+        render_store.save_result(KEY, array_to_segment(tone.astype(np.float32), 44100))
+
+    def test_audio_only_accept_is_negotiated_by_the_view(self):
+        response = self.client.get(f"/api/renders/{KEY}/", HTTP_ACCEPT="audio/flac")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/flac")
+
+    def test_unmatched_accept_falls_back_to_wav(self):
+        response = self.client.get(f"/api/renders/{KEY}/", HTTP_ACCEPT="audio/mpeg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/wav")
+
+
+class KeyValidationTests(TestCase):
+    """Keys from requests name paths in the store: anything but a SHA-256
+    hex digest is rejected before a lookup."""
+
+    BAD_KEYS = ("..", "../../settings", KEY.upper(), KEY[:-1], KEY + "0")
+
+    def test_body_keys(self):
+        for path in ("/api/remix/", "/api/tune/"):
+            for key in self.BAD_KEYS:
+                with self.subTest(path=path, key=key):
+                    response = self.client.post(path, {"key": key}, content_type="application/json")
+                    self.assertEqual(response.status_code, 400)
+
+    def test_url_keys(self):
+        for key in ("..", "...", KEY.upper(), KEY[:-1]):
+            for path in (
+                f"/api/renders/{key}/", f"/api/renders/{key}/waveform/",
+                f"/api/renders/{key}/spectrogram/", f"/api/subjects/{key}/signals/",
+                f"/api/sessions/{key}/",
+            ):
+                with self.subTest(path=path):
+                    self.assertEqual(self.client.get(path).status_code, 400)
+
+    def test_batch_subject(self):
+        response = self.client.post(
+            "/api/batch/", {"subject": "../x", "renders": [{"label": "stress"}]}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SessionRenderTests(TestCase):
+    def setUp(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir, ignore_errors=True)
+        settings = override_settings(RENDER_STORE_DIR=store_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_unknown_upload(self):
+        response = self.client.post("/api/sessions/", {"key": KEY}, content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(f"/api/sessions/{KEY}/").status_code, 404)
+
+    def test_queues_the_stored_upload_and_serves_the_session(self):
+        render_store.save_upload(KEY, io.BytesIO(pickle.dumps(_synthetic_subject(0))))
+        with mock.patch.object(tasks.render_full_session, "apply_async", side_effect=ConnectionError("broker down")), \
+                mock.patch.object(tasks, "session_progress", return_value=(None, None)):
+            response = self.client.post("/api/sessions/", {"key": KEY}, content_type="application/json")
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["task_id"], tasks.session_task_id(KEY))
+            link = response.json()["session"]
+            deadline = time.monotonic() + 120
+            while self.client.get(link).status_code == 202 and time.monotonic() < deadline:
+                time.sleep(0.2)
+        response = self.client.get(link)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/wav")
+        with wave.open(render_store.session_path(KEY)) as session:
+            self.assertAlmostEqual(session.getnframes() / session.getframerate(), 75, delta=1)
+
+    def test_pending_session_reports_progress(self):
+        render_store.save_upload(KEY, io.BytesIO(b"upload"))
+        progress = {"done_sec": 30.0, "total_sec": 75.0, "section": "baseline"}
+        with mock.patch("c2h5oh.views.session_progress", return_value=("PROGRESS", progress)):
+            response = self.client.get(f"/api/sessions/{KEY}/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["progress"], progress)
+
+
+class RenderKeyTests(SimpleTestCase):
+    """Stored renders are cached as immutable under their key, so the key
+    must change with anything that changes the audio."""
+
+    def test_upload_key_follows_the_analysis_version_and_config(self):
+        key = views.upload_key(KEY)
+        with mock.patch.object(views, "SUBJECT_ANALYSIS_VERSION", "other"):
+            self.assertNotEqual(views.upload_key(KEY), key)
+        with mock.patch.object(views, "DEFAULT_POP_CONFIG", PopConfig(melody_gate=0.3)):
+            self.assertNotEqual(views.upload_key(KEY), key)
+
+    def test_spec_key_follows_the_analysis_version_and_config(self):
+        spec = RenderSpec("stress", "chest", 60, "full")
+        key = render_batch.spec_key(KEY, spec)
+        with mock.patch.object(render_batch, "SUBJECT_ANALYSIS_VERSION", "other"):
+            self.assertNotEqual(render_batch.spec_key(KEY, spec), key)
+        with mock.patch.object(render_batch, "DEFAULT_SENSOR_CONFIG", SensorConfig(stress_eda=0.3)):
+            self.assertNotEqual(render_batch.spec_key(KEY, spec), key)
+
+
+class BatchRenderTests(TestCase):
+    def setUp(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir, ignore_errors=True)
+        settings = override_settings(RENDER_STORE_DIR=store_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_device_the_subject_has_no_curves_for_is_skipped(self):
+        data = _synthetic_subject(0)
+        del data["signal"]["wrist"]
+        upload = io.BytesIO(pickle.dumps(data))
+        upload.name = "chest_only.pkl"
+        renders = [
+            {"start": 0, "duration": 10, "device": device, "quality": "preview"} for device in ("chest", "wrist")
+        ]
+        response = self.client.post("/api/batch/", {"file": upload, "renders": json.dumps(renders)})
+        self.assertEqual(response.status_code, 200)
+        chest, wrist = response.json()["renders"]
+        self.assertEqual(chest["status"], "stored")
+        self.assertEqual(wrist["status"], "skipped")
+        self.assertIn("bvp_rate", wrist["error"])
@@ -0,0 +1,64 @@
+import numpy as np
+
+from .audio_arrays import apply_envelope
+
+
+# --- Continuous textures ---
+# Helpers for voices that are synthesised once over a whole segment instead
+# of once per beat: the planner's events become control points, and the
+# instrument parameters become sample-rate automation curves through them.
+CHORD_CROSSFADE_MS = 50
+
+
+def _positions(events, frame_rate):
+    return np.array([e.position_ms for e in events]) * frame_rate / 1000
+
+
+def automation_curve(events, param, length, frame_rate):
+    """Per-sample curve through each event's ``param`` at its onset.
+
+    Linear between control points and held flat before the first / after the
+    last one.
+    """
+    events = sorted(events)
+    values = [dict(e.params)[param] for e in events]
+    curve = np.interp(np.arange(length), _positions(events, frame_rate), values)
+    return curve.astype(np.float32)
+
+
+def _moving_average(samples, width):
+    if width <= 1:
+        return samples
+    padded = np.concatenate((np.zeros(width // 2), samples, np.zeros(width - width // 2)))
+    sums = np.cumsum(padded)
+    return ((sums[width:] - sums[:-width]) / width)[:len(samples)]
+
+
+def switch_weights(events, param, length, frame_rate, crossfade_ms=CHORD_CROSSFADE_MS):
+    """value -> per-sample weight (0..1) for a stepped ``param`` (e.g. the chord).
+
+    Each value is held from its event until the next one, and switches are
+    linear crossfades of ``crossfade_ms``, so the weights always sum to one.
+    """
+    events = sorted(events)
+    values = [dict(e.params)[param] for e in events]
+    starts = np.clip(np.round(_positions(events, frame_rate)).astype(np.int64), 0, length)
+    active = np.maximum(np.searchsorted(starts, np.arange(length), side="right") - 1, 0)
+    width = int(crossfade_ms * frame_rate / 1000)
+    weights = {}
+    for value in dict.fromkeys(values):
+        indicator = np.isin(active, [i for i, v in enumerate(values) if v == value])
+        weights[value] = _moving_average(indicator.astype(np.float64), width).astype(np.float32)
+    return weights
+
+
+def coverage_envelope(events, length, frame_rate, fade_ms):
+    """1 from the first event's onset to the last event's end, faded at both edges."""
+    start = int(round(min(e.position_ms for e in events) * frame_rate / 1000))
+    end = int(round(max(e.position_ms + e.duration_ms for e in events) * frame_rate / 1000))
+    start, end = min(max(start, 0), length), min(max(end, 0), length)
+    envelope = np.zeros(length, dtype=np.float32)
+    envelope[start:end] = apply_envelope(
+        np.ones(end - start, dtype=np.float32), frame_rate, fade_ms, fade_ms
+    )
+    return envelope
@@ -17,9 +17,33 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path
-from .views import C2H5OHAppView
+from .views import (
+    AsyncRenderView,
+    BatchRenderView,
+    C2H5OHAppView,
+    MomentsView,
+    RemixView,
+    RenderResultView,
+    RenderSpectrogramView,
+    RenderWaveformView,
+    SessionRenderView,
+    SessionResultView,
+    SignalPyramidView,
+    TuneView,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", C2H5OHAppView.as_view(), name="c2h5oh_app"),
+    path("api/async/", AsyncRenderView.as_view(), name="c2h5oh_app_async"),
+    path("api/batch/", BatchRenderView.as_view(), name="batch_render"),
+    path("api/renders/<str:key>/", RenderResultView.as_view(), name="render_result"),
+    path("api/renders/<str:key>/waveform/", RenderWaveformView.as_view(), name="render_waveform"),
+    path("api/renders/<str:key>/spectrogram/", RenderSpectrogramView.as_view(), name="render_spectrogram"),
+    path("api/sessions/", SessionRenderView.as_view(), name="session_render"),
+    path("api/sessions/<str:key>/", SessionResultView.as_view(), name="session_result"),
+    path("api/moments/", MomentsView.as_view(), name="moments"),
+    path("api/remix/", RemixView.as_view(), name="remix"),
+    path("api/tune/", TuneView.as_view(), name="tune"),
+    path("api/subjects/<str:subject_id>/signals/", SignalPyramidView.as_view(), name="subject_signals"),
 ]
@@ -1,20 +1,51 @@
 import pickle
 import os
+import time
+from functools import partial
 from time import sleep
 from celery import shared_task
 import numpy as np
 import neurokit2 as nk
-from pydub import AudioSegment
-from pydub.generators import Sine, Square, Sawtooth, WhiteNoise
 from scipy.signal import find_peaks
 import warnings
 
+from .audio_arrays import apply_envelope, array_to_segment, db_to_gain
+from .dtypes import as_signal
+from .engine import IncrementalRenderer, beat_event, render_events
+from .features import lazy
+from .filters import one_pole_highpass, one_pole_lowpass
+from .heart_rate import fast_heart_rate
+from .oscillators import noise, samples_for, sawtooth, sine, square
+from .render_config import DEFAULT_POP_CONFIG
+from .sample_bank import attach_sample_bank
+from .stems import mix_stems
+from . import render_store
+from .subjects import (
+    SUBJECT_ANALYSIS_VERSION,
+    SUBJECT_CURVE_RATE,
+    find_segment,
+    pop_features,
+    recording_stats,
+    subject_curves,
+    subject_stats,
+    to_curve_rate,
+)
+
 
 # --- Configuration ---
 INPUT_FILE = "WESAD/S2/S2.pkl"
 OUTPUT_PREFIX = "WESAD/S2"  # We'll add suffixes like _baseline.wav
 DATA_SAMPLING_RATE = 700
+# Analysed curves (features) are planned at the subject store's reduced rate
+FEATURE_RATE = SUBJECT_CURVE_RATE
 SEGMENT_DURATION_SEC = 60  # Duration for each emotional segment
+# Bump whenever the arrangement or instruments change: cached stems are keyed on it
+GENERATOR_VERSION = "pop-6"
+
+# Preview renders: mono at a low sample rate, no filters, fast HR engine
+FULL_SAMPLE_RATE = 44100
+PREVIEW_SAMPLE_RATE = 11025
+PREVIEW_LATENCY_BUDGET_SEC = 1.0
 
 # --- 1. Musical Constants ---
 # C Major Scale (easier for smooth motion than pentatonic)
@@ -29,67 +60,193 @@ CHORDS = {
     "Em": [164.81, 196.00, 246.94],
 }
 
+# Alternative scales selectable through PopConfig.scale
+SCALES = {
+    "major": SCALE,
+    "minor_harm": [261.63, 293.66, 311.13, 349.23, 392.00, 415.30, 493.88, 523.25],
+    "lydian": [261.63, 293.66, 329.63, 369.99, 392.00, 440.00, 493.88, 523.25],
+}
+
 # Progressions
 VERSE_PROG = ["C", "Am", "C", "Am"]  # Calm, repetitive
 CHORUS_PROG = ["F", "G", "Em", "Am"]  # Emotional, lifting
 
 
 # --- 2. Improved Instruments ---
-def get_kick(dur_ms=100):
-    return Sine(60).to_audio_segment(duration=dur_ms).fade_out(60).apply_gain(0)
+# Instruments return float32 arrays from the NumPy oscillators (c2h5oh.oscillators)
+# rather than pydub AudioSegments. preview=True renders at PREVIEW_SAMPLE_RATE
+# and skips the filters.
+def _sample_rate(preview):
+    return PREVIEW_SAMPLE_RATE if preview else FULL_SAMPLE_RATE
+
+
+# Fixed noise-table slices per drum, so every hit is identical (like a sample)
+SNARE_NOISE_SEED = 1
+HIHAT_NOISE_SEED = 2
+
 
+def get_kick(dur_ms=100, preview=False):
+    sample_rate = _sample_rate(preview)
+    kick = sine(60, samples_for(dur_ms, sample_rate), sample_rate)
+    return apply_envelope(kick, sample_rate, fade_out_ms=60)
 
-def get_snare(dur_ms=150):
+
+def get_snare(dur_ms=150, preview=False):
     # Layered snare for more body
-    low = Sine(180).to_audio_segment(duration=dur_ms).apply_gain(-8)
-    high = (
-        WhiteNoise()
-        .to_audio_segment(duration=dur_ms)
-        .high_pass_filter(2000)
-        .apply_gain(-12)
-    )
-    return low.overlay(high).fade_out(100)
+    sample_rate = _sample_rate(preview)
+    n = samples_for(dur_ms, sample_rate)
+    low = sine(180, n, sample_rate) * db_to_gain(-8)
+    high = noise(n, SNARE_NOISE_SEED)
+    if not preview:
+        high = one_pole_highpass(high, 2000, sample_rate)
+    return apply_envelope(low + high * db_to_gain(-12), sample_rate, fade_out_ms=100)
 
 
-def get_hihat(dur_ms=50):
-    return (
-        WhiteNoise()
-        .to_audio_segment(duration=dur_ms)
-        .high_pass_filter(8000)
-        .fade_out(40)
-        .apply_gain(-18)
-    )
+def get_hihat(dur_ms=50, preview=False):
+    sample_rate = _sample_rate(preview)
+    hihat = noise(samples_for(dur_ms, sample_rate), HIHAT_NOISE_SEED)
+    if not preview:
+        hihat = one_pole_highpass(hihat, 8000, sample_rate)
+    return apply_envelope(hihat, sample_rate, fade_out_ms=40, gain_db=-18)
 
 
-def get_piano_note(freq, dur_ms=400):
+# Envelopes (fade in ms, fade out ms, gain dB) applied on top of the sustained
+# voices; kept separate so the sample bank can store the voices un-enveloped.
+PIANO_ENVELOPE = (5, 300, -8)
+PAD_ENVELOPE = (500, 500, -22)
+
+
+def _piano_voice(freq, dur_ms, preview=False):
     # "Electric Piano" sound using mixed waves
-    sine = Sine(freq).to_audio_segment(duration=dur_ms)
-    saw = (
-        Sawtooth(freq)
-        .to_audio_segment(duration=dur_ms)
-        .low_pass_filter(1000)
-        .apply_gain(-15)
+    sample_rate = _sample_rate(preview)
+    n = samples_for(dur_ms, sample_rate)
+    voice = sine(freq, n, sample_rate)
+    if preview:
+        # Plain sine, the filtered saw overtone layer is skipped
+        return voice
+    saw = one_pole_lowpass(sawtooth(freq, n, sample_rate), 1000, sample_rate)
+    return voice + saw * db_to_gain(-15)
+
+
+def get_piano_note(freq, dur_ms=400, preview=False):
+    return apply_envelope(
+        _piano_voice(freq, dur_ms, preview), _sample_rate(preview), *PIANO_ENVELOPE
     )
-    note = sine.overlay(saw).fade_in(5).fade_out(300)
-    return note.apply_gain(-8)
 
 
-def get_pad_chord(chord_name, dur_ms=2000):
-    pad = AudioSegment.silent(duration=dur_ms)
+def _pad_voice(chord_name, dur_ms, preview=False):
+    sample_rate = _sample_rate(preview)
+    n = samples_for(dur_ms, sample_rate)
+    pad = np.zeros(n, dtype=np.float32)
     for freq in CHORDS[chord_name]:
-        osc = (
-            Square(freq / 2).to_audio_segment(duration=dur_ms).low_pass_filter(500)
-        )  # Lower octave for bass
-        pad = pad.overlay(osc)
-    return pad.fade_in(500).fade_out(500).apply_gain(-22)
+        if preview:
+            # Unfiltered sines stand in for the low-passed squares
+            pad += sine(freq / 2, n, sample_rate) * db_to_gain(-6)
+        else:
+            # Lower octave for bass
+            pad += one_pole_lowpass(square(freq / 2, n, sample_rate), 500, sample_rate)
+    return pad
+
+
+def get_pad_chord(chord_name, dur_ms=2000, preview=False):
+    return apply_envelope(
+        _pad_voice(chord_name, dur_ms, preview), _sample_rate(preview), *PAD_ENVELOPE
+    )
 
 
-# --- 3. Generation Logic (Unchanged) ---
+# --- 2b. Shared sample bank ---
+# Full-quality drums and sustained piano / pad voices, rendered once per box
+# and memory-mapped read-only by every worker (see c2h5oh.sample_bank).
+# Voices are long enough for the slowest tempo; notes are cut from their
+# start and enveloped, which matches the direct render because every layer
+# starts at phase zero and the low-pass filters are causal.
+BANK_PIANO_MS = 4000
+BANK_PAD_MS = 8000
+BANK_DRUMS = {"kick": 100, "snare": 150, "hihat": 50}
+_sample_bank = None
+
+
+def _bank_voices():
+    voices = {
+        name: partial(INSTRUMENTS[name], dur_ms) for name, dur_ms in BANK_DRUMS.items()
+    }
+    for freq in sorted({freq for scale in SCALES.values() for freq in scale}):
+        voices[f"piano:{freq:.2f}"] = partial(_piano_voice, freq, BANK_PIANO_MS)
+    for chord_name in CHORDS:
+        voices[f"pad:{chord_name}"] = partial(_pad_voice, chord_name, BANK_PAD_MS)
+    return voices
+
+
+def get_sample_bank():
+    """This process's mapping of the shared bank (built on first use), or
+    None."""
+    global _sample_bank
+    if _sample_bank is None:
+        try:
+            _sample_bank = attach_sample_bank(
+                _bank_voices(), FULL_SAMPLE_RATE, GENERATOR_VERSION
+            )
+        except OSError as e:
+            print(f"Sample bank unavailable, synthesising directly: {e}")
+            return None
+    return _sample_bank
 
 
-def generate_song_structure(ecg_rate, emg, rate, total_sec):
-    print("Arranging structured pop song...")
-    full_mix = AudioSegment.silent(duration=total_sec * 1000)
+def bank_samples(event, frame_rate, preview):
+    """engine sample_source: serve full-quality events from the shared bank."""
+    if preview or frame_rate != FULL_SAMPLE_RATE:
+        return None
+    bank = get_sample_bank()
+    if bank is None:
+        return None
+    params = dict(event.params)
+    if event.instrument in BANK_DRUMS:
+        if params["dur_ms"] != BANK_DRUMS[event.instrument]:
+            return None
+        return bank.get(event.instrument)  # zero-copy view
+
+    if event.instrument == "piano":
+        voice, envelope = bank.get(f"piano:{params['freq']:.2f}"), PIANO_ENVELOPE
+    elif event.instrument == "pad":
+        voice, envelope = bank.get(f"pad:{params['chord_name']}"), PAD_ENVELOPE
+    else:
+        return None
+    length = int(round(params["dur_ms"] * frame_rate / 1000))
+    if voice is None or length > len(voice):
+        return None
+    return apply_envelope(voice[:length], frame_rate, *envelope)
+
+
+# --- 3. Generation Logic ---
+# Split into a planning pass (beat grid -> BeatEvents, driven by PopConfig) and
+# a synthesis pass (c2h5oh.engine), so config tweaks can be re-rendered
+# incrementally without touching the analysis or unaffected stems.
+INSTRUMENTS = {
+    "kick": get_kick,
+    "snare": get_snare,
+    "hihat": get_hihat,
+    "piano": get_piano_note,
+    "pad": get_pad_chord,
+}
+KICK_MS, SNARE_MS, HIHAT_MS = 100, 150, 50
+# Rendered as onset trains (one FFT convolution per drum, see c2h5oh.engine)
+ONSET_INSTRUMENTS = ("kick", "snare", "hihat")
+
+
+def normalise_emg(emg, stats):
+    """The EMG envelope scaled to 0-1 with the subject's "emg_amplitude"
+    ``stats`` (c2h5oh.normalisation), lazily (c2h5oh.features)."""
+    return lazy(nk.emg_amplitude(emg), stats["emg_amplitude"].normaliser())
+
+
+def plan_song(features, rate, total_sec, config=DEFAULT_POP_CONFIG):
+    """Arrange the pop song as a list of BeatEvents.
+
+    ``features`` holds the analysed curves: "ecg_rate" (BPM) and "emg_norm".
+    """
+    ecg_rate, emg_norm = features["ecg_rate"], features["emg_norm"]
+    scale = SCALES[config.scale]
+    events = []
 
     # State trackers
     current_time_ms = 0
@@ -97,68 +254,68 @@ def generate_song_structure(ecg_rate, emg, rate, total_sec):
     chord_idx = 0
     last_melody_note_idx = 0  # Start at C4 (index 0)
 
-    # Pre-load sounds for speed
-    kick = get_kick()
-    snare = get_snare()
-    hihat = get_hihat()
-
-    # Prepare EMG for melody
-    emg_clean = nk.emg_amplitude(emg)
-    emg_norm = (emg_clean - np.min(emg_clean)) / (np.max(emg_clean) - np.min(emg_clean))
-
     while current_time_ms < (total_sec * 1000) - 2000:
         # --- A. Determine Tempo & Section ---
         sec_idx = min(int((current_time_ms / 1000) * rate), len(ecg_rate) - 1)
-        bpm = np.clip(ecg_rate[sec_idx], 65, 135)
+        bpm = np.clip(ecg_rate[sec_idx], config.bpm_min, config.bpm_max)
         ms_per_beat = 60000 / bpm
 
         # Simple logic: High HR (>90) = Chorus, Low HR = Verse
-        is_chorus = bpm > 90
+        is_chorus = bpm > config.chorus_bpm
         progression = CHORUS_PROG if is_chorus else VERSE_PROG
 
         # --- B. Rhythm Section ---
         # Always Hi-hats (8th notes for chorus, quarter for verse)
-        full_mix = full_mix.overlay(hihat, position=current_time_ms)
+        events.append(beat_event("drums", current_time_ms, "hihat", HIHAT_MS))
         if is_chorus:
-            full_mix = full_mix.overlay(
-                hihat.apply_gain(-5), position=current_time_ms + (ms_per_beat / 2)
+            events.append(
+                beat_event(
+                    "drums", current_time_ms + (ms_per_beat / 2), "hihat", HIHAT_MS, gain_db=-5
+                )
             )
 
         # Kick/Snare pattern
-        if beat_counter % 4 == 0:
-            full_mix = full_mix.overlay(kick, position=current_time_ms)  # Beat 1
-        if beat_counter % 4 == 2:
-            full_mix = full_mix.overlay(kick, position=current_time_ms)  # Beat 3
+        if beat_counter % 4 == 0 or beat_counter % 4 == 2:  # Beats 1 and 3
+            events.append(beat_event("drums", current_time_ms, "kick", KICK_MS))
         if beat_counter % 4 == 1 or beat_counter % 4 == 3:  # Beats 2 and 4
-            full_mix = full_mix.overlay(snare, position=current_time_ms)
+            events.append(beat_event("drums", current_time_ms, "snare", SNARE_MS))
 
         # --- C. Harmony (Chords) ---
         # Change chord every 4 beats (1 bar)
         if beat_counter % 4 == 0:
             chord_name = progression[chord_idx % 4]
-            pad = get_pad_chord(chord_name, dur_ms=ms_per_beat * 4)
             # Chorus pads are slightly louder
-            if is_chorus:
-                pad = pad.apply_gain(3)
-            full_mix = full_mix.overlay(pad, position=current_time_ms)
+            events.append(
+                beat_event(
+                    "harmony",
+                    current_time_ms,
+                    "pad",
+                    ms_per_beat * 4,
+                    gain_db=config.chorus_pad_gain_db if is_chorus else 0.0,
+                    chord_name=chord_name,
+                )
+            )
             chord_idx += 1
 
         # --- D. Smooth Melody (The "Human" Element) ---
         # Check EMG activity at this exact beat
         emg_val = emg_norm[int((current_time_ms / 1000) * rate)]
 
-        # Only play a note if muscle is active (threshold 0.2)
-        if emg_val > 0.2:
+        # Only play a note if muscle is active
+        if emg_val > config.melody_gate:
             # Decide direction based on EMG intensity
-            # High intensity (>0.6) = move pitch UP. Low intensity = move pitch DOWN.
-            step = 1 if emg_val > 0.5 else -1
+            # High intensity = move pitch UP. Low intensity = move pitch DOWN.
+            step = 1 if emg_val > config.melody_up_threshold else -1
 
             # Move melody index smoothly (no jumps larger than 1 step)
-            new_idx = np.clip(last_melody_note_idx + step, 0, len(SCALE) - 1)
+            new_idx = int(np.clip(last_melody_note_idx + step, 0, len(scale) - 1))
 
             # Play the note
-            note = get_piano_note(SCALE[new_idx], dur_ms=ms_per_beat)
-            full_mix = full_mix.overlay(note, position=current_time_ms)
+            events.append(
+                beat_event(
+                    "melody", current_time_ms, "piano", ms_per_beat, freq=scale[new_idx]
+                )
+            )
 
             last_melody_note_idx = new_idx  # Remember for next time
 
@@ -166,35 +323,120 @@ def generate_song_structure(ecg_rate, emg, rate, total_sec):
         current_time_ms += ms_per_beat
         beat_counter += 1
 
-    return full_mix
+    return events
+
+
+def render_song(features, rate, total_sec, preview=False, deadline=None, stems=False,
+                config=DEFAULT_POP_CONFIG):
+    events = plan_song(features, rate, total_sec, config)
+    frame_rate = _sample_rate(preview)
+    buffers = render_events(
+        events,
+        INSTRUMENTS,
+        total_sec * 1000,
+        frame_rate,
+        preview,
+        deadline=deadline,
+        sample_source=bank_samples,
+        onset_instruments=ONSET_INSTRUMENTS,
+    )
+    layers = {name: array_to_segment(samples, frame_rate) for name, samples in buffers.items()}
+    return layers if stems else mix_stems(layers)
+
+
+def generate_song_structure(
+    ecg_rate, emg, rate, total_sec, stats, preview=False, deadline=None, stems=False,
+    config=DEFAULT_POP_CONFIG,
+):
+    """Render the pop song. Past ``deadline`` (a time.monotonic() value) the
+    layers not yet rendered are left out; the song keeps its full length.
+
+    ``stats`` are the subject's normalisation stats (subjects.recording_stats).
+    With stems=True the separate drums / harmony / melody / textures buses are
+    returned as a dict instead of the mixdown.
+    """
+    print("Arranging structured pop song...")
+    features = {"ecg_rate": ecg_rate, "emg_norm": normalise_emg(emg, stats)}
+    return render_song(features, rate, total_sec, preview, deadline, stems, config)
+
+
+def incremental_renderer(features, preview=False):
+    """IncrementalRenderer for one analysed segment, for interactive tuning."""
+    return IncrementalRenderer(
+        lambda f, config: plan_song(f, FEATURE_RATE, SEGMENT_DURATION_SEC, config),
+        INSTRUMENTS,
+        features,
+        SEGMENT_DURATION_SEC * 1000,
+        _sample_rate(preview),
+        sample_source=bank_samples,
+        onset_instruments=ONSET_INSTRUMENTS,
+    )
 
 
 # --- 4. Main (MODIFIED) ---
 
 
-def process_pickle_data(data_dict):
+# WESAD Labels: 1=baseline, 2=stress, 3=amusement (fun), 4=meditation
+SEGMENTS_TO_GENERATE = {"baseline": 1, "stress": 2, "fun": 3, "meditation": 4}
+
+
+def first_full_segment(curves):
+    """(label name, start) of the first label in SEGMENTS_TO_GENERATE with a
+    full SEGMENT_DURATION_SEC slice in the subject ``curves``, or None."""
+    for label_name, label_id in SEGMENTS_TO_GENERATE.items():
+        start = find_segment(curves, label_id, SEGMENT_DURATION_SEC)
+        if start is not None:
+            return label_name, start
+    return None
+
+
+def analyse_pickle_data(data_dict, preview=False, subject_id=None):
+    """Load an uploaded WESAD pickle and analyse its first available segment.
+
+    Returns the features dict ("ecg_rate", "emg_norm" at FEATURE_RATE) or
+    None. With a ``subject_id`` (the upload hash) the features are sliced
+    from the whole-subject curves in the subject store, analysing the full
+    recording on a miss, and normalised with the subject's stats. Previews
+    never wait for that: unless the subject is already stored they analyse
+    the slice alone with the fast HR engine, normalised with
+    recording_stats().
+    """
     data = load_pkl_data(data_dict)
     if data is None:
         print(f"Error: Could not load data from {INPUT_FILE}")
         return
 
+    if subject_id is not None and (
+        not preview or render_store.has_subject(subject_id, SUBJECT_ANALYSIS_VERSION)
+    ):
+        try:
+            curves = subject_curves(data, subject_id)
+        except KeyError:
+            print("Error: Data file seems to be missing 'signal' or 'label' keys.")
+            return
+        segment = first_full_segment(curves)
+        if segment is None:
+            print("Warning: No label has a full segment of data.")
+            return
+        label_name, start = segment
+        print(f"Slicing {label_name.upper()} from the subject curves "
+              f"at {start / FEATURE_RATE:.0f}s")
+        return pop_features(curves, start, SEGMENT_DURATION_SEC, subject_stats(subject_id, curves))
+
     # Get full signals ONCE
     try:
-        ecg_full = data["signal"]["chest"]["ECG"].flatten()
-        emg_full = data["signal"]["chest"]["EMG"].flatten()
+        ecg_full = as_signal(data["signal"]["chest"]["ECG"])
+        emg_full = as_signal(data["signal"]["chest"]["EMG"])
         labels = data["label"].flatten()
+        stats = recording_stats(data, subject_id)
     except KeyError:
         print("Error: Data file seems to be missing 'signal' or 'label' keys.")
         return
 
-    # Define the segments we want to create
-    # WESAD Labels: 1=baseline, 2=stress, 3=amusement (fun), 4=meditation
-    segments_to_generate = {"baseline": 1, "stress": 2, "fun": 3, "meditation": 4}
-
     num_samples_needed = SEGMENT_DURATION_SEC * DATA_SAMPLING_RATE
 
     # Loop over each defined segment
-    for label_name, label_id in segments_to_generate.items():
+    for label_name, label_id in SEGMENTS_TO_GENERATE.items():
         print(
             f"\n--- Processing segment: {label_name.upper()} (Label ID: {label_id}) ---"
         )
@@ -223,22 +465,49 @@ def process_pickle_data(data_dict):
 
         # --- Processing (on the specific segment) ---
         print("Analyzing Heart Rate for tempo...")
-        ecg_clean = nk.ecg_clean(ecg_segment, sampling_rate=DATA_SAMPLING_RATE)
-        _, rpeaks = nk.ecg_peaks(ecg_clean, sampling_rate=DATA_SAMPLING_RATE)
-        ecg_rate = nk.signal_rate(
-            rpeaks, sampling_rate=DATA_SAMPLING_RATE, desired_length=len(ecg_segment)
-        )
+        if preview:
+            ecg_rate = fast_heart_rate(ecg_segment, DATA_SAMPLING_RATE)
+        else:
+            ecg_clean = nk.ecg_clean(ecg_segment, sampling_rate=DATA_SAMPLING_RATE)
+            _, rpeaks = nk.ecg_peaks(ecg_clean, sampling_rate=DATA_SAMPLING_RATE)
+            ecg_rate = nk.signal_rate(
+                rpeaks, sampling_rate=DATA_SAMPLING_RATE, desired_length=len(ecg_segment)
+            )
 
-        # --- Generation ---
-        final_song = generate_song_structure(
-            ecg_rate, emg_segment, DATA_SAMPLING_RATE, SEGMENT_DURATION_SEC
-        )
+        # Scaled like the subject's curves, at FEATURE_RATE
+        emg_envelope = to_curve_rate(nk.emg_amplitude(emg_segment), DATA_SAMPLING_RATE)
+        return {
+            "ecg_rate": to_curve_rate(ecg_rate, DATA_SAMPLING_RATE),
+            "emg_norm": lazy(emg_envelope, stats["emg_amplitude"].normaliser()),
+        }
+
+
+def process_pickle_data(data_dict, preview=False, stems=False, config=DEFAULT_POP_CONFIG,
+                        subject_id=None):
+    """Render the first available segment of an uploaded WESAD pickle.
+
+    preview=True trades quality for latency: low-rate mono synthesis,
+    simplified instruments, the fast HR engine and a
+    PREVIEW_LATENCY_BUDGET_SEC budget for the synthesis, after which the
+    remaining layers are left out (see c2h5oh.engine.render_events).
+    stems=True returns the per-layer AudioSegments instead of the mixdown.
+    """
+    features = analyse_pickle_data(data_dict, preview, subject_id)
+    if features is None:
+        return
+    deadline = time.monotonic() + PREVIEW_LATENCY_BUDGET_SEC if preview else None
 
-        # --- Exporting ---
-        # output_filename = f"{OUTPUT_PREFIX}_{label_name}.wav"
-        # final_song.export(output_filename, format="wav")
-        # print(f"✅ Pop song for '{label_name}' saved to {output_filename}")
-        return final_song
+    # --- Generation ---
+    print("Arranging structured pop song...")
+    return render_song(
+        features,
+        FEATURE_RATE,
+        SEGMENT_DURATION_SEC,
+        preview=preview,
+        deadline=deadline,
+        stems=stems,
+        config=config,
+    )
 
 
 def load_pkl_data(uploaded_file):
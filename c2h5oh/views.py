@@ -1,50 +1,728 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
 from celery.result import AsyncResult
-from .utils import process_pickle_data
+from .utils import GENERATOR_VERSION, SEGMENTS_TO_GENERATE, incremental_renderer, load_pkl_data, process_pickle_data
+from . import ledger, render_store
+from .admission import Saturated, get_render_executor
+from .audio_formats import FORMATS, encode_audio, negotiate_format
+from .audio_arrays import array_to_segment
+from .feature_index import BIO_STATES, FEATURES
+from .downloads import artifact_etag, conditional_response, file_response, with_validators
+from .pyramid import window_to_json
+from .waveform import PEAKS_SAMPLES_PER_PIXEL, dat_to_peaks, peaks_to_json
+from .models import AnalysisArtifact, RenderedOutput
+from .stems import remix, validate_mix_params
+from .subjects import SUBJECT_ANALYSIS_VERSION, subject_curves, subject_stats
+from .render_batch import load_subject, parse_specs, run_batch
+from .tasks import (
+    ensure_waveform,
+    fetch_shared_result,
+    queue_batch_spec,
+    queue_full_render,
+    queue_full_session,
+    render_shared,
+    session_progress,
+    session_task_id,
+)
+from .render_config import DEFAULT_POP_CONFIG
 from openai import OpenAI
 from django.conf import settings
-from io import BytesIO
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from pydub import AudioSegment
 import json
+import threading
+from collections import OrderedDict
 
 
-class C2H5OHAppView(APIView):
+TRUTHY = {"1", "true", "yes", "on"}
+
+# Live IncrementalRenderers for /api/tune/, most recently used last
+MAX_TUNE_SESSIONS = 8
+TUNE_SESSIONS = OrderedDict()
+TUNE_SESSIONS_LOCK = threading.Lock()
+
+DEFAULT_PLOT_WIDTH = 1000  # pixels
+MAX_PLOT_WIDTH = 8192
+
+DEFAULT_MOMENTS = 100
+MAX_MOMENTS = 1000
+
+
+def upload_key(upload_hash):
+    """Render key of an upload (its preview, full render and session): the
+    upload plus everything else that shapes the audio, so a stored render
+    never changes under its key."""
+    return render_store.render_key(
+        upload_hash, generator=GENERATOR_VERSION, analysis=SUBJECT_ANALYSIS_VERSION,
+        config=DEFAULT_POP_CONFIG.to_dict(),
+    )
+
+
+def render_upload(file_obj, preview):
+    """Render an uploaded pickle, or find it in the render store.
+
+    Returns (key, subject_id, quality, audio_segment); audio_segment is None
+    when a full render is already stored under ``key``. subject_id (the
+    upload hash) addresses the subject's signals (/api/subjects/<id>/signals/).
+    """
+    # Preview and full renders share one key, so a finished full render is
+    # returned directly even when a preview was asked for.
+    upload_hash = render_store.hash_upload(file_obj)
+    key = upload_key(upload_hash)
+    if render_store.has_result(key) or fetch_shared_result(key):
+        return key, upload_hash, "full", None
+    if preview:
+        audio_segment = process_pickle_data(
+            file_obj, preview=True, subject_id=upload_hash
+        )  # Returns AudioSegment
+        path = render_store.save_upload(key, file_obj)
+        ledger.record_upload(key, upload_hash, path, upload_hash)
+        queue_full_render(key)
+        return key, upload_hash, "preview", audio_segment
+    # Full renders keep analysis and stems for /api/tune/ and /api/remix/
+    render_shared(key, file_obj, upload_hash)
+    return key, upload_hash, "full", None
 
-    http_method_names = ["post", "options"]
+
+class AudioContentNegotiation(DefaultContentNegotiation):
+    """Accept is negotiated by the views (negotiate_format): DRF's renderers
+    only format JSON bodies (errors, 202s), so an audio-only Accept such as
+    audio/flac falls back to the first renderer instead of a 406."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+class AudioResponseMixin:
+    """Upload validation and audio / CORS responses shared by the API views."""
+
+    content_negotiation_class = AudioContentNegotiation
 
     def _add_cors_headers(self, response):
         response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response["Access-Control-Allow-Methods"] = "GET, HEAD, POST, OPTIONS"
+        response["Access-Control-Allow-Headers"] = (
+            "Content-Type, Authorization, Accept, Range, If-None-Match, If-Range"
+        )
+        response["Access-Control-Expose-Headers"] = (
+            "X-Render-Key, X-Render-Quality, X-Subject-Id, Retry-After, "
+            "ETag, Accept-Ranges, Content-Range, Content-Length"
+        )
         return response
 
+    def _invalid_key_response(self, key, name="key"):
+        """A 400 unless ``key`` is a store key (render_store.is_key), else None."""
+        if render_store.is_key(key):
+            return None
+        return self._add_cors_headers(Response(
+            {"error": f"'{name}' must be 64 lowercase hexadecimal characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        ))
+
+    def _pending_response(self, key):
+        # The full render under ``key`` is not stored yet
+        response = Response({"status": "pending", "key": key}, status=status.HTTP_202_ACCEPTED)
+        response["Retry-After"] = "2"
+        return self._add_cors_headers(response)
+
     def _validate_file(self, file_obj):
         if not file_obj:
             raise ValueError("No file provided.")
         if not file_obj.name.endswith(".pkl"):
             raise ValueError("Invalid file type. Only .pkl files are allowed.")
 
+    def _audio_response(self, audio_file, key, quality, fmt):
+        spec = FORMATS[fmt]
+        response = FileResponse(
+            audio_file,
+            as_attachment=True,
+            filename=f"processed_audio.{spec['ext']}",
+            content_type=spec["content_type"],
+        )
+        response["X-Render-Key"] = key
+        response["X-Render-Quality"] = quality
+        response["Vary"] = "Accept"
+        return self._add_cors_headers(response)
+
+    def _stored_response(self, key, fmt, request=None):
+        """A stored full render, read from disk. With a (GET) ``request`` it
+        is a cacheable download: strong ETag, If-None-Match and Range."""
+        # Encoded copies are cached next to the WAV master on first request
+        spec = FORMATS[fmt]
+        ext = spec["ext"]
+        if not render_store.has_result(key, ext):
+            audio_segment = AudioSegment.from_wav(render_store.result_path(key))
+            path = render_store.save_encoded_result(key, encode_audio(audio_segment, fmt), ext)
+            ledger.record_encoded_output(key, path, ext)
+        ledger.touch(RenderedOutput, key=key)
+        path = render_store.result_path(key, ext)
+        if request is None:
+            response = self._audio_response(open(path, "rb"), key, "full", fmt)
+            return with_validators(response, artifact_etag(key, ext))
+        response = file_response(
+            request, path, artifact_etag(key, ext), spec["content_type"],
+            filename=f"processed_audio.{ext}",
+        )
+        response["X-Render-Key"] = key
+        response["X-Render-Quality"] = "full"
+        response["Vary"] = "Accept"
+        return self._add_cors_headers(response)
+
+    def _render_response(self, file_obj, preview, fmt):
+        key, subject_id, quality, audio_segment = render_upload(file_obj, preview)
+        if audio_segment is None:
+            response = self._stored_response(key, fmt)
+        else:
+            response = self._audio_response(encode_audio(audio_segment, fmt), key, quality, fmt)
+        response["X-Subject-Id"] = subject_id
+        return response
+
+
+class C2H5OHAppView(AudioResponseMixin, APIView):
+
+    http_method_names = ["post", "options"]
+
+    def _is_preview(self, request):
+        value = request.query_params.get("preview", request.data.get("preview", ""))
+        return str(value).lower() in TRUTHY
+
+    def _output_format(self, request):
+        # ?format=flac wins over the Accept header
+        return negotiate_format(
+            request.headers.get("Accept", ""), request.query_params.get("format")
+        )
+
     def post(self, request):
         file_obj = request.FILES.get("file")
         try:
             self._validate_file(file_obj)
-            audio_segment = process_pickle_data(file_obj)  # Returns AudioSegment
-            wav_buffer = BytesIO()
-            audio_segment.export(wav_buffer, format="wav")
-            wav_buffer.seek(0)
-            response = FileResponse(
-                wav_buffer,
-                as_attachment=True,
-                filename="processed_audio.wav",
-                content_type="audio/wav",
+            fmt = self._output_format(request)
+            return self._render_response(file_obj, self._is_preview(request), fmt)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": "An unexpected error occurred: " + str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-            return self._add_cors_headers(response)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRenderView(AudioResponseMixin, View):
+    """Async variant of C2H5OHAppView for ASGI deployments.
+
+    The render runs on the bounded render executor (c2h5oh.admission) instead
+    of holding a server worker; when all of its slots are taken the request
+    gets a 429 with Retry-After right away. A client that disconnects while
+    its render is still queued frees the slot without the render running.
+    """
+
+    http_method_names = ["post", "options"]
+
+    def _is_preview(self, request):
+        value = request.GET.get("preview", request.POST.get("preview", ""))
+        return str(value).lower() in TRUTHY
+
+    def _output_format(self, request):
+        return negotiate_format(request.headers.get("Accept", ""), request.GET.get("format"))
+
+    def _error(self, message, status_code):
+        return self._add_cors_headers(JsonResponse({"error": message}, status=status_code))
+
+    async def options(self, request, *args, **kwargs):
+        return self._add_cors_headers(HttpResponse())
+
+    async def post(self, request):
+        file_obj = request.FILES.get("file")
+        try:
+            self._validate_file(file_obj)
+            fmt = self._output_format(request)
+            preview = self._is_preview(request)
+        except ValueError as e:
+            return self._error(str(e), status.HTTP_400_BAD_REQUEST)
+
+        executor = get_render_executor()
+        try:
+            return await executor.run(self._render_response, file_obj, preview, fmt)
+        except Saturated as e:
+            response = self._error(str(e), status.HTTP_429_TOO_MANY_REQUESTS)
+            response["Retry-After"] = str(e.retry_after)
+            return response
+        except ValueError as e:
+            return self._error(str(e), status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return self._error(
+                "An unexpected error occurred: " + str(e),
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class RenderResultView(C2H5OHAppView):
+    """Poll for the full-quality upgrade of a preview render."""
+
+    http_method_names = ["get", "head", "options"]
+
+    def get(self, request, key):
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        try:
+            fmt = self._output_format(request)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not render_store.has_result(key):
+            return self._pending_response(key)
+        return self._stored_response(key, fmt, request)
+
+
+class RenderWaveformView(C2H5OHAppView):
+    """Waveform peaks of a full render, for drawing it before the audio loads.
+
+    ?samples_per_pixel= picks a stored zoom level (PEAKS_SAMPLES_PER_PIXEL);
+    ?width= instead picks the coarsest level with at least that many pixels.
+    The audiowaveform JSON format is the default; ?format=dat or an Accept of
+    application/octet-stream returns the binary .dat file.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    def _samples_per_pixel(self, request, meta):
+        levels = meta["samples_per_pixel"]
+        requested = request.query_params.get("samples_per_pixel")
+        width = request.query_params.get("width")
+        try:
+            if requested:
+                if int(requested) not in levels:
+                    raise ValueError
+                return int(requested)
+            if width:
+                pixels = int(width)
+                frames = meta["duration_sec"] * meta["frame_rate"]
+                fitting = [level for level in levels if frames / level >= pixels]
+                return max(fitting) if fitting else min(levels)
+        except ValueError:
+            raise ValueError(f"samples_per_pixel must be one of {levels}; width a number of pixels.")
+        return PEAKS_SAMPLES_PER_PIXEL[1]
+
+    def _binary(self, request):
+        fmt = request.query_params.get("format")
+        if fmt:
+            if fmt not in ("json", "dat"):
+                raise ValueError("format must be 'json' or 'dat'.")
+            return fmt == "dat"
+        return "application/octet-stream" in request.headers.get("Accept", "")
+
+    def get(self, request, key):
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        if not ensure_waveform(key):
+            return self._pending_response(key)
+        meta = render_store.load_waveform_meta(key)
+        try:
+            samples_per_pixel = self._samples_per_pixel(request, meta)
+            binary = self._binary(request)
+        except ValueError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST))
+        ledger.touch(AnalysisArtifact, key=key, kind=AnalysisArtifact.WAVEFORM)
+        path = render_store.peaks_path(key, samples_per_pixel)
+        etag = artifact_etag(key, "peaks", samples_per_pixel, "dat" if binary else "json")
+        if binary:
+            response = file_response(request, path, etag, "application/octet-stream")
+        else:
+            response = conditional_response(request, etag)
+            if response is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+                pairs = dat_to_peaks(data)
+                response = with_validators(
+                    JsonResponse(peaks_to_json(pairs, meta["frame_rate"], samples_per_pixel)), etag
+                )
+        response["X-Render-Key"] = key
+        response["Vary"] = "Accept"
+        return self._add_cors_headers(response)
+
+
+class RenderSpectrogramView(C2H5OHAppView):
+    """Spectrogram thumbnail (greyscale PNG, time left to right, low
+    frequencies at the bottom) of a full render."""
+
+    http_method_names = ["get", "head", "options"]
+
+    def get(self, request, key):
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        if not ensure_waveform(key):
+            return self._pending_response(key)
+        if not render_store.load_waveform_meta(key)["spectrogram"]:
+            return self._add_cors_headers(Response(
+                {"error": f"No spectrogram stored for render '{key}'."}, status=status.HTTP_404_NOT_FOUND
+            ))
+        ledger.touch(AnalysisArtifact, key=key, kind=AnalysisArtifact.WAVEFORM)
+        response = file_response(
+            request, render_store.spectrogram_path(key), artifact_etag(key, "spectrogram", "png"), "image/png"
+        )
+        response["X-Render-Key"] = key
+        return self._add_cors_headers(response)
+
+
+class SessionRenderView(C2H5OHAppView):
+    """Queue the full-session render (c2h5oh.session) of an upload: the whole
+    recording as one piece instead of one segment.
+
+    Body: a .pkl "file", or the "key" of an upload already stored (the
+    X-Render-Key of a preview). Answers 202 with the task id and the link
+    that serves the session once rendered, and its progress until then.
+    """
+
+    http_method_names = ["post", "options"]
+
+    def _upload_key(self, request):
+        file_obj = request.FILES.get("file")
+        if file_obj is None:
+            key = request.data.get("key", "")
+            if not key:
+                raise ValueError("Provide a .pkl 'file' or the 'key' of a stored upload.")
+            if not render_store.is_key(key):
+                raise ValueError("'key' must be 64 lowercase hexadecimal characters.")
+            if not render_store.has_upload(key):
+                raise LookupError(f"No stored upload '{key}'.")
+            return key
+        self._validate_file(file_obj)
+        upload_hash = render_store.hash_upload(file_obj)
+        key = upload_key(upload_hash)
+        if not render_store.has_upload(key):
+            path = render_store.save_upload(key, file_obj)
+            ledger.record_upload(key, upload_hash, path, upload_hash)
+        return key
+
+    def post(self, request):
+        try:
+            key = self._upload_key(request)
+        except LookupError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND))
+        except ValueError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST))
+        body = {"key": key, "session": f"/api/sessions/{key}/"}
+        if render_store.has_session(key):
+            return self._add_cors_headers(Response({"status": "stored", **body}))
+        body = {"status": "queued", "task_id": queue_full_session(key), **body}
+        response = Response(body, status=status.HTTP_202_ACCEPTED)
+        response["X-Render-Key"] = key
+        return self._add_cors_headers(response)
+
+
+class SessionResultView(C2H5OHAppView):
+    """The full-session WAV of an upload once rendered; until then a 202 with
+    the task's state and, while rendering, its progress ({"done_sec",
+    "total_sec", "section"})."""
+
+    http_method_names = ["get", "head", "options"]
+
+    def get(self, request, key):
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        if render_store.has_session(key):
+            response = file_response(
+                request, render_store.session_path(key), artifact_etag(key, "session", "wav"),
+                FORMATS["wav"]["content_type"], filename="session.wav",
+            )
+            response["X-Render-Key"] = key
+            return self._add_cors_headers(response)
+        if not render_store.has_upload(key):
+            return self._add_cors_headers(Response(
+                {"error": f"No stored upload '{key}'."}, status=status.HTTP_404_NOT_FOUND
+            ))
+        state, info = session_progress(key)
+        if state == "FAILURE":
+            return self._add_cors_headers(Response(
+                {"status": "failed", "key": key, "error": str(info)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            ))
+        response = self._pending_response(key)
+        response.data["task_id"] = session_task_id(key)
+        if state is not None:
+            response.data["state"] = state
+        if state == "PROGRESS" and isinstance(info, dict):
+            response.data["progress"] = info
+        return response
+
+
+class BatchRenderView(C2H5OHAppView):
+    """Several renders of one subject in one request (c2h5oh.render_batch).
+
+    Body: a .pkl "file" or the "subject" id of an analysed one (the
+    X-Subject-Id of an earlier render), plus "renders": [{"label": "stress",
+    "device": "chest", "duration": 60, "quality": "preview"}, ...] (a JSON
+    string in multipart bodies). The subject is analysed once; the answer is
+    a manifest with a link per render. Queued full renders answer 202 at
+    their link until they are stored.
+    """
+
+    def _specs(self, request):
+        raw_specs = request.data.get("renders")
+        if isinstance(raw_specs, str):
+            try:
+                raw_specs = json.loads(raw_specs)
+            except json.JSONDecodeError:
+                raise ValueError("'renders' must be a JSON list.")
+        return parse_specs(raw_specs)
+
+    def _analysed_subject(self, request):
+        """(subject_id, curves, stats); analyses an uploaded file once."""
+        file_obj = request.FILES.get("file")
+        if file_obj is None:
+            subject_id = request.data.get("subject", "")
+            if not subject_id:
+                raise ValueError("Provide a .pkl 'file' or a 'subject' id.")
+            if not render_store.is_key(subject_id):
+                raise ValueError("'subject' must be 64 lowercase hexadecimal characters.")
+            subject = load_subject(subject_id)
+            if subject is None:
+                raise LookupError(f"No analysed subject '{subject_id}'.")
+            return (subject_id, *subject)
+        self._validate_file(file_obj)
+        subject_id = render_store.hash_upload(file_obj)
+        subject = load_subject(subject_id)
+        if subject is not None:
+            return (subject_id, *subject)
+        data = load_pkl_data(file_obj)
+        if data is None:
+            raise ValueError("Could not load the uploaded file.")
+        try:
+            curves = subject_curves(data, subject_id)
+        except KeyError:
+            raise ValueError("Data file seems to be missing 'signal' or 'label' keys.")
+        return subject_id, curves, subject_stats(subject_id, curves)
+
+    def post(self, request):
+        try:
+            specs = self._specs(request)
+            subject_id, curves, stats = self._analysed_subject(request)
+        except LookupError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND))
+        except ValueError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST))
+        try:
+            manifest = run_batch(subject_id, curves, stats, specs, queue_batch_spec)
         except Exception as e:
             return Response(
                 {"error": "An unexpected error occurred: " + str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        response = Response(manifest)
+        response["X-Subject-Id"] = subject_id
+        return self._add_cors_headers(response)
+
+
+class RemixView(C2H5OHAppView):
+    """Re-balance the cached stems of a full render.
+
+    Body: {"key": "...", "gains": {"drums": -3.0}, "mute": ["melody"]}
+    """
+
+    def post(self, request):
+        key = request.data.get("key", "")
+        gains_db = request.data.get("gains") or {}
+        muted = request.data.get("mute") or []
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        try:
+            fmt = self._output_format(request)
+            validate_mix_params(gains_db, muted)
+            if not render_store.has_stems(key):
+                return Response(
+                    {"error": f"No cached stems for render '{key}'."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            stem_arrays, frame_rate = render_store.load_stems(key)
+            ledger.touch(AnalysisArtifact, key=key, kind=AnalysisArtifact.STEMS)
+            mix = remix(stem_arrays, gains_db, muted)
+            return self._audio_response(
+                encode_audio(array_to_segment(mix, frame_rate), fmt), key, "remix", fmt
+            )
+        except (ValueError, TypeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TuneView(C2H5OHAppView):
+    """Re-render a full render with different mapping thresholds.
+
+    Body: {"key": "...", "config": {"melody_gate": 0.3, "scale": "lydian"}}
+
+    The cached analysis is reused and only the stems / time ranges that the
+    changed PopConfig fields affect are re-synthesised.
+    """
+
+    def _session(self, key):
+        with TUNE_SESSIONS_LOCK:
+            session = TUNE_SESSIONS.get(key)
+            if session is not None:
+                TUNE_SESSIONS.move_to_end(key)
+                return session
+        if not render_store.has_analysis(key):
+            return None
+        renderer = incremental_renderer(render_store.load_analysis(key))
+        ledger.touch(AnalysisArtifact, key=key)
+        if render_store.has_stems(key):
+            renderer.prime(DEFAULT_POP_CONFIG, render_store.load_stems(key)[0])
+        with TUNE_SESSIONS_LOCK:
+            session = TUNE_SESSIONS.setdefault(key, (renderer, threading.Lock()))
+            while len(TUNE_SESSIONS) > MAX_TUNE_SESSIONS:
+                TUNE_SESSIONS.popitem(last=False)
+        return session
+
+    def post(self, request):
+        key = request.data.get("key", "")
+        invalid = self._invalid_key_response(key)
+        if invalid is not None:
+            return invalid
+        try:
+            fmt = self._output_format(request)
+            config = DEFAULT_POP_CONFIG.updated(request.data.get("config") or {})
+            session = self._session(key)
+            if session is None:
+                return Response(
+                    {"error": f"No cached analysis for render '{key}'."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            renderer, lock = session
+            with lock:
+                stems, stats = renderer.render(config)
+                mix = remix(stems)
+            response = self._audio_response(
+                encode_audio(array_to_segment(mix, renderer.frame_rate), fmt),
+                key,
+                "tuned",
+                fmt,
+            )
+            response["X-Rerendered"] = json.dumps(stats)
+            return response
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SignalPyramidView(C2H5OHAppView):
+    """Signals of a subject for plotting, from its min/max pyramid (c2h5oh.pyramid).
+
+    GET without parameters lists the series. With ?series=hr,chest_ecg
+    (&start=, &end= in seconds, &width= in pixels) returns for each series
+    at most ``width`` (min, max) pairs covering the range.
+    """
+
+    http_method_names = ["get", "options"]
+
+    def _float_param(self, request, name, default):
+        value = request.query_params.get(name)
+        try:
+            return default if value in (None, "") else float(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be a number.")
+
+    def get(self, request, subject_id):
+        invalid = self._invalid_key_response(subject_id, "subject_id")
+        if invalid is not None:
+            return invalid
+        if not render_store.has_pyramid(subject_id, SUBJECT_ANALYSIS_VERSION):
+            return self._add_cors_headers(Response(
+                {"error": f"No signals stored for subject '{subject_id}'."},
+                status=status.HTTP_404_NOT_FOUND,
+            ))
+        pyramid = render_store.load_subject_pyramid(subject_id, SUBJECT_ANALYSIS_VERSION)
+        ledger.touch(AnalysisArtifact, key=subject_id, kind=AnalysisArtifact.SIGNAL_PYRAMID)
+        names = [name for name in request.query_params.get("series", "").split(",") if name]
+        if not names:
+            return self._add_cors_headers(Response({"subject": subject_id, "series": pyramid.series()}))
+        try:
+            start = self._float_param(request, "start", 0.0)
+            end = self._float_param(request, "end", float("inf"))
+            width = int(min(max(self._float_param(request, "width", DEFAULT_PLOT_WIDTH), 1), MAX_PLOT_WIDTH))
+            windows = [window_to_json(pyramid.window(name, start, end, width)) for name in names]
+        except KeyError as e:
+            return self._add_cors_headers(Response(
+                {"error": f"Unknown series {e}."}, status=status.HTTP_404_NOT_FOUND
+            ))
+        except (ValueError, OverflowError) as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST))
+        return self._add_cors_headers(Response({"subject": subject_id, "windows": windows}))
+
+
+class MomentsView(C2H5OHAppView):
+    """Moments of every analysed subject, from the feature index (c2h5oh.feature_index).
+
+    GET ?level=second|window (default window) with any of ?bio_state=Calm,
+    ?label=stress, ?subject=<id>,<id> and per-feature ranges such as
+    ?kick_min=0.7&pads_max=0.3 returns the matching moments in subject and
+    time order. With ?like_subject=<id>&like_start=<seconds> it returns the
+    moments nearest to that one instead. ?limit= caps the list. A moment's
+    subject and start_sec render it through /api/batch/ ({"subject": ...,
+    "renders": [{"start": ...}]}).
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    def _number_param(self, request, name, cast=float):
+        value = request.query_params.get(name)
+        try:
+            return None if value in (None, "") else cast(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be a number.")
+
+    def _filters(self, request):
+        params = request.query_params
+        label_names = [name for name in params.get("label", "").split(",") if name]
+        for name in label_names:
+            if name not in SEGMENTS_TO_GENERATE:
+                raise ValueError(f"Unknown label '{name}'. Expected any of: {', '.join(SEGMENTS_TO_GENERATE)}.")
+        subjects = [subject for subject in params.get("subject", "").split(",") if subject]
+        ranges = {}
+        for name in FEATURES:
+            low, high = self._number_param(request, f"{name}_min"), self._number_param(request, f"{name}_max")
+            if low is not None or high is not None:
+                ranges[name] = (low, high)
+        return {
+            "bio_state": params.get("bio_state") or None,
+            "labels": [SEGMENTS_TO_GENERATE[name] for name in label_names] or None,
+            "subjects": subjects or None,
+            "ranges": ranges,
+        }
+
+    def get(self, request):
+        label_names = {label_id: name for name, label_id in SEGMENTS_TO_GENERATE.items()}
+        index = render_store.load_feature_index(SUBJECT_ANALYSIS_VERSION)
+        level = request.query_params.get("level", "window")
+        try:
+            limit = self._number_param(request, "limit", int)
+            limit = DEFAULT_MOMENTS if limit is None else min(max(limit, 1), MAX_MOMENTS)
+            like_subject = request.query_params.get("like_subject")
+            if like_subject:
+                like_start = self._number_param(request, "like_start") or 0.0
+                rows, distances = index.similar(level, like_subject, like_start, k=limit)
+            else:
+                rows, distances = index.select(level, **self._filters(request)), None
+            count, rows = len(rows), rows[:limit]
+        except KeyError as e:
+            return self._add_cors_headers(Response(
+                {"error": f"No indexed moment {e}."}, status=status.HTTP_404_NOT_FOUND
+            ))
+        except ValueError as e:
+            return self._add_cors_headers(Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST))
+        moments = index.moments(level, rows, distances)
+        for moment in moments:
+            moment["label"] = label_names.get(moment["label"])
+        return self._add_cors_headers(Response({
+            "level": level, "subjects": len(index.subject_ids), "count": count,
+            "bio_states": list(BIO_STATES), "moments": moments,
+        }))
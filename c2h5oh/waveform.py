@@ -0,0 +1,88 @@
+import struct
+
+import numpy as np
+
+from .audio_arrays import to_pcm16
+from .pyramid import _reduce
+
+
+# --- Waveform peaks and spectrogram thumbnails ---
+# By-products of a final mix, so players can draw the track before (or
+# without) downloading the audio. Peaks are int16 (min, max) pairs per
+# samples_per_pixel frames at a few zoom levels, in the audiowaveform
+# formats that waveform players (e.g. peaks.js) read directly: binary .dat
+# (version 1) or JSON. The spectrogram is a small greyscale PNG.
+PEAKS_SAMPLES_PER_PIXEL = (256, 1024, 4096)  # each a multiple of the one before
+SPECTROGRAM_COLUMNS = 512  # time
+SPECTROGRAM_ROWS = 128  # log-spaced frequency bands, lowest at the bottom
+SPECTROGRAM_FFT = 2048
+SPECTROGRAM_MIN_HZ = 30.0
+SPECTROGRAM_RANGE_DB = 80.0  # black is this far below the loudest band
+# version, flags (0: 16-bit), sample rate, samples per pixel, length
+DAT_HEADER = struct.Struct("<iIiiI")
+
+
+def _mono(samples):
+    samples = np.asarray(samples, dtype=np.float32)
+    return samples.mean(axis=1) if samples.ndim > 1 else samples
+
+
+def waveform_peaks(samples):
+    """{samples_per_pixel: int16 array of shape (pixels, 2)} of a float mix."""
+    pcm = to_pcm16(_mono(samples))
+    pairs = np.broadcast_to(pcm[:, None], (len(pcm), 2))
+    peaks, size = {}, 1
+    for samples_per_pixel in PEAKS_SAMPLES_PER_PIXEL:
+        pairs = _reduce(pairs, samples_per_pixel // size)
+        peaks[samples_per_pixel], size = pairs, samples_per_pixel
+    return peaks
+
+
+def peaks_to_dat(pairs, frame_rate, samples_per_pixel):
+    """audiowaveform binary format, version 1, 16-bit."""
+    header = DAT_HEADER.pack(1, 0, frame_rate, samples_per_pixel, len(pairs))
+    return header + np.ascontiguousarray(pairs, dtype="<i2").tobytes()
+
+
+def dat_to_peaks(data):
+    """The (pixels, 2) int16 pairs of a peaks_to_dat() file."""
+    return np.frombuffer(data, dtype="<i2", offset=DAT_HEADER.size).reshape(-1, 2)
+
+
+def peaks_to_json(pairs, frame_rate, samples_per_pixel):
+    """audiowaveform JSON format, version 2, one channel."""
+    return {
+        "version": 2, "channels": 1, "sample_rate": frame_rate,
+        "samples_per_pixel": samples_per_pixel, "bits": 16, "length": len(pairs),
+        "data": pairs.ravel().tolist(),
+    }
+
+
+def spectrogram_thumbnail(samples, frame_rate, columns=SPECTROGRAM_COLUMNS, rows=SPECTROGRAM_ROWS):
+    """uint8 image (rows, columns) of the mix's spectrum in dB; one windowed
+    FFT per column, bins averaged into log-spaced bands."""
+    samples = _mono(samples)
+    if len(samples) < SPECTROGRAM_FFT:
+        samples = np.pad(samples, (0, SPECTROGRAM_FFT - len(samples)))
+    starts = np.linspace(0, len(samples) - SPECTROGRAM_FFT, columns).astype(int)
+    window = np.hanning(SPECTROGRAM_FFT).astype(np.float32)
+    frames = samples[starts[:, None] + np.arange(SPECTROGRAM_FFT)] * window
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    freqs = np.fft.rfftfreq(SPECTROGRAM_FFT, 1 / frame_rate)
+    edges = np.geomspace(SPECTROGRAM_MIN_HZ, frame_rate / 2, rows + 1)
+    band = np.clip(np.searchsorted(edges, freqs, side="right") - 1, 0, rows - 1)
+    in_range = freqs >= SPECTROGRAM_MIN_HZ
+    counts = np.bincount(band[in_range], minlength=rows)
+    bands = np.stack([
+        np.bincount(band[in_range], column[in_range], minlength=rows) for column in power
+    ], axis=1) / np.maximum(counts, 1)[:, None]
+    # Bands narrower than one FFT bin get their nearest bin
+    centres = np.sqrt(edges[:-1] * edges[1:])
+    nearest = np.minimum(np.round(centres * SPECTROGRAM_FFT / frame_rate).astype(int), len(freqs) - 1)
+    bands[counts == 0] = power[:, nearest[counts == 0]].T
+
+    db = 10 * np.log10(bands + 1e-12)
+    level = np.clip((db - (db.max() - SPECTROGRAM_RANGE_DB)) / SPECTROGRAM_RANGE_DB, 0.0, 1.0)
+    return np.round(level[::-1] * 255).astype(np.uint8)
+
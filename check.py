@@ -1,15 +1,22 @@
 import pickle
 import os
+import sys
 import numpy as np
 import pandas as pd
 import neurokit2 as nk
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
 import warnings
 
+from c2h5oh.dtypes import as_signal
+from c2h5oh.feature_index import BIO_STATES, bio_states
+from c2h5oh.multirate import multirate_error_report, process_slow_channels
+from c2h5oh.normalisation import ChannelStats
+from c2h5oh.pyramid import SignalPyramid, plot_window
+
 # --- CONFIGURATION ---
 SUBJECT_ID = 'S2'
 SAMPLING_RATE = 700
+EXPORT_CHUNK_SEC = 300  # normalisation stats are merged from chunks of this many seconds
 warnings.filterwarnings('ignore')
 
 # --- 0. ROBUST FILE FINDER ---
@@ -50,7 +57,8 @@ def extract_features(data):
 
 	keys = {k.lower(): k for k in chest.keys()}
 
-	def get_signal(name): return chest[keys[name.lower()]].flatten()
+	# float32 columns throughout (c2h5oh.dtypes): half the memory of float64
+	def get_signal(name): return as_signal(chest[keys[name.lower()]])
 
 	df = pd.DataFrame({
 		'ECG': get_signal('ECG'),
@@ -71,18 +79,19 @@ def extract_features(data):
 	ecg_cleaned = nk.ecg_clean(df['ECG'].to_numpy(), sampling_rate=SAMPLING_RATE)
 	_, rpeaks = nk.ecg_peaks(ecg_cleaned, sampling_rate=SAMPLING_RATE)
 	# signal_rate NEEDS desired_length because it works from peaks (just a list of points)
-	df['Heart_Rate'] = nk.signal_rate(rpeaks, sampling_rate=SAMPLING_RATE, desired_length=len(df))
+	df['Heart_Rate'] = nk.signal_rate(rpeaks, sampling_rate=SAMPLING_RATE, desired_length=len(df)).astype(np.float32)
+
+	# 2 + 4. EDA and respiration are cleaned at a few Hz, not at 700 Hz (c2h5oh.multirate)
+	slow = process_slow_channels(SAMPLING_RATE, eda=df['EDA'].to_numpy(), resp=df['RESP'].to_numpy())
 
 	# 2. Phasic/Tonic from EDA
-	df['EDA_Level'] = nk.eda_process(df['EDA'].to_numpy(), sampling_rate=SAMPLING_RATE)[0]['EDA_Clean']
+	df['EDA_Level'] = slow['eda'].at_rate(SAMPLING_RATE, len(df))
 
 	# 3. Amplitude from EMG (Muscle tension)
-	df['EMG_Amp'] = nk.emg_amplitude(df['EMG'].to_numpy())
+	df['EMG_Amp'] = nk.emg_amplitude(df['EMG'].to_numpy()).astype(np.float32)
 
-	# 4. Respiration Rate - FIXED LINE BELOW
-	rsp_cleaned = nk.rsp_clean(df['RESP'].to_numpy(), sampling_rate=SAMPLING_RATE)
-	# rsp_rate automatically matches the length of rsp_cleaned input
-	df['Resp_Rate'] = nk.rsp_rate(rsp_cleaned, sampling_rate=SAMPLING_RATE)
+	# 4. Respiration Rate
+	df['Resp_Rate'] = slow['resp_rate'].at_rate(SAMPLING_RATE, len(df))
 
 	# 5. Temperature
 	df['Temp_Mean'] = df['TEMP']
@@ -91,14 +100,10 @@ def extract_features(data):
 
 
 # --- 3. PLOTTING ---
-def plot_data(df):
-	print("Generating inspection plots...")
-	plt.figure(figsize=(12, 10))
-
-	samples_to_plot = min(300 * SAMPLING_RATE, len(df))
-	df_slice = df.iloc[:samples_to_plot]
-	time_axis = np.arange(len(df_slice)) / SAMPLING_RATE
+PLOT_WIDTH = 1200  # pixels; each signal is drawn as at most this many min/max pairs
 
+def plot_data(df, start_sec=0, end_sec=300, width=PLOT_WIDTH):
+	print("Generating inspection plots...")
 	signals = [
 		('Heart_Rate', 'Heart Rate (BPM) -> KICK', 'red'),
 		('EDA_Level', 'EDA (Sweat) -> HATS', 'blue'),
@@ -106,13 +111,16 @@ def plot_data(df):
 		('Resp_Rate', 'Resp Rate -> MELODY', 'green'),
 		('Temp_Mean', 'Skin Temp -> PADS', 'purple')
 	]
+	# Min/max pyramid (c2h5oh.pyramid): any range is drawn from the level that
+	# fits the plot width instead of every 700 Hz sample
+	pyramid = SignalPyramid.of_series({col: (df[col].to_numpy(), SAMPLING_RATE) for col, _, _ in signals})
 
-	for i, (col, title, color) in enumerate(signals):
-		plt.subplot(5, 1, i + 1)
-		plt.plot(time_axis, df_slice[col], color=color, label=col)
-		plt.title(title)
-		plt.grid(True, alpha=0.3)
-		if i == 4: plt.xlabel("Time (seconds)")
+	fig, axes = plt.subplots(len(signals), 1, figsize=(12, 10))
+	for i, ((col, title, color), ax) in enumerate(zip(signals, axes)):
+		plot_window(ax, pyramid.window(col, start_sec, end_sec, width), color=color, label=col)
+		ax.set_title(title)
+		ax.grid(True, alpha=0.3)
+		if i == len(signals) - 1: ax.set_xlabel("Time (seconds)")
 
 	plt.tight_layout()
 	plt.show()
@@ -126,14 +134,18 @@ def export_for_music_app(df):
 	music_df = df.groupby('second')[['Heart_Rate', 'EDA_Level', 'EMG_Amp', 'Resp_Rate', 'Temp_Mean']].mean()
 
 	print("2. Normalizing...")
-	scaler = MinMaxScaler(feature_range=(0.0, 1.0))
-	norm_data = scaler.fit_transform(music_df)
-	export_df = pd.DataFrame(norm_data, columns=['kick', 'hats', 'bass', 'melody', 'pads'])
-
-	export_df['bio_state'] = np.where(
-		(export_df['kick'] + export_df['hats']) > 1.3, 'High Arousal',
-		np.where((export_df['kick'] + export_df['hats']) < 0.6, 'Calm', 'Neutral')
-	)
+	# Mergeable per-channel stats, gathered chunk by chunk (as a stream would),
+	# then min/max scaling like MinMaxScaler did over the whole frame
+	columns = {'Heart_Rate': 'kick', 'EDA_Level': 'hats', 'EMG_Amp': 'bass', 'Resp_Rate': 'melody', 'Temp_Mean': 'pads'}
+	norm_data = {}
+	for col, name in columns.items():
+		values = music_df[col].to_numpy()
+		stats = ChannelStats.from_chunks(np.array_split(values, max(1, len(values) // EXPORT_CHUNK_SEC)))
+		norm_data[name] = stats.normalise(values, method='minmax')
+	export_df = pd.DataFrame(norm_data)
+
+	# Same thresholds as the moments index (c2h5oh.feature_index)
+	export_df['bio_state'] = np.array(BIO_STATES)[bio_states(export_df['kick'], export_df['hats'])]
 
 	export_df['time'] = export_df.index
 
@@ -142,9 +154,26 @@ def export_for_music_app(df):
 	print(f"✅ SUCCESS! Exported {len(export_df)} seconds to: {os.path.abspath(output_filename)}")
 
 
+# --- 5. MULTI-RATE CHECK ---
+def report_multirate_error(data, seconds=600):
+	"""Compare the decimated EDA / respiration / temperature processing with the same processing at full rate."""
+	chest = data['signal']['chest']
+	n = seconds * SAMPLING_RATE
+	report = multirate_error_report(
+		SAMPLING_RATE,
+		eda=chest['EDA'].flatten()[:n], resp=chest['Resp'].flatten()[:n], temp=chest['Temp'].flatten()[:n]
+	)
+	timings = report.pop('timings')
+	print(f"\nDecimated vs full-rate processing ({seconds}s): {timings['full_rate_sec']:.2f}s -> {timings['multirate_sec']:.2f}s")
+	for name, errors in report.items():
+		print(f"  {name:<11} RMSE {errors['rmse']:.4f}  max {errors['max_abs']:.4f}  ({errors['nrmse']:.2%} of range)")
+
+
 if __name__ == "__main__":
 	data = load_data(FILE_PATH)
 	if data is not None:
+		if '--multirate-report' in sys.argv:
+			report_multirate_error(data)
 		df_features = extract_features(data)
 		plot_data(df_features)
 		export_for_music_app(df_features)
\ No newline at end of file
@@ -0,0 +1,275 @@
+"""Load test for the upload endpoints, fully offline on one machine.
+
+Starts the Django app (manage.py runserver, with a throw-away render store)
+and posts synthetic WESAD-shaped pickles to it, either closed-loop (a fixed
+number of clients back to back) or open-loop (Poisson arrivals at --rate,
+with --concurrency as the cap on requests in flight). Latency is measured
+from each request's scheduled arrival, so time spent waiting for a free
+client counts. Prints throughput, p50/p95/p99 latency, error rates and the
+server's peak RSS; --json saves the run to compare builds:
+
+    python loadtest.py --requests 40 --concurrency 4
+    python loadtest.py --rate 0.5 --requests 60 --path /api/async/ --json run.json
+"""
+import argparse
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+CHEST_RATE = 700
+WRIST_RATES = {"BVP": 64, "EDA": 4, "TEMP": 4, "ACC": 32}
+LABEL_IDS = (1, 2, 3, 4)  # baseline, stress, fun, meditation
+SERVER_START_TIMEOUT_SEC = 60
+RSS_INTERVAL_SEC = 0.25
+
+
+# --- Synthetic uploads ---
+def synthetic_recording(label_sec=70, seed=0):
+    """A WESAD-shaped subject dict: every chest and wrist channel, (n, 1)
+    arrays like the originals, ``label_sec`` seconds per label."""
+    rng = np.random.default_rng(seed)
+    total_sec = label_sec * len(LABEL_IDS)
+    t = np.arange(total_sec * CHEST_RATE) / CHEST_RATE
+    heart_hz = 1.2 + 0.3 * np.sin(2 * np.pi * t / 120) + 0.05 * rng.standard_normal()
+    heart_phase = 2 * np.pi * np.cumsum(heart_hz) / CHEST_RATE
+    chest = {
+        "ECG": np.sin(heart_phase / 2) ** 64 + 0.05 * rng.standard_normal(len(t)),
+        "EMG": 0.02 * rng.standard_normal(len(t)) * (1 + np.sin(2 * np.pi * t / 9) ** 2),
+        "EDA": 2 + 0.5 * np.sin(2 * np.pi * t / 90) + 0.01 * rng.standard_normal(len(t)),
+        "Resp": np.sin(2 * np.pi * 0.25 * t) + 0.05 * rng.standard_normal(len(t)),
+        "Temp": 33 + 0.2 * np.sin(2 * np.pi * t / 300),
+    }
+    wrist = {}
+    for name, rate in WRIST_RATES.items():
+        wt = np.arange(total_sec * rate) / rate
+        if name == "BVP":
+            wrist[name] = np.sin(2 * np.pi * 1.2 * wt) + 0.1 * rng.standard_normal(len(wt))
+        elif name == "ACC":
+            wrist[name] = 64 * rng.standard_normal((len(wt), 3))
+        elif name == "EDA":
+            wrist[name] = 1 + 0.2 * np.sin(2 * np.pi * wt / 60)
+        else:
+            wrist[name] = 32 + 0.1 * np.sin(2 * np.pi * wt / 300)
+    labels = np.repeat(np.asarray(LABEL_IDS, dtype=np.int32), label_sec * CHEST_RATE)
+    return {
+        "subject": f"S{seed}",
+        "signal": {
+            "chest": {name: values.reshape(len(values), -1) for name, values in chest.items()},
+            "wrist": {name: values.reshape(len(values), -1) for name, values in wrist.items()},
+        },
+        "label": labels,
+    }
+
+
+def synthetic_upload(label_sec=70, seed=0):
+    return pickle.dumps(synthetic_recording(label_sec, seed))
+
+
+# --- Server ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, store_dir, env=None):
+    """runserver without the autoreloader (so its pid is the serving process)."""
+    server_env = dict(os.environ, RENDER_STORE_DIR=store_dir, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SEC
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start in time.")
+
+
+def _rss_bytes(pid):
+    """RSS of ``pid`` and its descendants (Linux /proc)."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (FileNotFoundError, ProcessLookupError):
+        return total
+    return total + sum(_rss_bytes(child) for child in children)
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, pid, interval=RSS_INTERVAL_SEC):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append(_rss_bytes(self.pid))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# --- Load ---
+def arrival_times(count, rate=None, seed=0):
+    """Offsets (seconds) of ``count`` requests: all at 0 for a closed loop,
+    Poisson arrivals at ``rate`` per second otherwise."""
+    if not rate:
+        return np.zeros(count)
+    gaps = np.random.default_rng(seed).exponential(1 / rate, count)
+    return np.cumsum(gaps) - gaps[0]
+
+
+def _post(url, body, params, scheduled, timeout):
+    start = time.monotonic()
+    try:
+        response = requests.post(
+            url, files={"file": ("subject.pkl", body)}, params=params, timeout=timeout
+        )
+        outcome = str(response.status_code)
+    except requests.RequestException as e:
+        outcome = type(e).__name__
+    end = time.monotonic()
+    if scheduled is None:
+        scheduled = start
+    return {"outcome": outcome, "latency": end - scheduled, "service": end - start, "end": end}
+
+
+def run_load(url, uploads, concurrency, rate=None, params=None, timeout=600, seed=0):
+    """Post ``uploads`` (pickled bytes) to ``url``; returns one record per request."""
+    offsets = arrival_times(len(uploads), rate, seed)
+    results = []
+    with ThreadPoolExecutor(concurrency) as pool:
+        t0 = time.monotonic()
+        futures = []
+        for offset, body in zip(offsets, uploads):
+            # Open loop: submit on schedule even if every client is busy
+            delay = t0 + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # Closed loop: a request starts when a client frees up
+            scheduled = t0 + offset if rate else None
+            futures.append(pool.submit(_post, url, body, params, scheduled, timeout))
+        for future in futures:
+            results.append(future.result())
+    return results, t0
+
+
+def summarise(results, t0, rss_samples):
+    latencies = np.array([r["latency"] for r in results])
+    ok = np.array([r["outcome"] == "200" for r in results])
+    wall = max(r["end"] for r in results) - t0 if results else 0.0
+    outcomes = Counter(r["outcome"] for r in results)
+    summary = {
+        "requests": len(results),
+        "wall_sec": wall,
+        "throughput_rps": int(ok.sum()) / wall if wall else 0.0,
+        "error_rate": 1 - ok.mean() if len(results) else 0.0,
+        "outcomes": dict(outcomes),
+        "peak_rss_mb": max(rss_samples, default=0) / 2 ** 20,
+        "mean_rss_mb": float(np.mean(rss_samples)) / 2 ** 20 if rss_samples else 0.0,
+    }
+    if ok.any():
+        for q in (50, 95, 99):
+            summary[f"p{q}_sec"] = float(np.percentile(latencies[ok], q))
+        summary["max_sec"] = float(latencies[ok].max())
+    return summary
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="clients / max requests in flight")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrivals per second")
+    parser.add_argument("--path", default="/api/", help="endpoint, e.g. /api/ or /api/async/")
+    parser.add_argument("--preview", action="store_true", help="ask for preview renders")
+    parser.add_argument("--label-sec", type=int, default=70, help="seconds of each label per upload")
+    parser.add_argument("--distinct", type=int, default=None,
+                        help="distinct uploads to cycle through (default: all distinct, no cache hits)")
+    parser.add_argument("--url", default=None, help="test a running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", default=None, help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    distinct = args.distinct or args.requests
+    print(f"Building {distinct} synthetic upload(s) of {args.label_sec * len(LABEL_IDS)}s...")
+    bodies = [synthetic_upload(args.label_sec, seed) for seed in range(distinct)]
+    uploads = [bodies[i % distinct] for i in range(args.requests)]
+    params = {"preview": "1"} if args.preview else None
+
+    server = None
+    store = tempfile.TemporaryDirectory(prefix="c2h5oh-loadtest-")
+    try:
+        if args.url:
+            base_url, sampler = args.url.rstrip("/"), None
+        else:
+            port = _free_port()
+            server = start_server(port, store.name)
+            base_url = f"http://127.0.0.1:{port}"
+            sampler = RSSSampler(server.pid)
+            sampler.start()
+        mode = f"open loop at {args.rate}/s" if args.rate else "closed loop"
+        print(f"{args.requests} requests to {base_url}{args.path}, {mode}, concurrency {args.concurrency}")
+        results, t0 = run_load(
+            base_url + args.path, uploads, args.concurrency, args.rate, params, args.timeout
+        )
+        if sampler:
+            sampler.stop()
+        summary = summarise(results, t0, sampler.samples if sampler else [])
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        store.cleanup()
+
+    summary.update(
+        revision=_git_revision(), path=args.path, preview=args.preview,
+        concurrency=args.concurrency, rate=args.rate, distinct_uploads=distinct,
+    )
+    for name, value in summary.items():
+        print(f"{name:<18} {value:.3f}" if isinstance(value, float) else f"{name:<18} {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()